@@ -8,23 +8,59 @@ spec = {
     },
 
     "time": {
-        "dt": 0.1,
-        "t_max": 1
+        "dt": 0.1,                                      # frame dt if adaptive
+        "t_max": 1,
+        "adaptive": False,
+        "cfl": 1.0,
+        "dt_min": 1e-3,
+        "dt_max": 0.1
     },
 
-    "BCs": {                                            # TODO
-        "horizontal": "wall",
-        "vertical": "wall",
-        # TODO: specify values
-        # TODO: Dirichlet AND Neumann BC support
+    "BCs": {                                            # no-slip, free-slip
+        "horizontal": "no-slip",                        # or open
+        "vertical": "no-slip",
+        "obstacles": "no-slip",
+        "pressure": "neumann"                           # or dirichlet (p = 0)
+    },
+
+    "obstacles": {
+        "mask": None,                                   # PNG, dark = wall
+        "shapes": []                                    # circle, rectangle
     },
 
     "ICs": {},                                          # TODO
 
     "scheme": {
-        "name": "ExplicitEuler",
+        "name": "ExplicitEuler",                        # ImplicitEuler (a
+                                                        # one-step blend),
+                                                        # BackwardEuler or FEM
         "dx==dy": True,
-        "nit": 5
+        "nit": 5,
+        "dtype": "float64",                             # or float32
+        "implicit_cache": 8,                            # BackwardEuler/FEM
+                                                        # operators kept
+        "fem_mass": "lumped",                           # or consistent
+        "advection": {                                  # SemiLagrangian,
+            "velocity": "SemiLagrangian",               # MacCormack or BFECC
+            "smoke": "SemiLagrangian"
+        },
+        "sparse_smoke": {                               # transport smoke only
+            "active": False,                            # on tiles holding any
+            "tile_size": 16,                            # cells
+            "threshold": 1e-3
+        },
+        "refinement": {                                 # quadtree of tiles
+            "active": False,                            # down to base_size,
+            "levels": 3,                                # coarsest at
+            "tile_size": 32,                            # base_size*2^(levels-1)
+            "every": 10,                                # steps between regrids
+            "vorticity": 0.1,                           # refine above:
+            "smoke_gradient": 0.1                       # |w|*h / max speed,
+        },                                              # |grad d|*h / max d
+        "dual_resolution": {                            # u, v, p on a grid
+            "active": False,                            # coarser by factor,
+            "factor": 2                                 # d at base_size
+        }
     },
 
     "fluid": {
@@ -42,12 +78,28 @@ spec = {
         "height": 700,
         "visualisation": "",
         "show_smoke": True,
-        "show_particles": True,
+        "show_particles": False,
+        "particles": {
+            "count": 100000,                            # pool size
+            "lifetime": 20,                             # s
+            "emit_rate": 0.002,                         # of the pool per step
+            "colour": [40, 60, 90],
+            "brush_colour": [90, 70, 40],               # emitted by the brush
+            "seed": None
+        },
+        "idle": {                                       # pause when at rest
+            "active": True,
+            "ke_threshold": 1e-6,
+            "smoke_threshold": 1e-2,
+            "timeout": 500                              # ms
+        }
     },
 
     "gui": {
         "brush_size": 20,
-        "smoke_strength": 2
+        "smoke_strength": 2,
+        "record_input": None,                           # path to save strokes
+        "replay_input": None                            # path to replay
     },
 
     "videowriter": {
@@ -57,8 +109,67 @@ spec = {
         "vid_name": "vid"
     },
 
+    "stream": {                                         # serve frames over TCP
+        "active": False,                                # to src/FrameViewer.py
+        "host": "127.0.0.1",
+        "port": 8765,
+        "codec": "jpeg",                                # jpeg, png or delta
+        "quality": 80,                                  # jpeg only
+        "keyframe_every": 30                            # delta only
+    },
+
+    "output": {                                         # raw fields over time
+        "every": 0,                                     # steps, 0 = off
+        "path": "out/fields.fts",
+        "fields": ["u", "v", "p", "d"],
+        "stride": 1,                                    # keep every Nth cell
+        "dtype": "float16",
+        "compression": "zlib",                          # zlib, lzma or none
+        "level": 6,
+        "tile_size": 64                                 # chunk size (cells)
+    },
+
+    "storage": {                                        # where the fields live
+        "backend": "memory",                            # or memmap: files in
+        "dir": "out/fields",                            # dir, updated in
+        "band_rows": 256                                # bands of rows
+    },
+
+    "share": {                                          # live fields in shared
+        "active": False,                                # memory, for
+        "name": "fluidsim",                             # SharedFieldsClient
+        "pxarray": False
+    },
+
+    "checkpoint": {
+        "every": 0,                                     # steps, 0 = off
+        "keep": 3,                                      # newest N, 0 = all
+        "dir": "out/checkpoints",
+        "restart": None                                 # path to resume from
+    },
+
+    "sessions": {                                       # SessionManager
+        "workers": 4,
+        "memory_limit": 2e9,                            # bytes
+        "idle_after": 30,                               # s without input
+        "checkpoint_dir": "out/sessions"
+    },
+
+    "profile": {                                        # per-phase timings
+        "active": False,
+        "window": 1024,                                 # samples per phase
+        "export_every": 0,                              # steps, 0 = off
+        "jsonl": "out/metrics.jsonl",
+        "prometheus_port": 0                            # 0 = off
+    },
+
     "log": {                                          
         "verbose": True,                        
-        "log_file": True                         
+        "log_file": True,
+        "path": "out/.log",
+        "max_bytes": 1e6,                               # then rotated
+        "backups": 3,
+        "rate_limit": 10,                               # per key per s, 0 = off
+        "diagnostics_every": 0                          # steps, 0 = off
     }
 }
\ No newline at end of file
@@ -0,0 +1,220 @@
+################################################################################
+##
+##  File: accuracy.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Validation benchmark: error against analytic solutions per CPU
+##                second, across resolutions and nit, with the Pareto-optimal
+##                settings of each case marked
+##                Run from the repository root: python -m benchmarks.accuracy
+##
+################################################################################
+
+
+import copy
+import json
+import time
+import argparse
+import numpy as np
+
+from assets.solver_config import spec as default_spec
+from src.Solver import Solver
+from src.ImplicitDiffusion import ImplicitDiffusion
+from benchmarks.advection import SCHEMES, rotate_blob
+
+
+def rel_l2(a, b):
+    return float(np.linalg.norm(a - b) / np.linalg.norm(b))
+
+
+def taylor_green(N, nit, nu=0.1, t_end=1.0):
+    """
+    Decaying Taylor-Green vortex on [0, 2pi]^2 through the full Solver, 
+    compared with the analytic velocity over the central quarter (the domain 
+    edges are walls, not periodic)
+    """
+    spec = copy.deepcopy(default_spec)
+    L = 2 * np.pi
+    spec["name"] = "accuracy"
+    spec["domain"].update(width=L, height=L, base_size=L / N)
+    spec["scheme"]["nit"] = nit
+    spec["fluid"]["viscosity"] = nu
+    spec["fluid"]["smoke_fade"] = 1
+    spec["display"]["pygame"] = False
+    spec["log"].update(verbose=False, log_file=False)
+    
+    # CFL 0.5 for the peak speed of 1
+    n_steps = int(np.ceil(t_end / (0.5 * L / N)))
+    spec["time"].update(dt=t_end / n_steps, t_max=float("inf"), 
+                        adaptive=False)
+    
+    solver = Solver(spec)
+    f = solver.fluid
+    f.u[...] = np.sin(f.X) * np.cos(f.Y)
+    f.v[...] = -np.cos(f.X) * np.sin(f.Y)
+
+    start = time.process_time()
+    for _ in range(n_steps):
+        solver.solve()
+    cpu = time.process_time() - start
+
+    decay = np.exp(-2 * nu * solver.t)
+    inner = (slice(N // 4, 3 * N // 4),) * 2
+    u_exact = np.sin(f.X) * np.cos(f.Y) * decay
+    v_exact = -np.cos(f.X) * np.sin(f.Y) * decay
+    error = rel_l2(np.stack((f.u[inner], f.v[inner])), 
+                   np.stack((u_exact[inner], v_exact[inner])))
+    return error, cpu
+
+
+def gaussian_diffusion(kernel, N, nit, nu=1.25e-3, t_end=1.0, sigma=0.05):
+    """
+    Diffuse a Gaussian on the unit square with kernel ("EE", "IE" or "BE"); 
+    the exact solution keeps its shape with sigma^2 growing by 2 nu t
+    """
+    dx = 1 / N
+    IX, IY = np.meshgrid(np.arange(N), np.arange(N))
+    X, Y = (IX + 0.5) * dx, (IY + 0.5) * dx
+    r2 = (X - 0.5)**2 + (Y - 0.5)**2
+    D = np.exp(-r2 / (2 * sigma**2))
+    where_inner_fluid = np.where(np.ones((N - 2, N - 2)))
+
+    # k = 4 nu dt / dx^2 = 0.5, inside the explicit blend's stable range; 
+    # backward Euler is stable for any k, so takes steps 16 times longer
+    k = 8 if kernel == "BE" else 0.5
+    n_steps = int(np.ceil(t_end / (k * dx**2 / (4 * nu))))
+    dt = t_end / n_steps
+    implicit = ImplicitDiffusion(cache_size=1)
+
+    start = time.process_time()
+    for _ in range(n_steps):
+        if kernel == "EE":
+            D = Solver.diffuseEE_dx_is_dy(D, where_inner_fluid, nu, dx, dt, nit)
+        elif kernel == "BE":
+            D = implicit(D, Ellipsis, nu, dx, dx, dt)
+        else:
+            D = Solver.diffuseIE_dx_is_dy(D, nu, dx, dt)
+    cpu = time.process_time() - start
+
+    s2 = sigma**2 + 2 * nu * t_end
+    exact = sigma**2 / s2 * np.exp(-r2 / (2 * s2))
+    return rel_l2(D, exact), cpu
+
+
+def rotation(scheme, N, nit):
+    """
+    Solid-body rotation of a Gaussian blob for one revolution (see 
+    benchmarks/advection.py); nit plays no part
+    Timed by wall clock, which for this single threaded kernel is its CPU time
+    """
+    error, _, t_step = rotate_blob(SCHEMES[scheme], N, cfl=0.5)
+    n_steps = int(np.ceil(N * 2 * np.pi / (4 * 0.5)))
+    return error, t_step * n_steps
+
+
+def projection(N, nit, seed=0):
+    """
+    RMS divergence left by extract_divfree (as used by enforce_continuity) 
+    on a smooth random velocity field, relative to what it started with
+    """
+    rng = np.random.default_rng(seed)
+    dx = 1 / N
+    X, Y = np.meshgrid(np.arange(N) * dx, np.arange(N) * dx)
+    u, v = (sum(rng.standard_normal() * np.sin(2 * np.pi * (kx * X + ky * Y) 
+                                               + rng.uniform(0, 2 * np.pi))
+                for kx in range(1, 4) for ky in range(1, 4))
+            for _ in range(2))
+    div = lambda u, v: Solver.div_dx_is_dy(u, v, dx)
+    where_inner_fluid = np.where(np.ones((N - 2, N - 2)))
+
+    start = time.process_time()
+    _, u_df, v_df = Solver.extract_divfree(
+        u, v, np.zeros((N, N)), dx, dx, nit, where_inner_fluid, div)
+    cpu = time.process_time() - start
+
+    return float(np.sqrt(np.mean(div(u_df, v_df)**2) 
+                         / np.mean(div(u, v)**2))), cpu
+
+
+CASES = {
+    "taylor_green": taylor_green,
+    "diffusion_EE": lambda N, nit: gaussian_diffusion("EE", N, nit),
+    "diffusion_IE": lambda N, nit: gaussian_diffusion("IE", N, nit),
+    "diffusion_BE": lambda N, nit: gaussian_diffusion("BE", N, nit),
+    **{f"rotation_{scheme}": (lambda N, nit, scheme=scheme: 
+                              rotation(scheme, N, nit)) 
+       for scheme in SCHEMES},
+    "projection": projection,
+}
+
+# cases where nit changes nothing are only run once per resolution
+NIT_INDEPENDENT = {"diffusion_IE", "diffusion_BE", *(f"rotation_{s}" for s in SCHEMES)}
+
+
+def pareto(points):
+    """
+    Indices of the points (cpu, error) not beaten on both by another point
+    """
+    return {i for i, (c, e) in enumerate(points)
+            if not any(c2 <= c and e2 <= e and (c2, e2) != (c, e) 
+                       for c2, e2 in points)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy per CPU second")
+    parser.add_argument("--cases", nargs="+", default=list(CASES), 
+                        choices=list(CASES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--nit", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args()
+
+    results = {}
+    for case in args.cases:
+        nits = args.nit[:1] if case in NIT_INDEPENDENT else args.nit
+        runs = [(N, nit, *CASES[case](N, nit)) 
+                for N in args.sizes for nit in nits]
+        front = pareto([(cpu, error) for _, _, error, cpu in runs])
+        
+        print(f"\n{case}\n{'N':>6}{'nit':>6}{'error':>12}{'cpu s':>10}")
+        for i in sorted(range(len(runs)), key=lambda i: runs[i][3]):
+            N, nit, error, cpu = runs[i]
+            nit = "-" if case in NIT_INDEPENDENT else nit
+            print(f"{N:>6}{nit:>6}{error:>12.3e}{cpu:>10.3f}"
+                  f"{'  *' if i in front else ''}")
+        
+        results[case] = [{"N": N, "nit": nit, "error": error, "cpu": cpu, 
+                          "pareto": i in front} 
+                         for i, (N, nit, error, cpu) in enumerate(runs)]
+    print("\n* Pareto-optimal: no other setting is both cheaper and more "
+          "accurate")
+    
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+################################################################################
+##
+##  File: advection.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Benchmark of error against cost for each advection scheme in
+##                Solver, on solid-body rotation of a Gaussian blob.
+##                Run from the repository root: python -m benchmarks.advection
+##
+################################################################################
+
+
+import argparse
+import time
+import numpy as np
+
+from src.Solver import Solver
+
+
+SCHEMES = {
+    "SemiLagrangian": Solver.advect,
+    "MacCormack": Solver.advect_maccormack,
+    "BFECC": Solver.advect_bfecc,
+}
+
+
+def rotate_blob(advect, N, cfl, revolutions=1):
+    """
+    Advect a Gaussian blob once around the centre of the unit square and 
+    compare it with where it started
+    Returns (L1 error, fraction of the peak kept, seconds per step)
+    """
+    dx = 1 / N
+    IX, IY = np.meshgrid(np.arange(N), np.arange(N))
+    X, Y = (IX + 0.5) * dx, (IY + 0.5) * dx
+    fluid_domain = np.where(np.ones((N, N)))
+
+    omega = 2 * np.pi
+    u = -omega * (Y - 0.5)
+    v = omega * (X - 0.5)
+
+    D0 = np.exp(-((X - 0.5)**2 + (Y - 0.75)**2) / (2 * 0.05**2))
+    D = D0.copy()
+
+    # the blob sits at radius 0.25, so its speed is omega/4
+    n_steps = int(np.ceil(revolutions * N * omega / (4 * cfl)))
+    dt = revolutions / n_steps
+
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        D = advect(D, fluid_domain, u, v, dx, dx, IX, IY, dt)
+    elapsed = time.perf_counter() - start
+
+    error = np.abs(D - D0).sum() / np.abs(D0).sum()
+    return error, D.max() / D0.max(), elapsed / n_steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--cfl", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"{'scheme':<16}{'N':>6}{'L1 error':>12}{'peak kept':>12}"
+          f"{'us/cell':>10}{'ms/step':>10}")
+    for name, advect in SCHEMES.items():
+        for N in args.sizes:
+            error, peak, t_step = rotate_blob(advect, N, args.cfl)
+            print(f"{name:<16}{N:>6}{error:>12.4f}{peak:>12.3f}"
+                  f"{t_step / N**2 * 1e6:>10.4f}{t_step * 1e3:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+################################################################################
+##
+##  File: fem.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Benchmark of FEM assembly throughput, in elements per second, 
+##                on jittered triangulations of the unit square with a circular 
+##                hole: building the sparsity pattern and scatter map once, 
+##                then reassembling stiffness and mass through it
+##                Run from the repository root: python -m benchmarks.fem
+##
+################################################################################
+
+
+import argparse
+import time
+import numpy as np
+
+from src.FEMDiffusion import TriangleMesh, grid_mesh
+
+
+def holed_mesh(N, rng, radius=0.2):
+    """
+    Jittered N x N grid triangulation of the unit square, without the 
+    elements whose centroid is within radius of the centre
+    """
+    h = 1 / (N - 1)
+    mesh = grid_mesh((N, N), h, h)
+    nodes = mesh.nodes + rng.uniform(-0.2 * h, 0.2 * h, mesh.nodes.shape)
+    centroids = nodes[mesh.triangles].mean(axis=1)
+    outside = np.hypot(*(centroids - 0.5).T) > radius
+    return nodes, mesh.triangles[outside]
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", 
+                        default=[64, 128, 256, 512])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    print(f"{'N':>6}{'elements':>12}{'setup Mel/s':>14}"
+          f"{'K+M Mel/s':>12}{'K+M ms':>10}")
+    for N in args.sizes:
+        nodes, triangles = holed_mesh(N, rng)
+        m = len(triangles)
+
+        # geometry, sparsity pattern and scatter map
+        t_setup = best_of(lambda: TriangleMesh(nodes, triangles), args.repeat)
+        mesh = TriangleMesh(nodes, triangles)
+        # batched element matrices summed through the cached scatter map
+        t_assemble = best_of(lambda: (mesh.stiffness(), mesh.mass()), 
+                             args.repeat)
+        
+        print(f"{N:>6}{m:>12}{m / t_setup / 1e6:>14.2f}"
+              f"{m / t_assemble / 1e6:>12.2f}{t_assemble * 1e3:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
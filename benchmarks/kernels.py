@@ -0,0 +1,210 @@
+################################################################################
+##
+##  File: kernels.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Micro-benchmark and regression check of the Solver kernels and a
+##                full Solver.solve step over a ladder of grid sizes and wall
+##                densities, reporting ns/cell, steps/sec and peak memory
+##                Run from the repository root: python -m benchmarks.kernels
+##                  --save FILE      store the results as a JSON baseline
+##                  --compare FILE   exit 1 if any result is slower than the baseline
+##                                   by more than --threshold
+##                  --dtype float32  run in single precision (default float64)
+##
+################################################################################
+
+
+import sys
+import copy
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import numpy as np
+
+from assets.solver_config import spec as default_spec
+from src.Solver import Solver
+from src.ImplicitDiffusion import ImplicitDiffusion
+
+
+def walls_mask(N, density, rng, dtype=np.float64):
+    walls = (rng.random((N, N)) < density).astype(dtype)
+    return walls
+
+
+def kernel_cases(N, density, rng, dtype=np.float64):
+    """
+    (name, zero-argument callable) for each kernel on an N x N grid
+    """
+    dx, dt, nu, nit = 0.2, 0.1, 1e-1, 5
+    u, v, D, p = (rng.standard_normal((N, N), dtype=dtype) for _ in range(4))
+    walls = walls_mask(N, density, rng, dtype)
+    # indexed as Fluid does: boolean masks, or Ellipsis without walls, and 
+    # coordinates as a broadcasting row and column
+    if walls.any():
+        where_fluid = walls == 0
+        where_inner_fluid = where_fluid[1:-1, 1:-1]
+    else:
+        where_fluid = where_inner_fluid = Ellipsis
+    IX = np.arange(N, dtype=np.int32)[None, :]
+    IY = np.arange(N, dtype=np.int32)[:, None]
+    div = lambda u, v: Solver.div_dx_is_dy(u, v, dx)
+    implicit = ImplicitDiffusion(cache_size=1)
+
+    return [
+        ("diffuseEE_dx_is_dy", lambda: Solver.diffuseEE_dx_is_dy(
+            D, where_inner_fluid, nu, dx, dt, nit)),
+        ("diffuseIE_dx_is_dy", lambda: Solver.diffuseIE_dx_is_dy(
+            D.copy(), nu, dx, dt)),
+        # factorized in the warm up call, so this times the cached solve
+        ("ImplicitDiffusion", lambda: implicit(
+            D, where_inner_fluid, nu, dx, dx, dt)),
+        ("advect", lambda: Solver.advect(
+            D, where_fluid, u, v, dx, dx, IX, IY, dt)),
+        ("div_dx_is_dy", lambda: Solver.div_dx_is_dy(u, v, dx)),
+        ("div_dx_not_dy", lambda: Solver.div_dx_not_dy(u, v, dx, dx)),
+        ("extract_divfree", lambda: Solver.extract_divfree(
+            u, v, p, dx, dx, nit, where_inner_fluid, div)),
+    ]
+
+
+def make_solver(N, density, rng, dtype=np.float64):
+    spec = copy.deepcopy(default_spec)
+    spec["name"] = "benchmark"
+    spec["scheme"]["dtype"] = np.dtype(dtype).name
+    spec["domain"]["width"] = N * spec["domain"]["base_size"]
+    spec["domain"]["height"] = N * spec["domain"]["base_size"]
+    spec["time"]["t_max"] = float("inf")
+    spec["display"]["pygame"] = False
+    spec["display"]["show_particles"] = False
+    spec["log"]["verbose"] = False
+    spec["log"]["log_file"] = False
+
+    solver = Solver(spec)
+    fluid = solver.fluid
+    fluid.walls[...] = walls_mask(fluid.Ny, density, rng)[:, :fluid.Nx]
+    fluid.set_wall_indices()
+    fluid.u[...] = rng.standard_normal(fluid.u.shape)
+    fluid.v[...] = rng.standard_normal(fluid.v.shape)
+    fluid.d[...] = rng.random(fluid.d.shape)
+    return solver
+
+
+def measure(func, repeat):
+    """
+    Median wall time (ns) over repeat calls, and the peak memory (bytes) 
+    allocated by one call, temporaries included, as traced by tracemalloc
+    """
+    func()      # warm up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func()
+        times.append(time.perf_counter_ns() - start)
+    
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return float(np.median(times)), peak
+
+
+def run(sizes, densities, repeat, seed=0, dtype=np.float64):
+    results = {}
+    # float64 keys carry no suffix, so older baselines still compare
+    suffix = "" if np.dtype(dtype) == np.float64 else f"/{np.dtype(dtype)}"
+    print(f"{'case':<44}{'ns/cell':>10}{'/s':>13}{'peak B/cell':>14}"
+          f"{'peak KiB':>11}")
+    for N in sizes:
+        for density in densities:
+            rng = np.random.default_rng(seed)
+            cases = kernel_cases(N, density, rng, dtype)
+            solver = make_solver(N, density, rng, dtype)
+            cases.append(("Solver.solve", solver.solve))
+            
+            for name, func in cases:
+                ns, peak = measure(func, repeat)
+                cells = N * N
+                key = f"{name}/N={N}/walls={density}{suffix}"
+                results[key] = {
+                    "ns_per_cell": ns / cells,
+                    "per_sec": 1e9 / ns,
+                    "peak_bytes": peak,
+                    "peak_bytes_per_cell": peak / cells,
+                }
+                print(f"{key:<44}{ns / cells:>10.2f}{1e9 / ns:>13.1f}"
+                      f"{peak / cells:>14.1f}{peak / 1024:>11.1f}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Names of the results slower than baseline by more than threshold
+    """
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result["ns_per_cell"] / baseline[key]["ns_per_cell"]
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            print(f"REGRESSION {key}: {ratio:.2f}x baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solver kernel benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", 
+                        default=[64, 128, 256, 512])
+    parser.add_argument("--walls", type=float, nargs="+", default=[0.0, 0.1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", help="write results to this JSON baseline")
+    parser.add_argument("--compare", help="JSON baseline to check against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown before failing (0.2 = 20%%)")
+    parser.add_argument("--dtype", default="float64", 
+                        choices=["float64", "float32"])
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.walls, args.repeat, dtype=args.dtype)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({"machine": platform.platform(), 
+                       "python": platform.python_version(),
+                       "numpy": np.__version__, 
+                       "results": results}, file, indent=2)
+    
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+################################################################################
+##
+##  File: Brush.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the Brush class, which applies a time step's brush
+##                stroke (smoke and velocity) to the Fluid. Has no pygame
+##                dependency so recorded input can be replayed headless
+##
+################################################################################
+
+
+import numpy as np
+
+
+class Brush:
+    def __init__(self, gui_spec, solver):
+        self.solver = solver
+        self.fluid = solver.fluid
+        self.smoke_strength = gui_spec["smoke_strength"]
+
+        # stamp offsets, cached for the radius (in cells) they were made with
+        self.origin_brush = None
+        self.origin_brush_rad = None
+    
+    def __call__(self, centres, rad, delta_pos, l_press, r_press):
+        """
+        Stamp a brush of radius rad (cells) at each of centres ([row, col] 
+        indices) along this time step's stroke
+        Both are in display cells, which are finer than the grid's by the 
+        Fluid's display_factor when it is refined or the smoke is held at a 
+        finer resolution
+        """
+        if not (l_press or r_press):
+            return
+        
+        n_stamps = len(centres)
+        smoke_centres, smoke_rad = centres, rad
+        factor = self.fluid.display_factor
+        if factor > 1:
+            centres = np.asarray(centres) / factor
+            rad = max(1, rad // factor)
+        
+        # TODO: toggle velocity and smoke interaction (ie should be 
+        # able to do one without the other)
+        brush_pos, weights = self.stroke_footprint(centres, rad)
+        if not weights.size:
+            return
+
+        if l_press:
+            if self.fluid.smoke_factor > 1:
+                smoke_pos, smoke_weights = self.stroke_footprint(
+                    smoke_centres, smoke_rad, self.fluid.smoke_factor)
+            else:
+                smoke_pos, smoke_weights = brush_pos, weights
+            self.add_smoke(smoke_pos, smoke_weights / n_stamps)
+            if self.fluid.particles is not None:
+                self.fluid.particles.emit_cells(brush_pos)
+        self.push_fluid(brush_pos, delta_pos)
+
+        self.fluid.derived.invalidate()
+
+    def get_origin_brush(self, rad):
+        if rad != self.origin_brush_rad:
+            linspace = np.arange(-rad, rad) + 0.5
+            X, Y = np.meshgrid(linspace, linspace)
+            in_brush = X*X + Y*Y <= rad**2
+            origin_brush = np.where(in_brush)
+            self.origin_brush = origin_brush[0] - rad, origin_brush[1] - rad
+            self.origin_brush_rad = rad
+        return self.origin_brush
+    
+    def stroke_footprint(self, centres, rad, scale=1):
+        """
+        Cells covered by the brush stamped at each of centres, and how many 
+        stamps cover each of them, on the grid refined by scale
+        Stamps centred outside the domain or in a wall are dropped
+        """
+        Ny, Nx = self.fluid.Ny * scale, self.fluid.Nx * scale
+        centres = np.floor(centres).astype(int)
+        inside = ((0 <= centres[:, 0]) & (centres[:, 0] < Ny) 
+                & (0 <= centres[:, 1]) & (centres[:, 1] < Nx))
+        centres = centres[inside]
+        centres = centres[self.fluid.walls[centres[:, 0] // scale, 
+                                           centres[:, 1] // scale] == 0]
+
+        brush = self.get_origin_brush(rad)
+        rows = (centres[:, :1] + brush[0]).ravel()
+        cols = (centres[:, 1:] + brush[1]).ravel()
+        inside = (0 <= rows) & (rows < Ny) & (0 <= cols) & (cols < Nx)
+        
+        cells, weights = np.unique(rows[inside] * Nx + cols[inside], 
+                                   return_counts=True)
+        return (cells // Nx, cells % Nx), weights
+
+    def add_smoke(self, brush_pos, weights=1):
+        # weights is the fraction of this time step's stamps covering each 
+        # cell, which keeps the smoke added per time step constant
+        # dividing by base_size^2 ensures constant smoke addition 
+        # per unit area
+        smoke = self.smoke_strength * weights / self.fluid.base_size**2
+        self.fluid.d[brush_pos] += smoke
+        if self.fluid.quadtree is not None:
+            self.fluid.quadtree.stamp("d", brush_pos, smoke, add=True)
+        if self.fluid.smoke_tiles is not None:
+            self.fluid.smoke_tiles.activate(brush_pos)
+    
+    def push_fluid(self, brush_pos, delta_pos):
+        # the mouse moves delta_pos per rendered frame, not per substep
+        # (scaled by the display cell size, so refinement doesn't change it)
+        factor = self.fluid.display_factor
+        u = delta_pos[0] * self.fluid.dx / factor / self.solver.frame_dt
+        v = delta_pos[1] * self.fluid.dy / factor / self.solver.frame_dt
+        self.fluid.u[brush_pos] = u
+        self.fluid.v[brush_pos] = v
+        if self.fluid.quadtree is not None:
+            self.fluid.quadtree.stamp("u", brush_pos, u)
+            self.fluid.quadtree.stamp("v", brush_pos, v)
@@ -0,0 +1,220 @@
+################################################################################
+##
+##  File: Checkpoint.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the Checkpointer class, which periodically saves the
+##                Fluid state in a background thread, and the versioned checkpoint
+##                file format, which is reloaded with np.memmap
+##
+################################################################################
+
+
+import os
+import json
+import struct
+import threading
+import numpy as np
+
+
+MAGIC = b"FSCP"
+VERSION = 1
+ALIGN = 64
+
+# file: MAGIC, version (uint16), JSON metadata length (uint32), JSON metadata,
+#       then each array C-contiguous at the 64 byte aligned offset given in 
+#       the metadata
+HEADER = struct.Struct("<4sHI")
+
+FIELDS = ("u", "v", "p", "d", "walls")
+
+# arrays are written a block of rows at a time, so memory-mapped ones are 
+# never read into memory whole
+WRITE_BYTES = 1 << 24
+
+
+def write_checkpoint(path, arrays, t, step, spec):
+    """
+    Write arrays (dict of name: ndarray) and the time, step and spec to path
+    The file is written alongside and renamed, so path is never half written
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {"offset": offset, "shape": list(array.shape), 
+                        "dtype": array.dtype.str}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+    
+    meta = json.dumps({"t": t, "step": step, "spec": spec, "arrays": layout}, 
+                      default=str).encode()
+    data_start = -(-(HEADER.size + len(meta)) // ALIGN) * ALIGN
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(meta)))
+        file.write(meta)
+        for name, array in arrays.items():
+            file.seek(data_start + layout[name]["offset"])
+            rows = max(1, WRITE_BYTES // max(array[:1].nbytes, 1))
+            for start in range(0, max(len(array), 1), rows):
+                file.write(np.ascontiguousarray(array[start:start + rows])
+                           .tobytes())
+        file.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, mode="c"):
+    """
+    Map the arrays in the checkpoint at path without reading them
+    The default copy-on-write mode lets the arrays be modified without 
+    changing the file
+    Returns (metadata, dict of name: np.memmap)
+    """
+    with open(path, "rb") as file:
+        magic, version, meta_len = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} checkpoint")
+        meta = json.loads(file.read(meta_len))
+    
+    data_start = -(-(HEADER.size + meta_len) // ALIGN) * ALIGN
+    arrays = {
+        name: np.memmap(path, dtype=np.dtype(a["dtype"]), mode=mode, 
+                        offset=data_start + a["offset"], shape=tuple(a["shape"]))
+        for name, a in meta["arrays"].items()
+    }
+    return meta, arrays
+
+
+class Checkpointer:
+    def __init__(self, cp_spec, spec, solver):
+        self.every = cp_spec["every"]
+        self.keep = cp_spec["keep"]
+        self.dir = cp_spec["dir"]
+        self.spec = spec
+        self.solver = solver
+        self.fluid = solver.fluid
+
+        self.next_step = self.every
+        self.thread = None
+        # with memmap storage, files in the storage dir the fields are copied 
+        # to, a band at a time, for the thread to write from
+        self.snapshot = None
+    
+    def __call__(self):
+        if not self.every or self.solver.step < self.next_step:
+            return
+        self.next_step = self.solver.step + self.every
+        
+        # a slow disk shouldn't stall the solver: skip rather than queue
+        if self.thread is not None and self.thread.is_alive():
+            self.solver.log("Checkpoint skipped, previous still writing",
+                            warning=True, key="checkpoint_skipped")
+            return
+        
+        if self.fluid.bands is None:
+            snapshot = {name: getattr(self.fluid, name).copy() 
+                        for name in FIELDS}
+        else:
+            snapshot = self.copy_to_snapshot()
+        self.thread = threading.Thread(
+            target=self.write, 
+            args=(snapshot, self.solver.t, self.solver.step), 
+            daemon=True)
+        self.thread.start()
+    
+    def copy_to_snapshot(self):
+        """
+        Copy the memory-mapped fields to the snapshot files, band by band
+        """
+        if self.snapshot is None:
+            self.snapshot = {
+                name: self.fluid.allocate(
+                    f"checkpoint_{name}", getattr(self.fluid, name).shape, 
+                    getattr(self.fluid, name).dtype) 
+                for name in FIELDS}
+        
+        rows = self.fluid.bands.rows
+        for name, target in self.snapshot.items():
+            source = getattr(self.fluid, name)
+            for start in range(0, source.shape[0], rows):
+                target[start:start + rows] = source[start:start + rows]
+        return self.snapshot
+
+    def write(self, snapshot, t, step):
+        os.makedirs(self.dir, exist_ok=True)
+        path = os.path.join(self.dir, f"{self.spec['name']}_{step:08d}.fsc")
+        write_checkpoint(path, snapshot, t, step, self.spec)
+        self.rotate()
+    
+    def rotate(self):
+        """
+        Delete all but the newest self.keep checkpoints
+        """
+        if not self.keep:
+            return
+        
+        prefix = f"{self.spec['name']}_"
+        checkpoints = sorted(f for f in os.listdir(self.dir) 
+                             if f.startswith(prefix) and f.endswith(".fsc"))
+        for fname in checkpoints[:-self.keep]:
+            os.remove(os.path.join(self.dir, fname))
+    
+    def close(self):
+        if self.thread is not None:
+            self.thread.join()
+    
+    def restart(self, path):
+        """
+        Continue from the checkpoint at path: the Fluid's fields are mapped 
+        from the file (copy-on-write) rather than read into memory, unless 
+        they live in shared memory or memory-mapped storage
+        """
+        meta, arrays = load_checkpoint(path)
+        
+        for name, array in arrays.items():
+            if array.shape != getattr(self.fluid, name).shape:
+                raise ValueError(f"Checkpoint {path} has {name} of shape "
+                                 f"{array.shape}, expected "
+                                 f"{getattr(self.fluid, name).shape}")
+            if self.fluid.shared is not None or self.fluid.bands is not None:
+                # the shared blocks stay where clients expect them, and 
+                # memory-mapped fields are copied file to file (copy-on-write 
+                # pages of a grid larger than memory would all end up in it)
+                getattr(self.fluid, name)[...] = array
+            else:
+                setattr(self.fluid, name, array)
+        
+        self.fluid.set_wall_indices()
+        self.fluid.derived.invalidate()
+        if self.fluid.smoke_tiles is not None:
+            self.fluid.smoke_tiles.refresh()
+        if self.fluid.quadtree is not None:
+            self.fluid.quadtree.refresh()
+
+        self.solver.t = meta["t"]
+        self.solver.step = meta["step"]
+        self.solver.frame = round(self.solver.t / self.solver.frame_dt)
+        self.next_step = self.solver.step + self.every
+        self.solver.log(f"Restarted from {path} at t = {self.solver.t:.4g}")
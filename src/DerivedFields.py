@@ -0,0 +1,130 @@
+################################################################################
+##
+##  File: DerivedFields.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the DerivedFields class, a per-step cache of the
+##                quantities derived from the Fluid state (eg. vorticity, speed)
+##
+################################################################################
+
+
+import numpy as np
+
+
+def per_step(method):
+    """
+    Cache the result of a DerivedFields method until the solver step changes
+    """
+    name = method.__name__
+
+    def cached(self):
+        step = self.fluid.solver.step
+        if self.computed_at.get(name) != step:
+            self.values[name] = method(self)
+            self.computed_at[name] = step
+        return self.values[name]
+
+    cached.__name__ = name
+    cached.__doc__ = method.__doc__
+    return cached
+
+
+class DerivedFields:
+    def __init__(self, fluid):
+        self.fluid = fluid
+
+        # output buffers, allocated on first use and reused every step after
+        self.w = None
+        self.div_v = None
+        self.speed_buf = None
+
+        self.values = {}
+        self.computed_at = {}
+
+    def buffer(self, name):
+        if getattr(self, name) is None:
+            setattr(self, name, self.fluid.allocate(
+                f"derived_{name}", (self.fluid.Ny, self.fluid.Nx)))
+        return getattr(self, name)
+
+    def invalidate(self):
+        """
+        Forget everything computed so far, for when the fluid state is changed 
+        between solver steps (eg. by the GUI)
+        """
+        self.computed_at.clear()
+
+    @per_step
+    def vorticity(self):
+        """
+        z-component of the curl of (u, v), zero on the domain edges
+        """
+        f = self.fluid
+        w = self.buffer("w")
+        np.subtract(f.v[1:-1, 2:], f.v[1:-1, :-2], out=w[1:-1, 1:-1])
+        w[1:-1, 1:-1] /= 2 * f.dx
+        w[1:-1, 1:-1] -= (f.u[2:, 1:-1] - f.u[:-2, 1:-1]) / (2 * f.dy)
+        return w
+
+    @per_step
+    def divergence(self):
+        """
+        Divergence of (u, v), zero on the domain edges
+        """
+        f = self.fluid
+        div_v = self.buffer("div_v")
+        div_v[1:-1, 1:-1] = f.div(f.u, f.v)
+        return div_v
+
+    @per_step
+    def speed(self):
+        return np.hypot(self.fluid.u, self.fluid.v, 
+                        out=self.buffer("speed_buf"))
+
+    @per_step
+    def max_speed(self):
+        f = self.fluid
+        if f.bands is not None:
+            return f.bands.max(lambda rows: np.hypot(f.u[rows], f.v[rows]))
+        return float(self.speed().max())
+
+    @per_step
+    def kinetic_energy(self):
+        f = self.fluid
+        s = self.speed()
+        return 0.5 * f.rho * float(np.vdot(s, s)) * f.dx * f.dy
+
+    @per_step
+    def max_smoke(self):
+        return float(self.fluid.d.max())
+
+    @per_step
+    def divergence_norm(self):
+        """
+        RMS divergence over the inner domain
+        """
+        div_v = self.divergence()[1:-1, 1:-1]
+        return float(np.sqrt(np.vdot(div_v, div_v) / div_v.size))
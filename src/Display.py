@@ -37,6 +37,7 @@ import numpy as np
 import pygame as pg
 
 from src.VideoWriter import VideoWriter
+from src.FrameServer import FrameServer
 
 
 class Display:
@@ -57,7 +58,10 @@ class Display:
 
         self.Nx = int(config["domain"]["width"] / config["domain"]["base_size"])
         self.Ny = int(config["domain"]["height"] / config["domain"]["base_size"])
-        self.pxarray = np.zeros((self.Ny, self.Nx, 3), dtype=float)
+        self.pxarray = solver.fluid.allocate("pxarray", (self.Ny, self.Nx, 3))
+        if solver.fluid.shared is not None and config["share"]["pxarray"]:
+            self.pxarray = solver.fluid.shared.share("pxarray", self.pxarray, 
+                                                     group="pxarray")
         
         self.sf = None
         self.blit_offset = None
@@ -72,14 +76,26 @@ class Display:
         self.fluid = solver.fluid
 
         self.videowriter = VideoWriter(config["videowriter"], self)
+        self.frame_server = FrameServer(config["stream"])
 
     def __call__(self):
-        self.update_pxarray()
-        self.videowriter.save_frame()
+        shared = self.fluid.shared
+        if shared is not None:
+            shared.begin("pxarray")
+        time = self.solver.profiler.time
+        time("update_pxarray", self.update_pxarray)
+        if shared is not None:
+            shared.end("pxarray")
+
+        self.frame_server.publish(self.pxarray)
+        time("save_frame", self.videowriter.save_frame)
         if self.pygame and self.show_live:
-            self.window.fill(self.background_colour)
-            self.blit_pxarray()
-            pg.display.update()
+            time("blit", self.blit)
+    
+    def blit(self):
+        self.window.fill(self.background_colour)
+        self.blit_pxarray()
+        pg.display.update()
     
     def update_transformation(self, event=None):
         if event is not None:
@@ -104,8 +120,9 @@ class Display:
 
         self.draw_smoke()
         self.draw_vorticity()
+        self.draw_particles()
 
-        self.pxarray = np.clip(self.pxarray, 0, 255)
+        np.clip(self.pxarray, 0, 255, out=self.pxarray)
 
 
     def blit_pxarray(self, colourkey=None):
@@ -134,15 +151,28 @@ class Display:
 # ---------------------------------------------------------------------------- #
 
     def draw_smoke(self):
-        if self.show_smoke:
-            self.pxarray += np.expand_dims(self.fluid.d, axis=2)
+        if not self.show_smoke:
+            return
+        
+        # held at display resolution, but rounded up to whole grid cells
+        d = self.fluid.d if self.fluid.quadtree is None \
+            else self.fluid.quadtree.composite("d", self.pxarray.shape[:2])
+        self.pxarray += np.expand_dims(d[:self.Ny, :self.Nx], axis=2)
     
     def draw_vorticity(self):
         if self.visualisation == "vorticity":
-            w = ((self.fluid.u[:-2, 1:-1] 
-                - self.fluid.u[2:, 1:-1]) / self.fluid.dx
-            + (self.fluid.v[1:-1, 2:] 
-                - self.fluid.v[1:-1, :-2]) / self.fluid.dy) * 5
+            if self.fluid.quadtree is not None:
+                w = self.fluid.quadtree.composite("vorticity", 
+                                                  self.pxarray.shape[:2])
+            elif self.fluid.smoke_factor > 1:
+                w = self.fluid.upsample(self.fluid.derived.vorticity())
+            else:
+                w = self.fluid.derived.vorticity()
+            w = w[1:self.Ny-1, 1:self.Nx-1] * 10
 
             self.pxarray[1:-1, 1:-1, 0] += np.clip(w, 0, 255)
             self.pxarray[1:-1, 1:-1, 1] += np.clip(-w, 0, 255)
+    
+    def draw_particles(self):
+        if self.fluid.particles is not None:
+            self.fluid.particles.splat(self.pxarray)
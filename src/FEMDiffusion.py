@@ -0,0 +1,251 @@
+################################################################################
+##
+##  File: FEMDiffusion.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements linear (P1) finite element diffusion on triangular 
+##                meshes, grown from theory/reference_tri.py: batched element 
+##                matrices, CSR assembly through a cached scatter map and 
+##                cached backward Euler factorizations, plus an adapter that 
+##                triangulates the Fluid's grid to act as its diffusion solver
+##
+################################################################################
+
+
+import hashlib
+import warnings
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from collections import OrderedDict
+
+from src.ImplicitDiffusion import held_nbytes
+
+
+# trial functions on the reference triangle (0, 0), (1, 0), (0, 1): row i 
+# holds (alpha_i, beta_i, gamma_i) of phi_i = alpha_i + beta_i x + gamma_i y
+ALPHA = np.array([[1, -1, -1],
+                  [0,  1,  0],
+                  [0,  0,  1]], dtype=float)
+
+# get_sigma_ij as a bilinear form: sigma_ij = Alpha[i] @ SIGMA_FORM @ Alpha[j]
+SIGMA_FORM = np.array([[1/2,  1/6,  1/6],
+                       [1/6,  1/12, 1/24],
+                       [1/6,  1/24, 1/12]])
+
+# int phi_i phi_j over the reference triangle (area 1/2)
+REFERENCE_MASS = ALPHA @ SIGMA_FORM @ ALPHA.T
+
+MASSES = ("lumped", "consistent")
+
+# the (row, col) of each of the 9 entries of an element matrix
+LOCAL_ROWS = np.repeat(np.arange(3), 3)
+LOCAL_COLS = np.tile(np.arange(3), 3)
+
+
+class TriangleMesh:
+    def __init__(self, nodes, triangles):
+        """
+        nodes (n, 2) coordinates, triangles (m, 3) node indices
+        """
+        self.nodes = np.asarray(nodes, dtype=float)
+        self.triangles = np.asarray(triangles, dtype=np.int32)
+        self.n_nodes = len(self.nodes)
+        self.n_elements = len(self.triangles)
+
+        self.area = None
+        self.gradients = None
+        self.geometry()
+
+        # sparsity pattern shared by every matrix on the mesh, and where each 
+        # element matrix entry is summed into its data
+        self.indptr = self.indices = self.scatter = None
+        self.pattern()
+    
+    def geometry(self):
+        """
+        Area of each element and the (physical) gradients of its trial 
+        functions, mapped from the reference triangle
+        """
+        P = self.nodes[self.triangles]                          # (m, 3, 2)
+        J = np.stack((P[:, 1] - P[:, 0], P[:, 2] - P[:, 0]), axis=2)
+        det = J[:, 0, 0] * J[:, 1, 1] - J[:, 0, 1] * J[:, 1, 0]
+        inv_J = np.stack((np.stack((J[:, 1, 1], -J[:, 0, 1]), axis=1),
+                          np.stack((-J[:, 1, 0], J[:, 0, 0]), axis=1)), 
+                         axis=1) / det[:, None, None]
+
+        self.area = np.abs(det) / 2
+        # grad phi_i = inv(J)^T (beta_i, gamma_i)
+        self.gradients = np.einsum("ik,ekd->eid", ALPHA[:, 1:], inv_J)
+
+    def pattern(self):
+        rows = self.triangles[:, LOCAL_ROWS].ravel().astype(np.int64)
+        cols = self.triangles[:, LOCAL_COLS].ravel()
+        keys, self.scatter = np.unique(rows * self.n_nodes + cols, 
+                                       return_inverse=True)
+        self.indices = (keys % self.n_nodes).astype(np.int32)
+        self.indptr = np.zeros(self.n_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // self.n_nodes, minlength=self.n_nodes), 
+                  out=self.indptr[1:])
+    
+    def assemble(self, element_matrices):
+        """
+        CSR matrix summed from element_matrices (m, 3, 3)
+        """
+        data = np.bincount(self.scatter, weights=element_matrices.ravel(), 
+                           minlength=len(self.indices))
+        return sp.csr_matrix((data, self.indices, self.indptr), 
+                             shape=(self.n_nodes, self.n_nodes))
+
+    def stiffness_elements(self):
+        # int grad phi_i . grad phi_j
+        return (self.area[:, None, None] 
+                * np.einsum("eid,ejd->eij", self.gradients, self.gradients))
+    
+    def mass_elements(self):
+        # int phi_i phi_j, the reference mass scaled by the element's area
+        return (2 * self.area)[:, None, None] * REFERENCE_MASS
+
+    def stiffness(self):
+        return self.assemble(self.stiffness_elements())
+
+    def mass(self, lumped=False):
+        M = self.assemble(self.mass_elements())
+        if lumped:
+            return sp.diags(np.asarray(M.sum(axis=1)).ravel(), format="csr")
+        return M
+
+
+def grid_mesh(shape, dx, dy):
+    """
+    Triangulate the cell centres of a grid of shape, two triangles per block 
+    of 4, numbering the nodes as the flattened grid
+    """
+    Ny, Nx = shape
+    IY, IX = np.mgrid[:Ny, :Nx]
+    nodes = np.column_stack((IX.ravel() * dx, IY.ravel() * dy))
+
+    corner = (IY[:-1, :-1] * Nx + IX[:-1, :-1]).ravel()
+    triangles = np.concatenate((
+        np.column_stack((corner, corner + 1, corner + Nx + 1)),
+        np.column_stack((corner, corner + Nx + 1, corner + Nx)),
+    ))
+    return TriangleMesh(nodes, triangles)
+
+
+class FEMDiffusion:
+    def __init__(self, mesh, mass="lumped", cache_size=8, cache=None, 
+                 name=None):
+        self.mesh = mesh
+        if mass not in MASSES:
+            warnings.warn(f"FEM mass '{mass}' not recognised, using 'lumped'")
+            mass = "lumped"
+        self.K = mesh.stiffness()
+        self.M = mesh.mass(lumped=mass == "lumped")
+        # (name, nu, dt, fixed nodes hash): factorized system; engines on 
+        # different meshes can share one cache, told apart by name
+        self.cache = OrderedDict() if cache is None else cache
+        self.cache_size = cache_size
+        self.name = name
+    
+    def nbytes(self, systems=True):
+        """
+        Bytes held by the mesh and matrices, and the cached systems
+        """
+        return (held_nbytes(vars(self.mesh), self.K, self.M) 
+                + (held_nbytes(list(self.cache.values())) if systems else 0))
+
+    def __call__(self, D, fixed, nu, dt):
+        """
+        Backward Euler step (M + nu dt K) D_new = M D of the nodal values D, 
+        holding the nodes where fixed (bool mask) at their values
+        """
+        solve, free, M_free, A_fixed = self.system(fixed, nu, dt)
+        rhs = M_free @ D - A_fixed @ D[~free]
+        
+        D_new = D.copy()
+        D_new[free] = solve(rhs)
+        return D_new
+    
+    def system(self, fixed, nu, dt):
+        key = (self.name, nu, dt, hashlib.blake2b(np.packbits(fixed).tobytes(), 
+                                       digest_size=16).digest())
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        
+        free = ~fixed
+        A = (self.M + nu * dt * self.K).tocsr()
+        A_free = A[free]
+        system = (spla.factorized(A_free[:, free].tocsc()), free, 
+                  self.M[free], A_free[:, fixed])
+        
+        self.cache[key] = system
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return system
+
+
+class GridFEMDiffusion:
+    def __init__(self, dx, dy, mass="lumped", cache_size=8):
+        self.dx = dx
+        self.dy = dy
+        self.mass = mass
+        self.cache_size = cache_size
+        # one engine per grid shape (sparse smoke regions and bands vary), 
+        # all sharing one cache of factorized systems, so at most cache_size 
+        # of those (the costly part) are held however many shapes are seen
+        self.engines = OrderedDict()
+        self.systems = OrderedDict()
+    
+    def nbytes(self):
+        # the engines share the systems cache, so it is counted once
+        return (sum(engine.nbytes(systems=False) 
+                    for engine in self.engines.values())
+                + held_nbytes(list(self.systems.values())))
+
+    def __call__(self, D, fluid_domain, nu, dt):
+        """
+        Diffuse the scalar field D over the inner fluid cells (fluid_domain: 
+        a mask of D[1:-1, 1:-1], or Ellipsis for all of them), holding the 
+        other cells' values fixed, as ImplicitDiffusion does
+        """
+        fixed = np.ones(D.shape, dtype=bool)
+        fixed[1:-1, 1:-1][fluid_domain] = False
+        
+        D_new = self.engine(D.shape)(D.ravel(), fixed.ravel(), nu, dt)
+        return D_new.reshape(D.shape).astype(D.dtype, copy=False)
+    
+    def engine(self, shape):
+        if shape in self.engines:
+            self.engines.move_to_end(shape)
+            return self.engines[shape]
+        
+        engine = FEMDiffusion(grid_mesh(shape, self.dx, self.dy), self.mass, 
+                              self.cache_size, self.systems, shape)
+        self.engines[shape] = engine
+        if len(self.engines) > self.cache_size:
+            self.engines.popitem(last=False)
+        return engine
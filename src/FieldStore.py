@@ -0,0 +1,282 @@
+################################################################################
+##
+##  File: FieldStore.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the FieldWriter and FieldReader classes, which append
+##                downsampled, quantised and compressed Fluid fields to a chunked
+##                time-series file and read back time ranges and sub-rectangles
+##
+################################################################################
+
+
+import os
+import json
+import lzma
+import zlib
+import queue
+import struct
+import threading
+import numpy as np
+
+
+MAGIC = b"FSTS"
+VERSION = 1
+
+# file:    MAGIC, version (uint16), JSON metadata length (uint32), JSON 
+#          metadata, then chunks, then (once closed) the index and TRAILER
+# chunk:   CHUNK header, then the compressed tile of one field at one frame
+# trailer: index offset (uint64), index length (uint64), MAGIC
+HEADER = struct.Struct("<4sHI")
+CHUNK_MARK = b"CK"
+CHUNK = struct.Struct("<2sIdBHHI")  # mark, frame, t, field, row, col, size
+TRAILER = struct.Struct("<QQ4s")
+
+# index: one entry per chunk, its CHUNK header plus where its data starts
+INDEX_DTYPE = np.dtype([("frame", "<u4"), ("t", "<f8"), ("field", "u1"), 
+                        ("row", "<u2"), ("col", "<u2"), 
+                        ("offset", "<u8"), ("size", "<u4")])
+
+CODECS = {
+    "none": (lambda data, level: data, lambda data: data),
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lambda data, level: lzma.compress(data, preset=level), 
+             lzma.decompress),
+}
+
+
+class FieldWriter:
+    def __init__(self, out_spec, solver):
+        self.every = out_spec["every"]
+        if not self.every:
+            return
+        self.solver = solver
+        self.fluid = solver.fluid
+
+        self.fields = out_spec["fields"]
+        self.stride = out_spec["stride"]
+        self.dtype = np.dtype(out_spec["dtype"])
+        self.tile_size = out_spec["tile_size"]
+        self.level = out_spec["level"]
+        self.compress = CODECS[out_spec["compression"]][0]
+
+        shape = self.fluid.u[::self.stride, ::self.stride].shape
+        meta = json.dumps({
+            "fields": self.fields, "shape": shape, "stride": self.stride, 
+            "dtype": self.dtype.str, "tile_size": self.tile_size, 
+            "compression": out_spec["compression"],
+            "dx": self.fluid.dx * self.stride, 
+            "dy": self.fluid.dy * self.stride,
+        }).encode()
+
+        path = out_spec["path"]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(meta)))
+        self.file.write(meta)
+
+        self.index = []
+        self.frame = 0
+        self.next_step = 0
+        # the writer thread's exception, raised in the solver's thread
+        self.error = None
+
+        # bounded, so a writer that falls behind holds the solver back 
+        # rather than filling memory
+        self.queue = queue.Queue(maxsize=8)
+        self.thread = threading.Thread(target=self.writer, daemon=True)
+        self.thread.start()
+    
+    def __call__(self):
+        if not self.every or self.solver.step < self.next_step:
+            return
+        self.next_step = self.solver.step + self.every
+        self.raise_error()
+
+        # astype copies, so the snapshot is safe from the next step
+        # (smoke held at a finer resolution is strided down to the grid's)
+        # memory-mapped fields aren't copied into memory: the writer reads 
+        # them a row of tiles at a time while the solver waits
+        snapshot = []
+        for name in self.fields:
+            stride = self.stride * (self.fluid.smoke_factor if name == "d" 
+                                    else 1)
+            field = getattr(self.fluid, name)[::stride, ::stride]
+            snapshot.append(field if self.fluid.bands is not None 
+                            else field.astype(self.dtype))
+        if not self.thread.is_alive():
+            raise RuntimeError("Field writer thread has stopped")
+        self.queue.put((self.frame, self.solver.t, snapshot))
+        self.frame += 1
+        if self.fluid.bands is not None:
+            self.queue.join()
+            self.raise_error()
+    
+    def raise_error(self):
+        if self.error is not None:
+            raise self.error
+    
+    def writer(self):
+        # after an error the remaining frames are dropped, so the solver 
+        # never waits on a full queue; the error is raised in its thread
+        while (item := self.queue.get()) is not None:
+            if self.error is None:
+                try:
+                    self.write(*item)
+                except Exception as error:
+                    self.error = error
+            self.queue.task_done()
+    
+    def write(self, frame, t, snapshot):
+        T = self.tile_size
+        for field, array in enumerate(snapshot):
+            for r in range(0, array.shape[0], T):
+                tiles = np.asarray(array[r:r+T], dtype=self.dtype)
+                for c in range(0, array.shape[1], T):
+                    data = self.compress(
+                        np.ascontiguousarray(tiles[:, c:c+T]).tobytes(), 
+                        self.level)
+                    self.file.write(CHUNK.pack(CHUNK_MARK, frame, t, field,
+                                               r // T, c // T, len(data)))
+                    self.index.append((frame, t, field, r // T, c // T, 
+                                       self.file.tell(), len(data)))
+                    self.file.write(data)
+    
+    def close(self):
+        """
+        Finish writing and add the index, or (if the writer failed, leaving 
+        the chunks for FieldReader to recover) raise its error
+        """
+        if not self.every or self.file.closed:
+            return
+        
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+        if self.error is None:
+            index = np.array(self.index, dtype=INDEX_DTYPE)
+            offset = self.file.tell()
+            self.file.write(index.tobytes())
+            self.file.write(TRAILER.pack(offset, index.nbytes, MAGIC))
+        self.file.close()
+        self.raise_error()
+
+
+class FieldReader:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        magic, version, meta_len = HEADER.unpack(self.file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} field store")
+        
+        self.meta = json.loads(self.file.read(meta_len))
+        self.fields = self.meta["fields"]
+        self.shape = tuple(self.meta["shape"])
+        self.dtype = np.dtype(self.meta["dtype"])
+        self.tile_size = self.meta["tile_size"]
+        self.decompress = CODECS[self.meta["compression"]][1]
+
+        self.index = self.read_index(HEADER.size + meta_len)
+        frames, first = np.unique(self.index["frame"], return_index=True)
+        self.times = self.index["t"][first]
+    
+    def read_index(self, data_start):
+        """
+        Read the index from the end of the file, or rebuild it from the chunk 
+        headers if the writer never closed it
+        """
+        size = self.file.seek(0, os.SEEK_END)
+        if size >= data_start + TRAILER.size:
+            self.file.seek(size - TRAILER.size)
+            offset, nbytes, magic = TRAILER.unpack(self.file.read(TRAILER.size))
+            if magic == MAGIC and offset + nbytes + TRAILER.size == size:
+                self.file.seek(offset)
+                return np.frombuffer(self.file.read(nbytes), dtype=INDEX_DTYPE)
+        
+        index = []
+        position = data_start
+        while position + CHUNK.size <= size:
+            self.file.seek(position)
+            mark, frame, t, field, r, c, n = CHUNK.unpack(
+                self.file.read(CHUNK.size))
+            position += CHUNK.size
+            if (mark != CHUNK_MARK or field >= len(self.fields) 
+                or position + n > size):
+                break
+            index.append((frame, t, field, r, c, position, n))
+            position += n
+        return np.array(index, dtype=INDEX_DTYPE)
+    
+    def read(self, field, t_range=None, rows=slice(None), cols=slice(None)):
+        """
+        Load field for the frames with t_range[0] <= t <= t_range[1] (default: 
+        all), restricted to rows and cols (slices of the stored grid)
+        Only the chunks overlapping the request are read
+        Returns (times, array of shape (frames, rows, cols))
+        """
+        T = self.tile_size
+        rows = range(*rows.indices(self.shape[0]))
+        cols = range(*cols.indices(self.shape[1]))
+        
+        frames = np.arange(len(self.times))
+        if t_range is not None:
+            frames = frames[(t_range[0] <= self.times) 
+                            & (self.times <= t_range[1])]
+        
+        out = np.zeros((len(frames), len(rows), len(cols)), dtype=self.dtype)
+        if not (len(frames) and len(rows) and len(cols)):
+            return self.times[frames], out
+        
+        r0, r1 = rows[0], rows[-1] + 1
+        c0, c1 = cols[0], cols[-1] + 1
+        entries = self.index[
+            (self.index["field"] == self.fields.index(field))
+            & np.isin(self.index["frame"], frames)
+            & (self.index["row"] >= r0 // T) & (self.index["row"] <= (r1-1) // T)
+            & (self.index["col"] >= c0 // T) & (self.index["col"] <= (c1-1) // T)
+        ]
+        
+        # the full-resolution rectangle covered by the requested rows/cols
+        block = np.zeros((r1 - r0, c1 - c0), dtype=self.dtype)
+        for i, frame in enumerate(frames):
+            for e in entries[entries["frame"] == frame]:
+                self.file.seek(e["offset"])
+                ty, tx = e["row"] * T, e["col"] * T
+                h = min(T, self.shape[0] - ty)
+                w = min(T, self.shape[1] - tx)
+                tile = np.frombuffer(self.decompress(self.file.read(e["size"])), 
+                                     dtype=self.dtype).reshape(h, w)
+                
+                y0, x0 = max(ty, r0), max(tx, c0)
+                y1, x1 = min(ty + h, r1), min(tx + w, c1)
+                block[y0-r0:y1-r0, x0-c0:x1-c0] = tile[y0-ty:y1-ty, x0-tx:x1-tx]
+            
+            out[i] = block[::rows.step, ::cols.step]
+        
+        return self.times[frames], out
+    
+    def close(self):
+        self.file.close()
@@ -32,9 +32,21 @@
 ################################################################################
 
 
+import os
+import math
 import numpy as np
 import warnings
 
+from src.DerivedFields import DerivedFields
+from src.SmokeTiles import SmokeTiles
+from src.SharedFields import SharedFields
+from src.RowBands import RowBands
+from src.Obstacles import Obstacles
+from src.Particles import Particles
+from src.ImplicitDiffusion import ImplicitDiffusion
+from src.FEMDiffusion import GridFEMDiffusion
+from src.Quadtree import Quadtree
+
 
 class Fluid:
     def __init__(self, spec, solver) -> None:
@@ -48,32 +60,90 @@ class Fluid:
         self.y_max = spec["domain"]["height"]
         self.base_size = spec["domain"]["base_size"]
 
-        self.Nx = int(np.ceil(self.x_max / self.base_size))
-        self.Ny = int(np.ceil(self.y_max / self.base_size))
-        self.IX, self.IY = np.meshgrid(np.arange(self.Nx), np.arange(self.Ny))
+        # with refinement, the grid here is the coarsest level and base_size 
+        # that of the finest (and of the display); with dual resolution, only 
+        # the smoke is held at base_size
+        refinement = spec["scheme"]["refinement"]
+        dual = spec["scheme"]["dual_resolution"]
+        self.display_factor = 1
+        self.smoke_factor = 1
+        if ((refinement["active"] or dual["active"]) 
+        and spec["storage"]["backend"] == "memmap"):
+            warnings.warn("Refinement and dual resolution are not used with "
+                          "memmap storage")
+        elif refinement["active"]:
+            if dual["active"]:
+                warnings.warn("Dual resolution is not used with refinement")
+            self.display_factor = 2**(refinement["levels"] - 1)
+        elif dual["active"]:
+            self.smoke_factor = dual["factor"]
+            self.display_factor = self.smoke_factor
+        cell_size = self.base_size * self.display_factor
+
+        self.Nx = int(np.ceil(self.x_max / cell_size))
+        self.Ny = int(np.ceil(self.y_max / cell_size))
+        self.dtype = solver.dtype
+
+        # coordinates are kept 1D, shaped to broadcast against the fields 
+        # (IX is a row, IY a column) rather than as full meshgrids
+        self.IX = np.arange(self.Nx, dtype=np.int32)[None, :]
+        self.IY = np.arange(self.Ny, dtype=np.int32)[:, None]
 
-        self.x_lin = np.linspace(0, self.x_max, self.Nx, endpoint=False)
-        self.y_lin = np.linspace(0, self.y_max, self.Ny, endpoint=False)
-        self.X, self.Y = np.meshgrid(self.x_lin, self.y_lin)
+        self.x_lin = np.linspace(0, self.x_max, self.Nx, endpoint=False, 
+                                 dtype=self.dtype)
+        self.y_lin = np.linspace(0, self.y_max, self.Ny, endpoint=False, 
+                                 dtype=self.dtype)
+        self.X = self.x_lin[None, :]
+        self.Y = self.y_lin[:, None]
 
         self.dx = self.x_max / self.Nx
         self.dy = self.y_max / self.Ny
 
-        self.walls = np.zeros((self.Ny, self.Nx))
-        self.where_wall = np.where(self.walls)
-        self.where_fluid = np.where(1 - self.walls)
-        self.where_inner_fluid = np.where(1 - self.walls[1:-1, 1:-1])
+        S = self.smoke_factor
+        self.smoke_shape = (self.Ny * S, self.Nx * S)
+        self.smoke_dx = self.dx / S
+        self.smoke_dy = self.dy / S
+        self.smoke_IX = np.arange(self.Nx * S, dtype=np.int32)[None, :]
+        self.smoke_IY = np.arange(self.Ny * S, dtype=np.int32)[:, None]
+        self.upsample_stencil = None
+
+        # fields held in memory, or memory-mapped from files and updated in 
+        # bands of rows for grids larger than memory
+        storage = spec["storage"]
+        self.storage_dir = None
+        self.bands = None
+        if storage["backend"] == "memmap":
+            self.storage_dir = storage["dir"]
+            os.makedirs(self.storage_dir, exist_ok=True)
+            self.bands = RowBands(self, storage["band_rows"])
+        elif storage["backend"] != "memory":
+            warnings.warn(f"Storage backend '{storage['backend']}' not "
+                          "recognised, using 'memory'")
+
+        self.quadtree = None
+        self.walls = self.allocate("walls", (self.Ny, self.Nx), dtype=bool)
+        self.where_wall = None
+        self.where_fluid = None
+        self.where_inner_fluid = None
+        self.where_smoke = None
+        self.where_inner_smoke = None
+        self.obstacles = Obstacles(self, spec["BCs"], spec["obstacles"])
+        self.set_wall_indices()
 
         # Initial conditions
-        self.u = np.zeros((self.Ny, self.Nx))
-        self.U = np.zeros((self.Ny, self.Nx))
+        self.u = self.allocate("u", (self.Ny, self.Nx))
+        self.v = self.allocate("v", (self.Ny, self.Nx))
 
-        self.v = np.zeros((self.Ny, self.Nx))
-        self.V = np.zeros((self.Ny, self.Nx))
+        self.p = self.allocate("p", (self.Ny, self.Nx))
 
-        self.p = np.zeros((self.Ny, self.Nx))
+        self.d = self.allocate("d", self.smoke_shape)
 
-        self.d = np.zeros((self.Ny, self.Nx))
+        # optionally live in named shared memory, for other processes to read
+        self.shared = None
+        if spec["share"]["active"]:
+            self.shared = SharedFields(spec["share"])
+            for name in ("u", "v", "p", "d"):
+                setattr(self, name, self.shared.share(name, getattr(self, name)))
         
         # Properties
         self.rho = fluid_spec["density"]
@@ -82,6 +152,13 @@ class Fluid:
         self.smoke_fade = fluid_spec["smoke_fade"]
 
         self.diffuse = None
+        self.smoke_diffuse = None
+        # the implicit solvers made by diffusion_solver, with their caches
+        self.diffusion_engines = []
+        # they factorize an operator per region shape, so regions that vary 
+        # (sparse smoke runs, quadtree blocks) are grown to canonical shapes
+        self.canonical_regions = self.solver.solver_type in ("BackwardEuler", 
+                                                             "FEM")
         self.set_diffusion_solver()
 
         self.advect = None
@@ -89,15 +166,155 @@ class Fluid:
 
         self.div = None
         self.set_div_function()
+
+        self.derived = DerivedFields(self)
+
+        # smoke transport restricted to tiles where there is smoke
+        self.smoke_tiles = None
+        self.smoke_halo = 0
+        if spec["scheme"]["sparse_smoke"]["active"] and self.bands is not None:
+            warnings.warn("Sparse smoke is not used with memmap storage")
+        elif spec["scheme"]["sparse_smoke"]["active"] and self.smoke_factor > 1:
+            warnings.warn("Sparse smoke is not used with dual resolution")
+        elif spec["scheme"]["sparse_smoke"]["active"]:
+            self.smoke_tiles = SmokeTiles(self, spec["scheme"]["sparse_smoke"])
+
+        if refinement["active"] and self.bands is None:
+            self.quadtree = Quadtree(self, refinement)
+        
+        # tracers, for display
+        self.particles = None
+        if spec["display"]["show_particles"]:
+            self.particles = Particles(spec["display"]["particles"], self)
         
         print(f"Fluid ({self.name}) initialised")
     
+    def set_wall_indices(self):
+        """
+        Boolean masks of the wall, fluid and inner fluid cells, or Ellipsis 
+        (index everything, as views) where there are no walls
+        Masks cost 1 byte per cell, np.where's pairs of int64 cost 16
+        """
+        self.obstacles.refresh()
+        walls = self.walls.astype(bool, copy=False)
+        self.where_wall = walls
+        if self.bands is not None:
+            # built for each band as it is processed instead
+            self.where_fluid = None
+            self.where_inner_fluid = None
+            return
+
+        if not walls.any():
+            self.where_fluid = Ellipsis
+            self.where_inner_fluid = Ellipsis
+        else:
+            self.where_fluid = ~walls
+            self.where_inner_fluid = ~walls[1:-1, 1:-1]
+
+        # smoke on a finer grid has the walls of the cells it lies in
+        self.where_smoke = self.where_fluid
+        self.where_inner_smoke = self.where_inner_fluid
+        if self.smoke_factor > 1 and self.where_fluid is not Ellipsis:
+            S = self.smoke_factor
+            self.where_smoke = self.where_fluid.repeat(S, axis=0).repeat(S, axis=1)
+            self.where_inner_smoke = self.where_smoke[1:-1, 1:-1]
+
+    def allocate(self, name, shape, dtype=None):
+        """
+        Zeroed array for the field name: in memory, or memory-mapped from a 
+        file in the storage dir
+        """
+        dtype = self.dtype if dtype is None else dtype
+        if self.storage_dir is None:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(self.storage_dir, f"{name}.dat"), 
+                         dtype=dtype, mode="w+", shape=shape)
+
+    def memory_report(self):
+        """
+        Bytes held by each of the Fluid's arrays, including the derived field 
+        buffers allocated so far (memory-mapped arrays count their file size)
+        At float64 the state (u, v, p, d) is 32 bytes per cell and walls 1; 
+        walls, if there are any, add 2 bytes per cell of masks, and each 
+        derived buffer in use another 8 (halve the float figures at float32)
+        Components holding memory of their own (particles, sparse smoke and 
+        refinement tiles, the implicit solvers' factorizations) are reported 
+        as one entry each
+        """
+        report = {}
+        seen = set()
+        for owner, prefix in ((self, ""), (self.derived, "derived.")):
+            for name, value in vars(owner).items():
+                if not isinstance(value, np.ndarray):
+                    continue
+                # views (X of x_lin, where_wall of walls) are counted once,
+                # as the array they view
+                base = value
+                while isinstance(base.base, np.ndarray):
+                    base = base.base
+                if id(base) not in seen:
+                    seen.add(id(base))
+                    report[prefix + name] = base.nbytes
+
+        # held by the components, for their own use
+        components = {
+            "quadtree": self.quadtree, 
+            "particles": self.particles, 
+            "smoke_tiles": self.smoke_tiles,
+        }
+        for name, component in components.items():
+            if component is not None:
+                report[name] = component.nbytes()
+        if self.diffusion_engines:
+            report["diffusion_engines"] = sum(
+                engine.nbytes() for engine in self.diffusion_engines)
+        if self.upsample_stencil is not None:
+            report["upsample_stencil"] = sum(
+                np.asarray(part).nbytes for part in self.upsample_stencil)
+        return report
+
+    def bytes_per_cell(self):
+        return sum(self.memory_report().values()) / (self.Nx * self.Ny)
+    
     def set_diffusion_solver(self):
-        if (self.solver.solver_type == "ImplicitEuler" 
+        self.diffuse = self.diffusion_solver(self.dx, self.dy)
+        self.smoke_diffuse = self.diffuse if self.smoke_factor == 1 \
+            else self.diffusion_solver(self.smoke_dx, self.smoke_dy)
+
+    def diffusion_solver(self, dx, dy):
+        """
+        Diffusion function (D, nu, where_inner_fluid) -> D for the scheme, on 
+        cells of size dx by dy
+        """
+        # solver.dt is read on every call, so these need no rebuilding when 
+        # the solver adapts its time step
+        # bands each have their own walls, so their operators may all differ: 
+        # the cache holds as many for each band as it would for the grid
+        cache_size = self.solver.implicit_cache
+        if self.bands is not None:
+            cache_size *= len(self.bands.regions(0))
+        if self.solver.solver_type == "BackwardEuler":
+            implicit = ImplicitDiffusion(cache_size)
+            self.diffusion_engines.append(implicit)
+            return lambda D, nu=self.nu, where_inner_fluid=None: \
+                implicit(
+                    D, self.where_inner_fluid if where_inner_fluid is None 
+                    else where_inner_fluid, nu, dx, dy, self.solver.dt
+                )
+
+        elif self.solver.solver_type == "FEM":
+            fem = GridFEMDiffusion(dx, dy, self.solver.fem_mass, cache_size)
+            self.diffusion_engines.append(fem)
+            return lambda D, nu=self.nu, where_inner_fluid=None: \
+                fem(
+                    D, self.where_inner_fluid if where_inner_fluid is None 
+                    else where_inner_fluid, nu, self.solver.dt
+                )
+
+        elif (self.solver.solver_type == "ImplicitEuler" 
         and self.solver.dx_is_dy):
-            self.diffuse = lambda D, nu=self.nu: self.solver.diffuseIE_dx_is_dy(
-                D, nu, self.dx, self.solver.dt
-            )
+            return lambda D, nu=self.nu, where_inner_fluid=None: \
+                self.solver.diffuseIE_dx_is_dy(D, nu, dx, self.solver.dt)
         
         elif (self.solver.solver_type == "ImplicitEuler" 
         and not self.solver.dx_is_dy):
@@ -105,10 +322,12 @@ class Fluid:
 
         elif (self.solver.solver_type == "ExplicitEuler" 
         and self.solver.dx_is_dy):
-            self.diffuse = lambda D, nu=self.nu: self.solver.diffuseEE_dx_is_dy(
-                D, self.where_inner_fluid, nu, self.dx, 
-                self.solver.dt, self.solver.nit
-            )
+            return lambda D, nu=self.nu, where_inner_fluid=None: \
+                self.solver.diffuseEE_dx_is_dy(
+                    D, self.where_inner_fluid if where_inner_fluid is None 
+                    else where_inner_fluid, nu, dx, 
+                    self.solver.dt, self.solver.nit
+                )
 
         elif (self.solver.solver_type == "ExplicitEuler" 
         and self.solver.dx_is_dy):
@@ -117,48 +336,275 @@ class Fluid:
             warnings.warn(f"Solver '{self.solver.solver_type}' not recognised")
     
     def set_advection_solver(self):
-        self.advect = lambda D: self.solver.advect(
-            D, self.where_fluid, self.u, self.v, 
-            self.dx, self.dy, self.IX, self.IY, 
-            self.solver.dt)
+        schemes = {
+            "SemiLagrangian": self.solver.advect,
+            "MacCormack": self.solver.advect_maccormack,
+            "BFECC": self.solver.advect_bfecc,
+        }
+
+        self.advect = {}
+        self.advection_kernels = {}
+        for field, scheme in self.solver.advection_schemes.items():
+            if scheme not in schemes:
+                warnings.warn(f"Advection scheme '{scheme}' not recognised, "
+                              "using 'SemiLagrangian'")
+                scheme = "SemiLagrangian"
+            
+            self.advection_kernels[field] = schemes[scheme]
+            self.advect[field] = lambda D, advect=schemes[scheme]: advect(
+                D, self.where_fluid, self.u, self.v, 
+                self.dx, self.dy, self.IX, self.IY, 
+                self.solver.dt)
+        
+        # smoke on a finer grid is carried by the velocity upsampled to it
+        if self.smoke_factor > 1:
+            self.advect["smoke"] = lambda D, advect=self.advection_kernels[
+                "smoke"]: advect(
+                    D, self.where_smoke, self.upsample(self.u), 
+                    self.upsample(self.v), self.smoke_dx, self.smoke_dy, 
+                    self.smoke_IX, self.smoke_IY, self.solver.dt)
+
+    def upsample(self, D):
+        """
+        D interpolated (bilinearly) from the grid onto the smoke's finer grid
+        """
+        if self.upsample_stencil is None:
+            # fine cell i is centred at (i + 0.5) / S - 0.5 of the grid
+            S = self.smoke_factor
+            IX = np.clip((self.smoke_IX + 0.5) / S - 0.5, 0, self.Nx - 1)
+            IY = np.clip((self.smoke_IY + 0.5) / S - 0.5, 0, self.Ny - 1)
+            self.upsample_stencil = self.solver.bilinear_stencil(
+                D.shape, IX.astype(self.dtype), IY.astype(self.dtype))
+        return self.solver.bilinear_sample(D, None, None, 
+                                           stencil=self.upsample_stencil)
     
     def set_div_function(self):
+        self.div = self.div_function(self.dx, self.dy)
+
+    def div_function(self, dx, dy):
         if self.solver.dx_is_dy:
-            self.div = lambda u, v: self.solver.div_dx_is_dy(
-                u, v, self.dx
-            )
-        else:
-            self.div = lambda u, v: self.solver.div_dx_not_dy(
-                u, v, self.dx, self.dy
-            )
+            return lambda u, v: self.solver.div_dx_is_dy(u, v, dx)
+        return lambda u, v: self.solver.div_dx_not_dy(u, v, dx, dy)
+
+    def diffusion_reach(self):
+        """
+        Cells a diffusion step can spread a value (one per Jacobi iteration)
+        A BackwardEuler (or FEM) solve reaches everywhere, but its influence 
+        decays over a length sqrt(nu dt): beyond 8 of those it is below 1e-3
+        """
+        if self.solver.solver_type in ("BackwardEuler", "FEM"):
+            nu = max(self.nu, self.smoke_nu)
+            return math.ceil(8 * math.sqrt(nu * self.solver.dt) 
+                             / min(self.dx, self.dy)) + 1
+        return self.solver.nit if self.solver.solver_type == "ExplicitEuler" \
+            else 1
+
+    def advection_reach(self):
+        """
+        Rows an advection step can read from, bounded by the CFL number: the 
+        MacCormack/BFECC round trip is twice the backtrace plus the 
+        interpolation stencil, and the cached max speed is from the start of 
+        the step, so allow a couple of rows for the velocity update since
+        """
+        shift = self.derived.max_speed() * self.solver.dt / self.dy
+        return 2 * (math.ceil(shift) + 1) + 2
 
     def diffuse_velocity(self):
+        if self.bands is not None:
+            def step(fields, walls, outer):
+                fluid = ~walls
+                for D in fields.values():
+                    D[fluid] = self.diffuse(
+                        D, where_inner_fluid=fluid[1:-1, 1:-1])[fluid]
+                return fields
+            
+            self.bands.apply(step, ("u", "v"), self.diffusion_reach())
+            return
+
         self.u[self.where_fluid] = self.diffuse(self.u)[self.where_fluid]
         self.v[self.where_fluid] = self.diffuse(self.v)[self.where_fluid]
    
     def enforce_continuity(self):
-        self.p[self.where_wall] = 0
+        if self.bands is not None:
+            def step(fields, walls, outer):
+                fluid = ~walls
+                if not self.obstacles.neumann:
+                    fields["p"][walls] = 0
+                _, u, v = self.solver.extract_divfree(
+                    fields["u"], fields["v"], fields["p"], self.dx, self.dy, 
+                    self.solver.nit, fluid[1:-1, 1:-1], self.div, 
+                    self.pressure_BCs(outer)
+                )
+                fields["u"][fluid] = u[fluid]
+                fields["v"][fluid] = v[fluid]
+                return fields
+            
+            # divergence, nit Jacobi sweeps and the gradient
+            self.bands.apply(step, ("u", "v", "p"), self.solver.nit + 2)
+            return
+
+        if not self.obstacles.neumann:
+            self.p[self.where_wall] = 0
         p, u, v = self.solver.extract_divfree(
             self.u, self.v, self.p, self.dx, self.dy, 
             self.solver.nit, self.where_inner_fluid,
-            self.div
+            self.div, self.pressure_BCs()
         )
         self.p[self.where_fluid] = p[self.where_fluid]
         self.u[self.where_fluid] = u[self.where_fluid]
         self.v[self.where_fluid] = v[self.where_fluid]
     
+    def pressure_BCs(self, rows=None):
+        """
+        The pressure BCs to apply after each Jacobi sweep (None: p = 0 in the 
+        walls, set once before the projection)
+        """
+        if not self.obstacles.neumann:
+            return None
+        return lambda p: self.obstacles.pressure(p, rows)
+
+    def velocity_BCs(self):
+        self.obstacles.velocity(self.u, self.v)
+
     def advect_velocity(self):
-        u_tmp = self.advect(self.u)
-        self.v[self.where_fluid] = self.advect(self.v)[self.where_fluid]
+        if self.bands is not None:
+            advect = self.advection_kernels["velocity"]
+            self.bands.apply(lambda fields, walls, outer: {
+                name: advect(
+                    fields[name], ~walls, fields["u"], fields["v"], 
+                    self.dx, self.dy, self.IX, self.band_IY(fields["u"]), 
+                    self.solver.dt)
+                for name in ("u", "v")
+            }, ("u", "v"), self.advection_reach())
+            return
+
+        u_tmp = self.advect["velocity"](self.u)
+        self.v[self.where_fluid] = self.advect["velocity"](self.v)[self.where_fluid]
         self.u[self.where_fluid] = u_tmp[self.where_fluid]
 
+    def track_smoke(self):
+        """
+        Update the active smoke tiles before the smoke is transported
+        """
+        if self.smoke_tiles is None:
+            return
+        
+        # how far smoke can spread this step: backtrace distance plus the 
+        # diffusion stencil (one cell per Jacobi iteration)
+        max_shift = (self.derived.max_speed() * self.solver.dt 
+                     / min(self.dx, self.dy))
+        spread = self.diffusion_reach()
+        
+        # the cached max speed is from the start of the step, so allow a 
+        # couple of cells for the velocity update since
+        self.smoke_halo = math.ceil(max_shift) + spread + 2
+        self.smoke_tiles.update(self.smoke_halo)
+
+    def transport_smoke(self, step):
+        """
+        Apply step(d, outer) to each active smoke region grown by the halo, 
+        keeping only the result for the region itself
+        """
+        results = []
+        for core, outer, inner in self.smoke_tiles.halo_regions(self.smoke_halo):
+            results.append((core, step(self.d[outer].copy(), outer)[inner]))
+
+        for core, d in results:
+            self.d[core] = d
+
+    def band_IY(self, D):
+        """
+        Row index coordinates local to a band of D's rows
+        """
+        return np.arange(D.shape[0], dtype=np.int32)[:, None]
+
     def diffuse_smoke(self):
-        self.d[self.where_fluid] = self.diffuse(self.d, self.smoke_nu)[self.where_fluid]
+        if self.bands is not None:
+            def step(fields, walls, outer):
+                D = fields["d"]
+                fluid = ~walls
+                D[fluid] = self.diffuse(
+                    D, self.smoke_nu, where_inner_fluid=fluid[1:-1, 1:-1]
+                )[fluid]
+                return fields
+            
+            self.bands.apply(step, ("d",), self.diffusion_reach())
+            return
+
+        if self.smoke_tiles is None:
+            self.d[self.where_smoke] = self.smoke_diffuse(
+                self.d, self.smoke_nu, where_inner_fluid=self.where_inner_smoke
+            )[self.where_smoke]
+            return
+        
+        self.transport_smoke(lambda d, outer: self.diffuse(
+            d, self.smoke_nu, 
+            where_inner_fluid=self.walls[outer][1:-1, 1:-1] == 0
+        ))
     
     def advect_smoke(self):
-        self.d[self.where_fluid] = self.advect(self.d)[self.where_fluid]
+        if self.bands is not None:
+            advect = self.advection_kernels["smoke"]
+            self.bands.apply(lambda fields, walls, outer: {
+                "d": advect(
+                    fields["d"], ~walls, fields["u"], fields["v"], 
+                    self.dx, self.dy, self.IX, self.band_IY(fields["d"]), 
+                    self.solver.dt)
+            }, ("d", "u", "v"), self.advection_reach())
+            return
+
+        if self.smoke_tiles is None:
+            self.d[self.where_smoke] = self.advect["smoke"](self.d)[self.where_smoke]
+            return
+        
+        # local index coordinates, broadcast against the region
+        advect = self.advection_kernels["smoke"]
+        self.transport_smoke(lambda d, outer: advect(
+            d, self.walls[outer] == 0, self.u[outer], self.v[outer],
+            self.dx, self.dy, 
+            np.arange(d.shape[1], dtype=np.int32)[None, :], 
+            np.arange(d.shape[0], dtype=np.int32)[:, None], self.solver.dt
+        ))
     
     def fade_smoke(self):
         if self.smoke_fade == 1:
             return
-        self.d *= self.smoke_fade
+        
+        if self.bands is not None:
+            for core, _, _ in self.bands.regions(0):
+                self.d[core] *= self.smoke_fade
+            return
+
+        if self.smoke_tiles is None:
+            self.d *= self.smoke_fade
+            return
+        
+        for core in self.smoke_tiles.regions():
+            self.d[core] *= self.smoke_fade
+
+    def advance_levels(self):
+        """
+        Step the refined tiles, from the state at the start of the step
+        """
+        if self.quadtree is None:
+            return
+        
+        self.quadtree.advance()
+
+    def restrict_levels(self):
+        """
+        Average the refined tiles down onto the grid, and every few steps 
+        refine and coarsen them
+        """
+        if self.quadtree is None:
+            return
+        
+        self.quadtree.restrict()
+        if (self.solver.step + 1) % self.quadtree.every == 0:
+            self.quadtree.regrid()
+
+    def advect_particles(self):
+        if self.particles is None:
+            return
+        
+        self.particles.advance(self.solver.dt)
@@ -0,0 +1,206 @@
+################################################################################
+##
+##  File: FrameServer.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the FrameServer class, an asyncio TCP server that
+##                streams rendered frames to any number of viewers (see
+##                FrameViewer.py), dropping frames for clients that fall behind
+##
+################################################################################
+
+
+import io
+import zlib
+import struct
+import asyncio
+import threading
+import numpy as np
+from PIL import Image
+
+
+MAGIC = b"FSFR"
+
+# message: FRAME header, then the payload
+# payload: PNG/JPEG image, or for "delta" the zlib compressed frame (KEY) or 
+#          frame - previous frame, wrapping (DELTA)
+FRAME = struct.Struct("<4sBIHHI")   # magic, codec, frame number, w, h, size
+PNG, JPEG, KEY, DELTA = range(4)
+CODECS = {"png": PNG, "jpeg": JPEG, "delta": DELTA}
+
+STARTUP_TIMEOUT = 10                # s to wait for the server to listen
+
+
+def encode_frame(codec, frame, prev=None, quality=80):
+    """
+    Encode a uint8 (h, w, 3) frame; returns (codec, payload) since "delta" 
+    sends a key frame when there is no previous frame
+    """
+    if codec in (PNG, JPEG):
+        buf = io.BytesIO()
+        Image.fromarray(frame).save(buf, format="PNG" if codec == PNG 
+                                    else "JPEG", quality=quality)
+        return codec, buf.getvalue()
+    
+    if prev is None:
+        return KEY, zlib.compress(frame.tobytes(), 1)
+    return DELTA, zlib.compress((frame - prev).tobytes(), 1)
+
+
+def decode_frame(codec, payload, w, h, prev=None):
+    if codec in (PNG, JPEG):
+        return np.asarray(Image.open(io.BytesIO(payload)).convert("RGB"))
+    
+    frame = np.frombuffer(zlib.decompress(payload), dtype=np.uint8)
+    frame = frame.reshape(h, w, 3)
+    return frame if codec == KEY else prev + frame
+
+
+class FrameServer:
+    def __init__(self, stream_spec):
+        self.active = stream_spec["active"]
+        if not self.active:
+            return
+        
+        self.host = stream_spec["host"]
+        self.port = stream_spec["port"]
+        self.codec = CODECS[stream_spec["codec"]]
+        self.quality = stream_spec["quality"]
+        self.keyframe_every = stream_spec["keyframe_every"]
+
+        # only the latest frame is kept: a client busy sending skips every 
+        # frame published meanwhile
+        self.frame = None
+        self.frame_number = 0
+        self.encoded = None
+        self.clients = set()
+        self.tasks = set()
+
+        self.loop = asyncio.new_event_loop()
+        self.server = None
+        self.error = None
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(ready,), 
+                                       daemon=True)
+        self.thread.start()
+
+        # a server that failed to start (eg. port in use) is reported here, 
+        # rather than being lost in its thread
+        if not ready.wait(STARTUP_TIMEOUT):
+            self.active = False
+            raise TimeoutError(f"Frame server on {self.host}:{self.port} "
+                               f"did not start in {STARTUP_TIMEOUT} s")
+        if self.error is not None:
+            self.active = False
+            self.thread.join()
+            raise self.error
+    
+    def run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle, self.host, self.port))
+        except Exception as error:
+            self.error = error
+            self.loop.close()
+            return
+        finally:
+            ready.set()
+        self.loop.run_forever()
+    
+    def publish(self, pxarray):
+        """
+        Hand a rendered frame to the server thread; never blocks
+        """
+        if not self.active or not self.clients:
+            return
+        frame = pxarray.astype(np.uint8)
+        self.loop.call_soon_threadsafe(self.new_frame, frame)
+    
+    def new_frame(self, frame):
+        self.frame_number += 1
+        self.frame = frame
+        self.encoded = None
+        for event in self.clients:
+            event.set()
+    
+    def shared_encoding(self):
+        """
+        PNG/JPEG of the latest frame, encoded once (off the event loop) for 
+        all clients
+        """
+        if self.encoded is None:
+            self.encoded = self.loop.run_in_executor(
+                None, encode_frame, self.codec, self.frame, None, self.quality)
+        return self.encoded
+    
+    async def handle(self, reader, writer):
+        event = asyncio.Event()
+        self.clients.add(event)
+        self.tasks.add(asyncio.current_task())
+        prev = None
+        n_sent = 0
+        try:
+            while True:
+                await event.wait()
+                event.clear()
+                number, frame = self.frame_number, self.frame
+                
+                if self.codec == DELTA:
+                    if n_sent % self.keyframe_every == 0:
+                        prev = None
+                    codec, payload = await self.loop.run_in_executor(
+                        None, encode_frame, DELTA, frame, prev)
+                else:
+                    codec, payload = await self.shared_encoding()
+                
+                h, w = frame.shape[:2]
+                writer.write(FRAME.pack(MAGIC, codec, number, w, h, 
+                                        len(payload)) + payload)
+                await writer.drain()
+                prev = frame
+                n_sent += 1
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients.discard(event)
+            self.tasks.discard(asyncio.current_task())
+            writer.close()
+    
+    def close(self):
+        if not self.active or not self.thread.is_alive():
+            return
+
+        async def shutdown():
+            self.server.close()
+            tasks = list(self.tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.server.wait_closed()
+            self.loop.stop()
+        
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop)
+        self.thread.join()
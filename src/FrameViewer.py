@@ -0,0 +1,88 @@
+################################################################################
+##
+##  File: FrameViewer.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  A minimal viewer for the frames streamed by FrameServer
+##                Run: python -m src.FrameViewer [--host HOST] [--port PORT]
+##
+################################################################################
+
+
+import socket
+import argparse
+import pygame as pg
+
+from src.FrameServer import FRAME, MAGIC, decode_frame
+
+
+def read_exactly(sock, n):
+    data = bytearray()
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("Server closed the connection")
+        data += chunk
+    return bytes(data)
+
+
+def frames(host, port):
+    """
+    Yield (frame number, uint8 (h, w, 3) frame) as they arrive
+    """
+    with socket.create_connection((host, port)) as sock:
+        prev = None
+        while True:
+            magic, codec, number, w, h, size = FRAME.unpack(
+                read_exactly(sock, FRAME.size))
+            if magic != MAGIC:
+                raise ValueError("Not a FrameServer stream")
+            prev = decode_frame(codec, read_exactly(sock, size), w, h, prev)
+            yield number, prev
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FrameServer viewer")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    pg.init()
+    window = None
+    for number, frame in frames(args.host, args.port):
+        if window is None:
+            window = pg.display.set_mode(frame.shape[1::-1], flags=pg.RESIZABLE)
+        
+        if any(event.type == pg.QUIT for event in pg.event.get()):
+            break
+        
+        surf = pg.surfarray.make_surface(frame.swapaxes(0, 1))
+        window.blit(pg.transform.scale(surf, window.get_size()), (0, 0))
+        pg.display.set_caption(f"FluidSimulator frame {number}")
+        pg.display.update()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+################################################################################
+##
+##  File: ImplicitDiffusion.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the ImplicitDiffusion class, a backward Euler 
+##                diffusion solve with the sparse operator assembled from the 
+##                walls and factorized once, then cached for reuse
+##
+################################################################################
+
+
+import hashlib
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from collections import OrderedDict
+
+
+def held_nbytes(*parts):
+    """
+    Bytes held by arrays, sparse matrices and factorized solves (SuperLU: 
+    the values and row indices of L and U, and the permutations), and by 
+    tuples, lists and dicts of them
+    """
+    total = 0
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            total += part.nbytes
+        elif sp.issparse(part):
+            total += sum(getattr(part, name).nbytes 
+                         for name in ("data", "indices", "indptr") 
+                         if hasattr(part, name))
+        elif isinstance(part, (tuple, list)):
+            total += held_nbytes(*part)
+        elif isinstance(part, dict):
+            total += held_nbytes(*part.values())
+        elif hasattr(getattr(part, "__self__", None), "nnz"):
+            # float64 values and int32 row indices (reading lu.L or lu.U 
+            # would copy the factors)
+            lu = part.__self__
+            total += lu.nnz * 12 + lu.perm_r.nbytes + lu.perm_c.nbytes
+    return total
+
+
+def canonical_window(start, stop, size):
+    """
+    The cells start:stop of an axis of size cells, grown to a power of 2 long 
+    (or the whole axis) and shifted to lie inside it
+    Regions whose extent varies from step to step (sparse smoke runs, 
+    quadtree blocks) then take few shapes, so the operators factorized for 
+    them are found in the cache again
+    """
+    length = min(1 << int(stop - start - 1).bit_length(), size)
+    start = min(max(start - (length - (stop - start)) // 2, 0), size - length)
+    return slice(start, start + length)
+
+
+class ImplicitDiffusion:
+    def __init__(self, cache_size):
+        # (nu, dt, dx, dy, shape, fluid mask hash): factorized operator
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+    
+    def nbytes(self):
+        return held_nbytes(list(self.cache.values()))
+
+    def __call__(self, D, fluid_domain, nu, dx, dy, dt):
+        """
+        Diffuse the scalar field D by solving (1 - nu dt laplacian) D_new = D 
+        for the inner fluid cells (fluid_domain: a mask of D[1:-1, 1:-1], or 
+        Ellipsis for all of them), holding the other cells' values fixed
+        Unconditionally stable, so dt is not limited by nu
+        The solve is in float64 (all SuperLU offers here), so with float32 
+        fields the right hand side is cast up and the result back down
+        """
+        operator = self.operator(D.shape, fluid_domain, nu, dx, dy, dt)
+        solve, cells, coupled, sources, weights = operator
+
+        rhs = D[1:-1, 1:-1][cells].astype(np.float64)
+        rhs += np.bincount(coupled, weights=weights * D.ravel().take(sources), 
+                           minlength=rhs.size)
+        
+        D_new = D.copy()
+        D_new[1:-1, 1:-1][cells] = solve(rhs).astype(D.dtype, copy=False)
+        return D_new
+
+    def operator(self, shape, fluid_domain, nu, dx, dy, dt):
+        """
+        The factorized operator for these parameters, from the cache or 
+        assembled and added to it (dropping the least recently used)
+        """
+        if fluid_domain is Ellipsis:
+            mask_key = None
+        else:
+            mask_key = hashlib.blake2b(np.packbits(fluid_domain).tobytes(), 
+                                       digest_size=16).digest()
+        key = (nu, dt, dx, dy, shape, mask_key)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        
+        operator = self.assemble(shape, fluid_domain, nu * dt / dx**2, 
+                                 nu * dt / dy**2)
+        self.cache[key] = operator
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return operator
+
+    @staticmethod
+    def assemble(shape, fluid_domain, c_x, c_y):
+        """
+        Factorize the 5-point backward Euler operator over the inner fluid 
+        cells, and gather the couplings to the fixed cells around them (walls 
+        and domain edges), which move to the right hand side:
+            solve, cells (index of the unknowns in D[1:-1, 1:-1]), 
+            coupled (unknown), sources (flat index in D), weights
+        """
+        Ny, Nx = shape
+        cells = np.ones((Ny - 2, Nx - 2), dtype=bool)
+        if fluid_domain is not Ellipsis:
+            cells &= fluid_domain
+        rows, cols = np.nonzero(cells)
+        rows += 1
+        cols += 1
+        n = rows.size
+
+        index = np.full(shape, -1, dtype=np.int64)
+        index[rows, cols] = np.arange(n)
+
+        A_rows = [np.arange(n)]
+        A_cols = [np.arange(n)]
+        A_vals = [np.full(n, 1 + 2 * c_x + 2 * c_y)]
+        coupled, sources, weights = [], [], []
+        neighbours = ((0, 1, c_x), (0, -1, c_x), (1, 0, c_y), (-1, 0, c_y))
+        for dy, dx, c in neighbours:
+            neighbour = index[rows + dy, cols + dx]
+            unknown = neighbour >= 0
+            A_rows.append(np.nonzero(unknown)[0])
+            A_cols.append(neighbour[unknown])
+            A_vals.append(np.full(np.count_nonzero(unknown), -c))
+
+            fixed = ~unknown
+            coupled.append(np.nonzero(fixed)[0])
+            sources.append((rows[fixed] + dy) * Nx + cols[fixed] + dx)
+            weights.append(np.full(np.count_nonzero(fixed), c))
+
+        A = sp.csc_matrix((np.concatenate(A_vals), 
+                           (np.concatenate(A_rows), np.concatenate(A_cols))), 
+                          shape=(n, n))
+        return (spla.factorized(A), (rows - 1, cols - 1), 
+                np.concatenate(coupled), np.concatenate(sources), 
+                np.concatenate(weights))
@@ -0,0 +1,104 @@
+################################################################################
+##
+##  File: InputScript.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the InputRecorder and InputReplay classes, which
+##                save each frame's brush strokes to a compact binary log and
+##                replay them into the Fluid without pygame
+##
+################################################################################
+
+
+import os
+import struct
+import numpy as np
+
+
+MAGIC = b"FSIN"
+VERSION = 2
+
+# file:   MAGIC, version (uint16), then one record per frame with input
+# record: frame (uint32, the Solver's solve() calls so far, which unlike its 
+#         steps don't depend on the time stepping), buttons (uint8: 1 = left, 2 = right), 
+#         brush radius in cells (uint16), delta_pos (2 x float32), 
+#         number of centres n (uint32), centres (n x 2 float32, [row, col])
+HEADER = struct.Struct("<4sH")
+RECORD = struct.Struct("<IBH2fI")
+
+
+class InputRecorder:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION))
+    
+    def __call__(self, frame, centres, rad, delta_pos, l_press, r_press):
+        centres = np.ascontiguousarray(centres, dtype="<f4")
+        buttons = (1 if l_press else 0) | (2 if r_press else 0)
+        self.file.write(RECORD.pack(frame, buttons, rad, *delta_pos, 
+                                    len(centres)))
+        self.file.write(centres.tobytes())
+    
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class InputReplay:
+    def __init__(self, path, brush):
+        self.brush = brush
+        self.records = {}
+        self.applied = None
+        
+        with open(path, "rb") as file:
+            data = file.read()
+        
+        magic, version = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} input script")
+
+        offset = HEADER.size
+        while offset < len(data):
+            frame, buttons, rad, dx, dy, n = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            centres = np.frombuffer(data, dtype="<f4", count=2*n, 
+                                    offset=offset).reshape(n, 2)
+            offset += centres.nbytes
+            self.records.setdefault(frame, []).append(
+                (centres, rad, np.array([dx, dy]), buttons & 1, buttons & 2))
+        
+        self.last_frame = max(self.records, default=0)
+    
+    def __call__(self, frame):
+        """
+        Apply the brush strokes recorded for this frame, once (an idle 
+        mainloop iterates without solving)
+        """
+        if frame == self.applied:
+            return
+        self.applied = frame
+        for record in self.records.get(frame, ()):
+            self.brush(*record)
@@ -32,42 +32,200 @@
 ################################################################################
 
 
+import os
+import time
+import queue
+import atexit
+import threading
 import logging
+import logging.handlers
+
+
+class LazyMessage:
+    """
+    The args of a Log call, only joined into a string if and when a handler 
+    formats the record (on the listener thread)
+    """
+    def __init__(self, args):
+        self.args = args
+
+    def __str__(self):
+        return ", ".join(str(arg) for arg in self.args)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    # the queue never leaves the process, so skip QueueHandler's formatting 
+    # of the record on the calling thread
+    def prepare(self, record):
+        return record
 
 
 class Log:
     log = None
 
-    def __init__(self, log_spec):
-        # Create a custom logger
-        self.logger = logging.getLogger('simple_logger')
+    # one QueueListener per log file (its resolved path, or None without 
+    # one), shared by every Log writing to it so each file has one writer: 
+    # [listener, its queue, number of those Logs still open]
+    listeners = {}
+    # loggers attached to a listener's queue: number of their Logs still open
+    attached = {}
+    listeners_lock = threading.Lock()
+
+    def __init__(self, log_spec, name=None):
+        # Create a custom logger, one per solver name so that solvers sharing 
+        # a process keep separate logs
+        logger_name = "simple_logger" if name is None \
+            else f"simple_logger.{name}"
+        self.logger = logging.getLogger(logger_name)
         self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+
+        # per-key rate limiting: at most rate_limit messages per second for 
+        # each key, the rest counted and reported with the next one let through
+        self.rate_limit = log_spec["rate_limit"]
+        self.allowance = {}
+        self.suppressed = {}
+        self.calls = {}
+        self.lock = threading.Lock()
+
+        # the first Log made, for code without a solver to hand
+        if Log.log is None:
+            Log.log = self
+
+        # Handlers are only set up once per log file, however many loggers 
+        # write to it
+        self.key = os.path.realpath(log_spec["path"]) \
+            if log_spec["log_file"] else None
+        self.verbose = log_spec["verbose"]
+        self.closed = False
+        with Log.listeners_lock:
+            if self.key not in Log.listeners:
+                Log.listeners[self.key] = [*self.start_listener(log_spec), 0]
+            entry = Log.listeners[self.key]
+            entry[2] += 1
 
-        # Create handlers based on the provided configuration
-        if log_spec["verbose"]:
-            c_handler = logging.StreamHandler()
-            c_handler.setLevel(logging.DEBUG)
-            c_format = logging.Formatter(fmt='%(asctime)s - %(levelname)s - %(message)s', datefmt='%d/%m %H:%M:%S')
-            c_handler.setFormatter(c_format)
-            self.logger.addHandler(c_handler)
+            attached = (logger_name, self.key)
+            if attached not in Log.attached:
+                Log.attached[attached] = 0
+                self.logger.addHandler(DeferredQueueHandler(entry[1]))
+            Log.attached[attached] += 1
+
+    @staticmethod
+    def start_listener(log_spec):
+        """
+        A started QueueListener for the log file log_spec asks for (if any) 
+        and the console, and the queue it reads records from
+        The console prints the records of verbose Logs only, so Logs sharing 
+        the listener each keep their own setting
+        """
+        formatter = logging.Formatter(fmt='%(asctime)s - %(levelname)s - %(message)s', datefmt='%d/%m %H:%M:%S')
+        console = logging.StreamHandler()
+        console.addFilter(lambda record: getattr(record, "verbose", False))
+        handlers = [console]
         
         if log_spec["log_file"]:
-            f_handler = logging.FileHandler("out/.log")
-            f_handler.setLevel(logging.DEBUG)
-            f_format = logging.Formatter(fmt='%(asctime)s - %(levelname)s - %(message)s', datefmt='%d/%m %H:%M:%S')
-            f_handler.setFormatter(f_format)
-            self.logger.addHandler(f_handler)
+            os.makedirs(os.path.dirname(log_spec["path"]) or ".", 
+                        exist_ok=True)
+            handlers.append(logging.handlers.RotatingFileHandler(
+                log_spec["path"], maxBytes=int(log_spec["max_bytes"]), 
+                backupCount=log_spec["backups"]))
+        
+        for handler in handlers:
+            handler.setLevel(logging.DEBUG)
+            handler.setFormatter(formatter)
+
+        # the calling thread only puts records on the queue, the handlers do 
+        # their I/O on the listener's thread
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, *handlers)
+        listener.start()
+        atexit.register(listener.stop)
+        return listener, log_queue
+
+    def close(self):
+        """
+        Done with this Log: the last one open for its logger detaches it from 
+        the file's queue, and the last one open for the file stops the 
+        listener thread and closes the file
+        """
+        with Log.listeners_lock:
+            if self.closed:
+                return
+            self.closed = True
+            entry = Log.listeners[self.key]
+
+            attached = (self.logger.name, self.key)
+            Log.attached[attached] -= 1
+            if not Log.attached[attached]:
+                del Log.attached[attached]
+                for handler in list(self.logger.handlers):
+                    if (isinstance(handler, DeferredQueueHandler) 
+                    and handler.queue is entry[1]):
+                        self.logger.removeHandler(handler)
+
+            entry[2] -= 1
+            if not entry[2]:
+                listener, _, _ = Log.listeners.pop(self.key)
+                atexit.unregister(listener.stop)
+                listener.stop()
+                for handler in listener.handlers:
+                    handler.close()
         
-        Log.log = self
+        if Log.log is self:
+            Log.log = None
 
-    def __call__(self, *args, warning=False, error=False):
-        message = ", ".join(str(arg) for arg in args)
+    def __call__(self, *args, warning=False, error=False, key=None, sample=1):
+        """
+        Log args (joined with ", " lazily, off this thread)
+        Messages with a key are rate limited per key, and only every sample'th 
+        call with that key is considered at all
+        A single callable arg returns the args, and is only called if the 
+        message isn't dropped, so what they cost to compute is skipped with it
+        """
+        suppressed = 0
+        if key is not None:
+            suppressed = self.limit(key, sample)
+            if suppressed is None:
+                return
+        
+        if len(args) == 1 and callable(args[0]):
+            args = tuple(args[0]())
+        if suppressed:
+            args = (*args, f"({suppressed} similar suppressed)")
+        message = LazyMessage(args)
+        extra = {"verbose": self.verbose}
         if error:
-            self.logger.error(message)
+            self.logger.error(message, extra=extra)
         elif warning:
-            self.logger.warning(message)
+            self.logger.warning(message, extra=extra)
         else:
-            self.logger.info(message)
+            self.logger.info(message, extra=extra)
+
+    def limit(self, key, sample):
+        """
+        Returns the number of messages with key suppressed since the last one 
+        logged, or None to drop this one
+        """
+        with self.lock:
+            calls = self.calls.get(key, 0)
+            self.calls[key] = calls + 1
+            if calls % sample:
+                return None
+            
+            if not self.rate_limit:
+                return 0
+            
+            # token bucket refilled at rate_limit per second, up to rate_limit
+            now = time.monotonic()
+            tokens, last = self.allowance.get(key, (self.rate_limit, now))
+            tokens = min(self.rate_limit, tokens + (now - last) * self.rate_limit)
+            if tokens < 1:
+                self.allowance[key] = (tokens, now)
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return None
+            
+            self.allowance[key] = (tokens - 1, now)
+            return self.suppressed.pop(key, 0)
 
     # # Example usage
     # log = Log(console_log=True)
@@ -77,3 +235,6 @@ class Log:
     # log(x, y)  # Logs as INFO
     # log(x, warning=True)  # Logs as WARNING
     # log(x, y, error=True)  # Logs as ERROR
+    # log(x, key="step")  # Logs as INFO, at most rate_limit per second
+    # log(x, key="step", sample=10)  # Logs every 10th call, rate limited
+    # log(lambda: (x, y), key="step")  # Makes the args only if logged
@@ -33,20 +33,46 @@
 
 import pygame as pg
 
+from src.Brush import Brush
+from src.InputScript import InputReplay
+
 
 class Mainloop:
-    def __init__(self, solver):
+    def __init__(self, spec, solver):
         self.solver = solver
         self.display = solver.display
         self.gui = solver.gui
+        self.events = []
+
+        # stop solving and rendering once the fluid has come to rest
+        idle_spec = spec["display"]["idle"]
+        self.idle = (idle_spec["active"] and self.display.pygame 
+                     and not spec["videowriter"]["record"])
+        self.ke_threshold = idle_spec["ke_threshold"]
+        self.smoke_threshold = idle_spec["smoke_threshold"]
+        self.idle_timeout = idle_spec["timeout"]
+
+        # brush strokes recorded in an earlier session, applied headless
+        self.replay = None
+        if spec["gui"]["replay_input"] is not None:
+            self.replay = InputReplay(spec["gui"]["replay_input"], 
+                                      Brush(spec["gui"], solver))
 
     def init(self):
-        if not self.display.pygame:
-            return
+        shared = self.solver.fluid.shared
+        if shared is not None:
+            shared.begin()
         
-        events = pg.event.get()
+        if self.replay is not None:
+            self.replay(self.solver.frame)
+
+        events = pg.event.get() if self.display.pygame else []
+        self.events = events
+
+        self.solver.profiler.time("gui", self.gui, events)
 
-        self.gui(events)
+        if shared is not None:
+            shared.end()
 
         for event in events:
             # print(event)
@@ -54,14 +80,43 @@ class Mainloop:
                 return 1
             elif event.type == pg.WINDOWRESIZED:
                 self.display.update_transformation(event)
+    
+    def quiescent(self):
+        """
+        True if nothing has happened this iteration and the fluid is at rest
+        """
+        if not self.idle or self.events:
+            return False
+        
+        mouse = self.gui.mouse
+        if mouse.state != 0 or mouse.r_press or mouse.mid_press:
+            return False
+        
+        derived = self.solver.fluid.derived
+        return (derived.kinetic_energy() < self.ke_threshold
+                and derived.max_smoke() < self.smoke_threshold)
+
+    def wait_for_input(self):
+        """
+        Block until an event arrives (or the timeout), leaving it in the queue 
+        for the next iteration
+        """
+        event = pg.event.wait(self.idle_timeout)
+        if event.type != pg.NOEVENT:
+            pg.event.post(event)
 
     def __call__(self):
         while True:
             if self.init():
                 break
 
+            if self.quiescent():
+                self.wait_for_input()
+                continue
+
             if self.solver.solve():
                 break
             self.display()   
 
         self.display.videowriter.save_video()
+        self.solver.close()
@@ -0,0 +1,226 @@
+################################################################################
+##
+##  File: Obstacles.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the Obstacles class, which builds the walls from 
+##                image masks and shape primitives and applies the boundary 
+##                conditions through ghost cells: slices on the domain edges 
+##                and precomputed index arrays on the obstacles
+##
+################################################################################
+
+
+import warnings
+import numpy as np
+from PIL import Image
+
+
+# the 4-neighbours (row, col) of a cell
+NEIGHBOURS = ((0, 1), (0, -1), (1, 0), (-1, 0))
+
+VELOCITY_BCS = ("no-slip", "free-slip", "open")
+
+
+class Obstacles:
+    def __init__(self, fluid, bcs_spec, obstacle_spec):
+        self.fluid = fluid
+        # "wall" was the name of the no-slip edges before there were others
+        self.edges = {side: "no-slip" if bcs_spec[side] == "wall" 
+                      else bcs_spec[side] for side in ("horizontal", "vertical")}
+        self.obstacle_bc = bcs_spec["obstacles"]
+        self.neumann = bcs_spec["pressure"] == "neumann"
+        for bc in (*self.edges.values(), self.obstacle_bc):
+            if bc not in VELOCITY_BCS:
+                warnings.warn(f"Boundary condition '{bc}' not recognised")
+
+        # ghost cells: wall cells next to the fluid, the fluid cell (image) 
+        # their values are mirrored from, and the outward normal between
+        self.rows = self.cols = None
+        self.image_rows = self.image_cols = None
+        self.normal_x = self.normal_y = None
+
+        if obstacle_spec["mask"] is not None:
+            fluid.walls[self.load_mask(obstacle_spec["mask"])] = True
+        for shape in obstacle_spec["shapes"]:
+            fluid.walls[self.shape_mask(shape)] = True
+    
+    def load_mask(self, path):
+        """
+        Walls from an image scaled to the grid: dark pixels are walls
+        """
+        image = Image.open(path).convert("L").resize(
+            (self.fluid.Nx, self.fluid.Ny), Image.NEAREST)
+        return np.asarray(image) < 128
+    
+    def shape_mask(self, shape):
+        """
+        Walls covered by a shape primitive, in domain units:
+            {"shape": "circle", "centre": [x, y], "radius": r}
+            {"shape": "rectangle", "corner": [x, y], "size": [w, h]}
+        """
+        X, Y = self.fluid.X, self.fluid.Y
+        if shape["shape"] == "circle":
+            (x, y), r = shape["centre"], shape["radius"]
+            return (X - x)**2 + (Y - y)**2 <= r**2
+        if shape["shape"] == "rectangle":
+            (x, y), (w, h) = shape["corner"], shape["size"]
+            return (X >= x) & (X < x + w) & (Y >= y) & (Y < y + h)
+        
+        warnings.warn(f"Obstacle shape '{shape['shape']}' not recognised")
+        return np.zeros((self.fluid.Ny, self.fluid.Nx), dtype=bool)
+
+    def refresh(self):
+        """
+        Rebuild the ghost cell index arrays from the walls
+        """
+        (self.rows, self.cols, self.image_rows, self.image_cols, 
+         self.normal_x, self.normal_y) = self.ghost_cells(self.fluid.walls)
+
+    def ghost_cells(self, walls, domain_edges=(True, True, True, True)):
+        """
+        Ghost cells of the wall mask walls: (rows, cols, image_rows, 
+        image_cols, normal_x, normal_y)
+        Outside walls counts as wall on the sides (first row, last row, first 
+        col, last col) that are domain edges; past the others, where walls is 
+        a patch of a larger grid, its edge cells are taken to continue
+        """
+        walls = np.asarray(walls) != 0
+        # outside the domain counts as wall, so every neighbour exists
+        padded = np.pad(walls, 1, constant_values=True)
+        first_row, last_row, first_col, last_col = domain_edges
+        if not first_row:
+            padded[0, 1:-1] = walls[0]
+        if not last_row:
+            padded[-1, 1:-1] = walls[-1]
+        if not first_col:
+            padded[1:-1, 0] = walls[:, 0]
+        if not last_col:
+            padded[1:-1, -1] = walls[:, -1]
+        fluid = ~padded
+
+        rows, cols = np.nonzero(walls & (fluid[1:-1, 2:] | fluid[1:-1, :-2] 
+                                         | fluid[2:, 1:-1] | fluid[:-2, 1:-1]))
+        
+        # the normal points from the wall into the fluid
+        normal_x = (fluid[rows + 1, cols + 2].astype(np.int8) 
+                    - fluid[rows + 1, cols])
+        normal_y = (fluid[rows + 2, cols + 1].astype(np.int8) 
+                    - fluid[rows, cols + 1])
+        image_rows, image_cols = rows + normal_y, cols + normal_x
+
+        # fluid on opposite sides, or only diagonally past a corner: mirror 
+        # from the first 4-neighbour that is fluid
+        bad = ~fluid[image_rows + 1, image_cols + 1] | (
+            (normal_x == 0) & (normal_y == 0))
+        for dy, dx in reversed(NEIGHBOURS):
+            use = bad & fluid[rows + 1 + dy, cols + 1 + dx]
+            normal_x[use], normal_y[use] = dx, dy
+        image_rows, image_cols = rows + normal_y, cols + normal_x
+
+        # in the fluid dtype: hypot of int8 would be float16
+        norm = np.hypot(normal_x, normal_y, dtype=self.fluid.dtype)
+        return (rows.astype(np.int32), cols.astype(np.int32), 
+                image_rows.astype(np.int32), image_cols.astype(np.int32), 
+                normal_x / norm, normal_y / norm)
+
+    def velocity(self, u, v, ghosts=None, domain_edges=(True, True, True, 
+                                                         True)):
+        """
+        Set the ghost velocities: on the domain edges by slicing, then on the 
+        obstacles by their index arrays (default: the grid's; ghosts and 
+        domain_edges as from ghost_cells for a patch of a grid)
+        no-slip mirrors the velocity negated (zero on the boundary), 
+        free-slip negates only its normal component, open copies it
+        """
+        sides = (
+            ("horizontal", (0, slice(None)), (1, slice(None)), "v"), 
+            ("horizontal", (-1, slice(None)), (-2, slice(None)), "v"), 
+            ("vertical", (slice(None), 0), (slice(None), 1), "u"), 
+            ("vertical", (slice(None), -1), (slice(None), -2), "u"), 
+        )
+        for edge, (side, ghost, image, normal) in zip(domain_edges, sides):
+            if edge:
+                self.mirror(u, v, ghost, image, self.edges[side], normal)
+
+        rows, cols, image_rows, image_cols, normal_x, normal_y = \
+            (self.rows, self.cols, self.image_rows, self.image_cols, 
+             self.normal_x, self.normal_y) if ghosts is None else ghosts
+        if not len(rows):
+            return
+        
+        ghost = (rows, cols)
+        image = (image_rows, image_cols)
+        u_i, v_i = u[image], v[image]
+        if self.obstacle_bc == "free-slip":
+            v_n = u_i * normal_x + v_i * normal_y
+            u[ghost] = u_i - 2 * v_n * normal_x
+            v[ghost] = v_i - 2 * v_n * normal_y
+        elif self.obstacle_bc == "open":
+            u[ghost], v[ghost] = u_i, v_i
+        else:
+            u[ghost], v[ghost] = -u_i, -v_i
+
+    @staticmethod
+    def mirror(u, v, ghost, image, bc, normal):
+        """
+        Ghost cell velocities on a domain edge, whose normal component is 
+        u or v
+        """
+        for name, D in (("u", u), ("v", v)):
+            if bc == "open" or (bc == "free-slip" and name != normal):
+                D[ghost] = D[image]
+            else:
+                D[ghost] = -D[image]
+
+    def pressure(self, p, rows=None, ghosts=None, 
+                 domain_edges=(True, True, True, True)):
+        """
+        Zero normal pressure gradient: each ghost cell copies its image
+        rows is the slice of the domain p covers, when p is a band of it; 
+        ghosts and domain_edges are as in velocity, when p is a patch of a grid
+        """
+        y0, y1 = (0, self.fluid.Ny) if rows is None else \
+            rows.indices(self.fluid.Ny)[:2]
+        first_row, last_row, first_col, last_col = domain_edges
+        if y0 == 0 and first_row:
+            p[0] = p[1]
+        if y1 == self.fluid.Ny and last_row:
+            p[-1] = p[-2]
+        if first_col:
+            p[:, 0] = p[:, 1]
+        if last_col:
+            p[:, -1] = p[:, -2]
+
+        ghost_rows, ghost_cols, image_rows, image_cols = \
+            (self.rows, self.cols, self.image_rows, self.image_cols) \
+            if ghosts is None else ghosts[:4]
+        if rows is not None:
+            inside = ((np.minimum(ghost_rows, image_rows) >= y0) 
+                      & (np.maximum(ghost_rows, image_rows) < y1))
+            ghost_rows = ghost_rows[inside] - y0
+            image_rows = image_rows[inside] - y0
+            ghost_cols, image_cols = ghost_cols[inside], image_cols[inside]
+        p[ghost_rows, ghost_cols] = p[image_rows, image_cols]
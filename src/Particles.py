@@ -0,0 +1,153 @@
+################################################################################
+##
+##  File: Particles.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the Particles class, a pool of Lagrangian tracer 
+##                particles stored as a struct of arrays, advected through the 
+##                fluid with RK2 and splatted onto the display
+##
+################################################################################
+
+
+import numpy as np
+
+
+class Particles:
+    def __init__(self, particle_spec, fluid):
+        self.fluid = fluid
+        self.capacity = int(particle_spec["count"])
+        self.lifetime = particle_spec["lifetime"]
+        self.emit_rate = particle_spec["emit_rate"]
+        self.colour = np.array(particle_spec["colour"], dtype=np.float32)
+        self.brush_colour = np.array(particle_spec["brush_colour"], 
+                                     dtype=np.float32)
+        self.rng = np.random.default_rng(particle_spec["seed"])
+
+        # struct of arrays with the live particles packed at the front: 
+        # emitting fills the slots after them, killing compacts them
+        self.x = np.zeros(self.capacity, dtype=np.float32)     # index coords
+        self.y = np.zeros(self.capacity, dtype=np.float32)
+        self.age = np.zeros(self.capacity, dtype=np.float32)
+        self.colours = np.zeros((3, self.capacity), dtype=np.float32)
+        self.n = 0
+    
+    def nbytes(self):
+        return sum(value.nbytes for value in vars(self).values() 
+                   if isinstance(value, np.ndarray))
+
+    def emit(self, x, y, colour):
+        """
+        Add particles at the (index) coordinates x, y, as many as the pool 
+        has free slots for
+        """
+        k = min(len(x), self.capacity - self.n)
+        new = slice(self.n, self.n + k)
+        self.x[new] = x[:k]
+        self.y[new] = y[:k]
+        self.age[new] = 0
+        self.colours[:, new] = colour[:, None]
+        self.n += k
+
+    def emit_cells(self, cells, colour=None):
+        """
+        A particle at a random point in each of cells = (rows, cols)
+        """
+        rows, cols = cells
+        jitter = self.rng.random((2, len(rows)), dtype=np.float32)
+        self.emit(cols + jitter[0], rows + jitter[1], 
+                  self.brush_colour if colour is None else colour)
+
+    def emit_uniform(self, count):
+        """
+        count particles scattered over the domain (those landing in walls are 
+        killed on the next step)
+        """
+        x, y = self.rng.random((2, count), dtype=np.float32)
+        self.emit(x * (self.fluid.Nx - 1), y * (self.fluid.Ny - 1), 
+                  self.colour)
+
+    def advance(self, dt):
+        """
+        Move the particles by dt with the midpoint rule, sampling the velocity 
+        bilinearly as Solver.advect does, then retire and replenish them
+        """
+        f = self.fluid
+        sample = f.solver.bilinear_sample
+        x, y = self.x[:self.n], self.y[:self.n]
+        # sampled in float32 (and in index units per step) throughout, as 
+        # there are far more particles than cells
+        u = np.multiply(f.u, dt / f.dx, dtype=np.float32)
+        v = np.multiply(f.v, dt / f.dy, dtype=np.float32)
+
+        # u and v are sampled from the same stencil at each stage
+        stencil = f.solver.bilinear_stencil(u.shape, x, y)
+        x_mid = x + 0.5 * sample(u, x, y, stencil=stencil)
+        y_mid = y + 0.5 * sample(v, x, y, stencil=stencil)
+        stencil = f.solver.bilinear_stencil(u.shape, x_mid, y_mid)
+        x += sample(u, x_mid, y_mid, stencil=stencil)
+        y += sample(v, x_mid, y_mid, stencil=stencil)
+        self.age[:self.n] += dt
+
+        self.kill()
+        self.emit_uniform(int(self.emit_rate * self.capacity))
+
+    def kill(self):
+        """
+        Drop the particles that are too old, have left the domain or are in a 
+        wall, packing the rest to the front of the pool
+        """
+        n = self.n
+        x, y = self.x[:n], self.y[:n]
+        keep = ((self.age[:n] < self.lifetime) 
+                & (x >= 0) & (x <= self.fluid.Nx - 1) 
+                & (y >= 0) & (y <= self.fluid.Ny - 1))
+        keep[keep] = self.fluid.walls[y[keep].astype(np.int32), 
+                                      x[keep].astype(np.int32)] == 0
+        
+        m = int(np.count_nonzero(keep))
+        if m == n:
+            return
+        for array in (self.x, self.y, self.age):
+            array[:m] = array[:n][keep]
+        self.colours[:, :m] = self.colours[:, :n][:, keep]
+        self.n = m
+
+    def splat(self, pxarray):
+        """
+        Add each particle's colour, faded with age, to the pixel it is in
+        (pxarray may be finer than the grid the particles move on)
+        """
+        Ny, Nx = pxarray.shape[:2]
+        sy, sx = Ny / self.fluid.Ny, Nx / self.fluid.Nx
+        n = self.n
+        cells = (np.minimum((self.y[:n] + 0.5) * sy, Ny - 1).astype(np.int32) 
+                 * Nx 
+                 + np.minimum((self.x[:n] + 0.5) * sx, Nx - 1).astype(np.int32))
+        fade = 1 - self.age[:n] / self.lifetime
+        for c in range(3):
+            pxarray[..., c] += np.bincount(
+                cells, weights=self.colours[c, :n] * fade, minlength=Ny * Nx
+            ).reshape(Ny, Nx)
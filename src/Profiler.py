@@ -0,0 +1,188 @@
+################################################################################
+##
+##  File: Profiler.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the Profiler class, which times each phase of a step
+##                and exports per-phase percentiles and steps/sec as JSON lines or
+##                Prometheus text, and can capture a cProfile of the next N steps
+##
+################################################################################
+
+
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Profiler:
+    def __init__(self, prof_spec, solver):
+        self.enabled = prof_spec["active"]
+        self.solver = solver
+        self.window = prof_spec["window"]
+        self.export_every = prof_spec["export_every"]
+        self.jsonl_path = prof_spec["jsonl"]
+
+        # the last self.window durations (ns) of each phase
+        self.samples = {}
+        self.counts = {}
+
+        self.start_ns = time.perf_counter_ns()
+        self.start_step = solver.step
+        self.next_export = self.export_every
+
+        self.capture = None
+        self.capture_until = None
+        self.capture_path = None
+
+        self.server = None
+        if self.enabled and prof_spec["prometheus_port"]:
+            self.serve(prof_spec["prometheus_port"])
+    
+    def time(self, name, func, *args):
+        """
+        Call func(*args), timing it as phase name if profiling is enabled
+        """
+        if not self.enabled:
+            return func(*args)
+        
+        start = time.perf_counter_ns()
+        result = func(*args)
+        self.record(name, time.perf_counter_ns() - start)
+        return result
+
+    def record(self, name, ns):
+        if name not in self.samples:
+            self.samples[name] = np.zeros(self.window, dtype=np.int64)
+            self.counts[name] = 0
+        self.samples[name][self.counts[name] % self.window] = ns
+        self.counts[name] += 1
+
+    def end_frame(self):
+        """
+        Called once per Solver.solve: finishes captures and exports metrics
+        """
+        step = self.solver.step
+        if self.capture is not None and step >= self.capture_until:
+            self.capture.disable()
+            pstats.Stats(self.capture).sort_stats("cumulative") \
+                .dump_stats(self.capture_path)
+            self.solver.log(f"Profile of steps up to {step} saved to "
+                            f"{self.capture_path}")
+            self.capture = None
+        
+        if self.enabled and self.export_every and step >= self.next_export:
+            self.next_export = step + self.export_every
+            self.export_jsonl()
+
+    def capture_steps(self, n_steps, path="out/profile.prof"):
+        """
+        Run cProfile over the next n_steps solver steps, saving the stats to 
+        path (view with python -m pstats or snakeviz)
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.capture = cProfile.Profile()
+        self.capture_until = self.solver.step + n_steps
+        self.capture_path = path
+        self.capture.enable()
+
+    def summary(self):
+        """
+        Per-phase count, p50, p95 and max (seconds) and overall steps/sec
+        """
+        elapsed = (time.perf_counter_ns() - self.start_ns) / 1e9
+        phases = {}
+        for name, samples in list(self.samples.items()):
+            recent = samples[:min(self.counts[name], self.window)] / 1e9
+            p50, p95 = np.percentile(recent, [50, 95])
+            phases[name] = {"count": self.counts[name], "p50": p50, 
+                            "p95": p95, "max": recent.max()}
+        
+        return {
+            "step": self.solver.step,
+            "t": self.solver.t,
+            "steps_per_sec": (self.solver.step - self.start_step) / elapsed 
+                if elapsed > 0 else 0.0,
+            "phases": phases,
+        }
+    
+    def export_jsonl(self):
+        os.makedirs(os.path.dirname(self.jsonl_path) or ".", exist_ok=True)
+        with open(self.jsonl_path, "a") as file:
+            file.write(json.dumps(self.summary()) + "\n")
+    
+    def prometheus(self):
+        summary = self.summary()
+        lines = [
+            "# TYPE fluidsim_steps_per_second gauge",
+            f"fluidsim_steps_per_second {summary['steps_per_sec']}",
+            "# TYPE fluidsim_step gauge",
+            f"fluidsim_step {summary['step']}",
+            "# TYPE fluidsim_phase_seconds summary",
+        ]
+        for name, p in summary["phases"].items():
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), 
+                                  ("1", "max")):
+                lines.append(f'fluidsim_phase_seconds{{phase="{name}",'
+                             f'quantile="{quantile}"}} {p[key]}')
+            lines.append(f'fluidsim_phase_seconds_count{{phase="{name}"}} '
+                         f'{p["count"]}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port):
+        """
+        Serve the metrics in Prometheus text format on localhost:port/metrics
+        """
+        profiler = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = profiler.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self.enabled and self.export_every:
+            self.export_jsonl()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
@@ -0,0 +1,415 @@
+################################################################################
+##
+##  File: Quadtree.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##
+##  Description:  Implements the Quadtree class, block-structured refinement of
+##                the Fluid's grid in fixed-size tiles around smoke and vortices
+##
+################################################################################
+
+
+import math
+import numpy as np
+from scipy import ndimage
+
+from src.ImplicitDiffusion import canonical_window
+from src.SmokeTiles import SmokeTiles
+
+
+class Quadtree:
+    def __init__(self, fluid, refinement_spec):
+        self.fluid = fluid
+        self.levels = refinement_spec["levels"]
+        self.size = refinement_spec["tile_size"]
+        self.every = refinement_spec["every"]
+        self.vorticity_threshold = refinement_spec["vorticity"]
+        self.gradient_threshold = refinement_spec["smoke_gradient"]
+        self.names = ("u", "v", "p", "d")
+        if self.size % 2**(self.levels - 1):
+            raise ValueError(f"Refinement tile_size {self.size} is not a "
+                             f"multiple of 2^(levels - 1) = "
+                             f"{2**(self.levels - 1)}")
+
+        # level 0 is the Fluid's own grid; each level after halves the cell 
+        # size, and holds fields only for its refined tiles, by (row, col)
+        self.tiles = [None] + [{} for _ in range(1, self.levels)]
+        self.masks = [None] + [
+            np.zeros(tuple(n // self.size for n in self.shape(level)), 
+                     dtype=bool)
+            for level in range(1, self.levels)
+        ]
+
+        self.diffuse = [fluid.diffusion_solver(*self.spacing(level)) 
+                        for level in range(self.levels)]
+        self.div = [fluid.div_function(*self.spacing(level)) 
+                    for level in range(self.levels)]
+
+    def shape(self, level):
+        return self.fluid.Ny << level, self.fluid.Nx << level
+
+    def spacing(self, level):
+        return self.fluid.dx / 2**level, self.fluid.dy / 2**level
+
+    def nbytes(self):
+        return sum(D.nbytes for tiles in self.tiles[1:] 
+                   for tile in tiles.values() for D in tile.values())
+
+    def walls(self, level, rows, cols):
+        """
+        Wall mask over the cells (rows, cols) of level, from the level 0 cells 
+        they lie in
+        """
+        return self.fluid.walls[
+            (np.arange(rows.start, rows.stop) >> level)[:, None], 
+            (np.arange(cols.start, cols.stop) >> level)[None, :]] != 0
+
+    def gather(self, level, rows, cols, names=None, own=True):
+        """
+        Copies of the fields over the cells (rows, cols) of level: the coarser 
+        level interpolated, overlaid with this level's own tiles if own
+        """
+        names = self.names if names is None else names
+        if level == 0:
+            return {name: np.array(getattr(self.fluid, name)[rows, cols]) 
+                    for name in names}
+
+        # parent cells around the region, with one more for interpolation
+        ny, nx = self.shape(level - 1)
+        py0, py1 = max(rows.start // 2 - 1, 0), min(rows.stop // 2 + 2, ny)
+        px0, px1 = max(cols.start // 2 - 1, 0), min(cols.stop // 2 + 2, nx)
+        parent = self.gather(level - 1, slice(py0, py1), slice(px0, px1), 
+                             names)
+        
+        # cell i of this level is centred at (i + 0.5) / 2 - 0.5 of the parent
+        IY = np.clip(np.arange(rows.start, rows.stop) / 2 - 0.25 - py0, 
+                     0, py1 - py0 - 1)[:, None]
+        IX = np.clip(np.arange(cols.start, cols.stop) / 2 - 0.25 - px0, 
+                     0, px1 - px0 - 1)[None, :]
+        sample = self.fluid.solver.bilinear_sample
+        stencil = self.fluid.solver.bilinear_stencil((py1 - py0, px1 - px0), 
+                                                     IX, IY)
+        fields = {name: sample(parent[name], IX, IY, stencil=stencil)
+                            .astype(self.fluid.dtype, copy=False) 
+                  for name in names}
+        if not own:
+            return fields
+
+        T = self.size
+        for ty in range(rows.start // T, -(-rows.stop // T)):
+            for tx in range(cols.start // T, -(-cols.stop // T)):
+                tile = self.tiles[level].get((ty, tx))
+                if tile is None:
+                    continue
+                y0, y1 = max(ty*T, rows.start), min((ty + 1)*T, rows.stop)
+                x0, x1 = max(tx*T, cols.start), min((tx + 1)*T, cols.stop)
+                for name in names:
+                    fields[name][y0 - rows.start:y1 - rows.start, 
+                                 x0 - cols.start:x1 - cols.start] = \
+                        tile[name][y0 - ty*T:y1 - ty*T, x0 - tx*T:x1 - tx*T]
+        return fields
+
+    def halo(self, level):
+        """
+        Cells around a run of tiles to step with it: the backtrace and the 
+        diffusion and projection stencils, beyond which the coarser level's 
+        interpolated values stand in as ghost cells
+        """
+        fluid, solver = self.fluid, self.fluid.solver
+        dx, dy = self.spacing(level)
+        shift = fluid.derived.max_speed() * solver.dt / min(dx, dy)
+        spread = fluid.diffusion_reach()
+        if solver.solver_type in ("BackwardEuler", "FEM"):
+            spread <<= level
+        return math.ceil(shift) + spread + solver.nit + 4
+
+    def advance(self):
+        """
+        Advance the tiles of every level by a step, all from the state at the 
+        start of it (no tile is written until every block has been stepped)
+        Each connected group of tiles is stepped as one block, its bounding 
+        box, so they share a halo
+        """
+        T = self.size
+        results = []
+        for level in range(1, self.levels):
+            halo = self.halo(level)
+            ny, nx = self.shape(level)
+            labels, _ = ndimage.label(self.masks[level])
+            for rows, cols in ndimage.find_objects(labels):
+                y0, x0 = max(rows.start*T - halo, 0), max(cols.start*T - halo, 0)
+                outer = (slice(y0, min(rows.stop*T + halo, ny)), 
+                         slice(x0, min(cols.stop*T + halo, nx)))
+                if self.fluid.canonical_regions:
+                    outer = (canonical_window(outer[0].start, outer[0].stop, 
+                                              ny), 
+                             canonical_window(outer[1].start, outer[1].stop, 
+                                              nx))
+                    y0, x0 = outer[0].start, outer[1].start
+                fields = self.step(level, outer)
+                results.append((level, rows, cols, y0, x0, fields))
+        
+        for level, rows, cols, y0, x0, fields in results:
+            for ty in range(rows.start, rows.stop):
+                for tx in range(cols.start, cols.stop):
+                    tile = self.tiles[level].get((ty, tx))
+                    if tile is None:
+                        continue
+                    core = (slice(ty*T - y0, (ty + 1)*T - y0), 
+                            slice(tx*T - x0, (tx + 1)*T - x0))
+                    for name, D in fields.items():
+                        tile[name][...] = D[core]
+
+    def step(self, level, outer):
+        """
+        One solver step on the cells outer of level, returning the fields
+        """
+        fluid, solver = self.fluid, self.fluid.solver
+        dx, dy = self.spacing(level)
+        diffuse, div = self.diffuse[level], self.div[level]
+        dt = solver.dt
+
+        fields = self.gather(level, *outer)
+        u, v, p, d = (fields[name] for name in self.names)
+        walls = self.walls(level, *outer)
+        where_fluid = ~walls
+        # wall treatment as on level 0: ghost cells of the obstacles in the 
+        # block, and the domain edges it reaches
+        ny, nx = self.shape(level)
+        rows, cols = outer
+        edges = (rows.start == 0, rows.stop == ny, 
+                 cols.start == 0, cols.stop == nx)
+        obstacles = fluid.obstacles
+        ghosts = obstacles.ghost_cells(walls, edges)
+        bcs = None if not obstacles.neumann else \
+            lambda p: obstacles.pressure(p, ghosts=ghosts, domain_edges=edges)
+        where_inner_fluid = where_fluid[1:-1, 1:-1]
+        u[walls] = 0
+        v[walls] = 0
+        IX = np.arange(u.shape[1], dtype=np.int32)[None, :]
+        IY = np.arange(u.shape[0], dtype=np.int32)[:, None]
+
+        def project():
+            if not obstacles.neumann:
+                p[walls] = 0
+            _, u_df, v_df = solver.extract_divfree(
+                u, v, p, dx, dy, solver.nit, where_inner_fluid, div, bcs)
+            u[where_fluid] = u_df[where_fluid]
+            v[where_fluid] = v_df[where_fluid]
+
+        for D in (u, v):
+            D[where_fluid] = diffuse(
+                D, where_inner_fluid=where_inner_fluid)[where_fluid]
+        project()
+
+        advect = fluid.advection_kernels["velocity"]
+        u_tmp = advect(u, where_fluid, u, v, dx, dy, IX, IY, dt)
+        v[where_fluid] = advect(v, where_fluid, u, v, dx, dy, IX, IY, 
+                                dt)[where_fluid]
+        u[where_fluid] = u_tmp[where_fluid]
+        project()
+        obstacles.velocity(u, v, ghosts, edges)
+
+        d[where_fluid] = diffuse(d, fluid.smoke_nu, 
+                                 where_inner_fluid=where_inner_fluid)[where_fluid]
+        d[where_fluid] = fluid.advection_kernels["smoke"](
+            d, where_fluid, u, v, dx, dy, IX, IY, dt)[where_fluid]
+        d *= fluid.smoke_fade
+        return fields
+
+    def restrict(self):
+        """
+        Replace the cells under each tile by the mean of the 4 children of 
+        each, finest level first
+        """
+        H = self.size // 2
+        for level in range(self.levels - 1, 0, -1):
+            for (ty, tx), tile in self.tiles[level].items():
+                if level == 1:
+                    rows, cols = slice(ty*H, (ty + 1)*H), slice(tx*H, (tx + 1)*H)
+                    where_fluid = self.fluid.walls[rows, cols] == 0
+                else:
+                    parent = self.tiles[level - 1][(ty // 2, tx // 2)]
+                    rows = slice((ty % 2)*H, (ty % 2 + 1)*H)
+                    cols = slice((tx % 2)*H, (tx % 2 + 1)*H)
+                    where_fluid = Ellipsis
+                for name, D in tile.items():
+                    coarse = D.reshape(H, 2, H, 2).mean(axis=(1, 3))
+                    target = getattr(self.fluid, name) if level == 1 \
+                        else parent[name]
+                    target[rows, cols][where_fluid] = coarse[where_fluid]
+
+    def indicators(self, level):
+        """
+        Tiles of level + 1 over cells of level whose vorticity or smoke 
+        gradient exceed the thresholds, both made dimensionless: the change 
+        across a cell of level relative to the largest speed or smoke density
+        """
+        T, H = self.size, self.size // 2
+        ny, nx = self.shape(level)
+        dx, dy = self.spacing(level)
+        h = min(dx, dy)
+        max_speed = self.fluid.derived.max_speed()
+        max_smoke = self.fluid.derived.max_smoke()
+        flagged = np.zeros_like(self.masks[level + 1])
+        if level == 0:
+            regions = [(slice(0, ny), slice(0, nx))]
+        else:
+            regions = [(slice(r*T, (r + 1)*T), slice(c0*T, c1*T)) 
+                       for r, c0, c1 in SmokeTiles.runs(self.masks[level])]
+        
+        for rows, cols in regions:
+            # one cell more each side, for the differences
+            y0, x0 = max(rows.start - 1, 0), max(cols.start - 1, 0)
+            outer = (slice(y0, min(rows.stop + 1, ny)), 
+                     slice(x0, min(cols.stop + 1, nx)))
+            fields = self.gather(level, *outer, names=("u", "v", "d"))
+            inner = (slice(rows.start - y0, rows.stop - y0), 
+                     slice(cols.start - x0, cols.stop - x0))
+            
+            dd_dy, dd_dx = np.gradient(fields["d"], dy, dx)
+            hot = np.zeros(fields["d"].shape, dtype=bool)
+            if max_speed > 0:
+                hot |= (np.abs(self.vorticity(fields, level)) * h 
+                        > self.vorticity_threshold * max_speed)
+            if max_smoke > 0:
+                hot |= (np.hypot(dd_dx, dd_dy) * h 
+                        > self.gradient_threshold * max_smoke)
+            hot = hot[inner]
+            
+            # whole tiles of the next level only
+            R, C = hot.shape[0] // H, hot.shape[1] // H
+            R = min(R, flagged.shape[0] - rows.start // H)
+            C = min(C, flagged.shape[1] - cols.start // H)
+            flagged[rows.start // H:rows.start // H + R, 
+                    cols.start // H:cols.start // H + C] |= \
+                hot[:R*H, :C*H].reshape(R, H, C, H).any(axis=(1, 3))
+        return flagged
+
+    def vorticity(self, fields, level):
+        dx, dy = self.spacing(level)
+        return (np.gradient(fields["v"], dx, axis=1) 
+              - np.gradient(fields["u"], dy, axis=0))
+
+    def regrid(self):
+        """
+        Refine the tiles over cells exceeding the indicator thresholds (and 
+        their neighbours) and coarsen the rest, coarsest level first so every 
+        tile keeps a parent
+        """
+        T = self.size
+        for level in range(1, self.levels):
+            keep = self.indicators(level - 1)
+            grown = keep.copy()
+            grown[1:] |= keep[:-1]
+            grown[:-1] |= keep[1:]
+            keep = grown.copy()
+            grown[:, 1:] |= keep[:, :-1]
+            grown[:, :-1] |= keep[:, 1:]
+            if level > 1:
+                parents = np.zeros_like(grown)
+                mask = self.masks[level - 1].repeat(2, axis=0).repeat(2, axis=1)
+                h, w = min(mask.shape[0], grown.shape[0]), \
+                    min(mask.shape[1], grown.shape[1])
+                parents[:h, :w] = mask[:h, :w]
+                grown &= parents
+
+            tiles = self.tiles[level]
+            for ty, tx in zip(*np.nonzero(self.masks[level] & ~grown)):
+                del tiles[(ty, tx)]
+            for ty, tx in zip(*np.nonzero(grown & ~self.masks[level])):
+                tiles[(ty, tx)] = self.gather(
+                    level, slice(ty*T, (ty + 1)*T), slice(tx*T, (tx + 1)*T), 
+                    own=False)
+            self.masks[level] = grown
+
+    def refresh(self):
+        """
+        Drop every tile and refine afresh, for when the fields have been 
+        changed wholesale (eg. on restart)
+        """
+        for level in range(1, self.levels):
+            self.tiles[level].clear()
+            self.masks[level][:] = False
+        self.regrid()
+
+    def stamp(self, name, brush_pos, values, add=False):
+        """
+        Set (or add to) name by values on the tiles' cells within the level 0 
+        cells brush_pos, as the Brush has on level 0
+        """
+        rows, cols = brush_pos
+        values = np.broadcast_to(values, rows.shape)
+        for level in range(1, self.levels):
+            s = 2**level
+            per = self.size // s                # level 0 cells across a tile
+            nty, ntx = self.masks[level].shape
+            inside = (rows // per < nty) & (cols // per < ntx)
+            keys = np.where(inside, (rows // per) * ntx + cols // per, -1)
+            for key in np.unique(keys[inside]):
+                tile = self.tiles[level].get(divmod(int(key), ntx))
+                if tile is None:
+                    continue
+                sel = keys == key
+                fine_rows = ((rows[sel] % per) * s)[:, None, None] \
+                    + np.arange(s)[None, :, None]
+                fine_cols = ((cols[sel] % per) * s)[:, None, None] \
+                    + np.arange(s)[None, None, :]
+                value = values[sel][:, None, None]
+                if add:
+                    tile[name][fine_rows, fine_cols] += value
+                else:
+                    tile[name][fine_rows, fine_cols] = value
+
+    def composite(self, name, shape):
+        """
+        The field name ("d" or "vorticity") over all levels at the finest 
+        resolution, cropped (or padded) to shape
+        """
+        F = 2**(self.levels - 1)
+        ny, nx = self.shape(0)
+        level0 = self.fluid.d if name == "d" \
+            else self.vorticity({"u": self.fluid.u, "v": self.fluid.v}, 0)
+        
+        image = np.empty((ny, F, nx, F), dtype=self.fluid.dtype)
+        image[...] = level0[:, None, :, None]
+        image = image.reshape(ny*F, nx*F)
+
+        T = self.size
+        for level in range(1, self.levels):
+            s = F >> level
+            for (ty, tx), tile in self.tiles[level].items():
+                D = tile["d"] if name == "d" else self.vorticity(
+                    self.gather(level, slice(ty*T, (ty + 1)*T), 
+                                slice(tx*T, (tx + 1)*T), names=("u", "v")), 
+                    level)
+                image[ty*T*s:(ty + 1)*T*s, tx*T*s:(tx + 1)*T*s] = \
+                    D.repeat(s, axis=0).repeat(s, axis=1)
+        
+        out = np.zeros(shape, dtype=self.fluid.dtype)
+        h, w = min(shape[0], image.shape[0]), min(shape[1], image.shape[1])
+        out[:h, :w] = image[:h, :w]
+        return out
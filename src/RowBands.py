@@ -0,0 +1,95 @@
+################################################################################
+##
+##  File: RowBands.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the RowBands class, which streams whole-field 
+##                updates through the Fluid in bands of rows with halo rows, so 
+##                memory-mapped fields are read and written sequentially
+##
+################################################################################
+
+
+import numpy as np
+from collections import deque
+
+
+class RowBands:
+    def __init__(self, fluid, rows):
+        self.fluid = fluid
+        self.rows = rows
+    
+    def regions(self, halo):
+        """
+        For each band, top to bottom: (core, outer, inner) where outer is core 
+        grown by halo rows and inner is core relative to outer
+        Every outer band has the same number of rows (those at the domain 
+        edges are shifted inside it), so operators factorized for one band's 
+        shape serve them all
+        """
+        Ny = self.fluid.Ny
+        size = min(self.rows + 2 * halo, Ny)
+        regions = []
+        for start in range(0, Ny, self.rows):
+            stop = min(start + self.rows, Ny)
+            y0 = min(max(start - halo, 0), Ny - size)
+            outer = slice(y0, y0 + size)
+            regions.append((slice(start, stop), outer, 
+                            slice(start - y0, stop - y0)))
+        return regions
+
+    def apply(self, step, names, halo):
+        """
+        Update the fields names band by band: step(fields, walls, outer) gets 
+        copies of the fields (dict) and the walls over each outer band (and 
+        the band's rows) and returns the updated fields, of which only the 
+        core rows are kept
+        A band is written back once no later band's halo reads its rows, so 
+        every band sees the fields as they were before the update
+        """
+        fluid = self.fluid
+        pending = deque()
+        for core, outer, inner in self.regions(halo):
+            fields = {name: np.array(getattr(fluid, name)[outer]) 
+                      for name in names}
+            results = step(fields, np.asarray(fluid.walls[outer]) != 0, outer)
+
+            while pending and pending[0][0].stop <= outer.start:
+                self.write(*pending.popleft())
+            pending.append((core, {name: result[inner] 
+                                   for name, result in results.items()}))
+        
+        while pending:
+            self.write(*pending.popleft())
+    
+    def write(self, core, results):
+        for name, result in results.items():
+            getattr(self.fluid, name)[core] = result
+    
+    def max(self, func):
+        """
+        Max of func(core rows) over the bands
+        """
+        return max(float(func(core).max()) for core, _, _ in self.regions(0))
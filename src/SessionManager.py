@@ -0,0 +1,233 @@
+################################################################################
+##
+##  File: SessionManager.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the SessionManager class, which hosts many independent
+##                headless Solvers in one process, steps them fairly on a thread
+##                pool and evicts idle ones to checkpoints under memory pressure
+##
+################################################################################
+
+
+import os
+import copy
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from assets.solver_config import spec as default_spec
+from src.Solver import Solver
+from src.Brush import Brush
+from src.Checkpoint import FIELDS, write_checkpoint
+
+
+def session_path(path, name):
+    """
+    path moved into a directory for the session name, beside its own
+    """
+    head, tail = os.path.split(path)
+    return os.path.join(head, name, tail)
+
+
+class Session:
+    def __init__(self, name, spec):
+        self.name = name
+        self.spec = spec
+        self.solver = Solver(spec)
+        self.brush = Brush(spec["gui"], self.solver)
+        self.lock = threading.Lock()
+        self.last_active = time.monotonic()
+        self.checkpoint = None
+        self.finished = False
+    
+    def nbytes(self):
+        """
+        Memory held by the session's arrays
+        """
+        solver = self.solver
+        if solver is None:
+            return 0
+        return (sum(solver.fluid.memory_report().values()) 
+                + solver.display.pxarray.nbytes)
+
+
+class SessionManager:
+    def __init__(self, sessions_spec=None):
+        sessions_spec = default_spec["sessions"] if sessions_spec is None \
+            else sessions_spec
+        self.memory_limit = sessions_spec["memory_limit"]
+        self.idle_after = sessions_spec["idle_after"]
+        self.checkpoint_dir = sessions_spec["checkpoint_dir"]
+        self.pool = ThreadPoolExecutor(max_workers=sessions_spec["workers"])
+
+        self.sessions = {}
+        self.lock = threading.Lock()
+    
+    def create(self, name, spec=None):
+        """
+        Start a new session from spec (default: the solver_config spec)
+        Sessions are always headless; everything else comes from spec
+        """
+        spec = copy.deepcopy(default_spec if spec is None else spec)
+        spec["name"] = name
+        spec["display"]["pygame"] = False
+        spec["share"]["active"] = False
+        spec["stream"]["active"] = False
+        spec["videowriter"]["record"] = False
+
+        # files of their own, so sessions don't write over each other's
+        for section, key in (("output", "path"), ("log", "path"), 
+                             ("checkpoint", "dir"), ("storage", "dir")):
+            spec[section][key] = session_path(spec[section][key], name)
+
+        with self.lock:
+            if name in self.sessions:
+                raise ValueError(f"Session '{name}' already exists")
+            self.sessions[name] = Session(name, spec)
+        self.relieve_memory_pressure()
+        return self.sessions[name]
+    
+    def remove(self, name):
+        with self.lock:
+            session = self.sessions.pop(name)
+        with session.lock:
+            if session.solver is not None:
+                session.solver.close()
+                session.solver = None
+                session.brush = None
+        if session.checkpoint is not None:
+            os.remove(session.checkpoint)
+    
+    def get(self, name):
+        """
+        The session's Solver, restored from its checkpoint if it was evicted
+        """
+        session = self.sessions[name]
+        with session.lock:
+            session.last_active = time.monotonic()
+            if session.solver is None:
+                self.restore(session)
+        self.relieve_memory_pressure()
+        return session.solver
+    
+    def apply_input(self, name, centres, rad, delta_pos, l_press, r_press):
+        """
+        Apply a brush stroke (see Brush) to a session before its next step
+        """
+        solver = self.get(name)
+        session = self.sessions[name]
+        with session.lock:
+            session.brush(centres, rad, delta_pos, l_press, r_press)
+        return solver
+    
+    def step(self):
+        """
+        Advance every resident, unfinished session by one solver step, spread 
+        over the thread pool; each session gets exactly one step per call
+        """
+        with self.lock:
+            sessions = [s for s in self.sessions.values() 
+                        if s.solver is not None and not s.finished]
+        
+        futures = [(s, self.pool.submit(self.step_session, s)) 
+                   for s in sessions]
+        for session, future in futures:
+            if future.result():
+                # it may have been evicted since its step
+                with session.lock:
+                    session.finished = True
+                    if session.solver is not None:
+                        session.solver.log(f"Session {session.name} finished")
+        
+        self.relieve_memory_pressure()
+        return len(futures)
+    
+    @staticmethod
+    def step_session(session):
+        with session.lock:
+            # evicted since it was scheduled: skip this round
+            return session.solver.solve() if session.solver is not None \
+                else None
+    
+    def run(self, n_steps=None):
+        """
+        Step the sessions until all are finished (or n_steps rounds)
+        """
+        n = 0
+        while (n_steps is None or n < n_steps) and self.step():
+            n += 1
+        return n
+    
+    def nbytes(self):
+        return sum(s.nbytes() for s in self.sessions.values())
+    
+    def relieve_memory_pressure(self):
+        """
+        While over the memory limit, evict the least recently active of the 
+        sessions idle for longer than idle_after
+        """
+        with self.lock:
+            if self.nbytes() <= self.memory_limit:
+                return
+            
+            now = time.monotonic()
+            idle = sorted((s for s in self.sessions.values() 
+                           if s.solver is not None 
+                           and now - s.last_active > self.idle_after),
+                          key=lambda s: s.last_active)
+            
+            for session in idle:
+                if self.nbytes() <= self.memory_limit:
+                    break
+                self.evict(session)
+
+    def evict(self, session):
+        with session.lock:
+            solver = session.solver
+            if solver is None:      # evicted or removed meanwhile
+                return
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            path = os.path.join(self.checkpoint_dir, f"{session.name}.fsc")
+            write_checkpoint(path, {name: getattr(solver.fluid, name) 
+                                    for name in FIELDS},
+                             solver.t, solver.step, session.spec)
+            solver.log(f"Session {session.name} evicted to {path}")
+            solver.close()
+            session.checkpoint = path
+            session.solver = None
+            session.brush = None
+    
+    def restore(self, session):
+        spec = copy.deepcopy(session.spec)
+        spec["checkpoint"]["restart"] = session.checkpoint
+        session.solver = Solver(spec)
+        session.brush = Brush(spec["gui"], session.solver)
+    
+    def close(self):
+        self.pool.shutdown()
+        for session in self.sessions.values():
+            if session.solver is not None:
+                session.solver.close()
@@ -0,0 +1,256 @@
+################################################################################
+##
+##  File: SharedFields.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the SharedFields class, which places Fluid (and
+##                Display) arrays in named shared memory guarded by seqlock
+##                counters, and SharedFieldsClient, which attaches to them from
+##                another process
+##
+################################################################################
+
+
+import json
+import os
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+
+# control block: one int64 sequence number per group, the owner's pid, the 
+# step (int64) and t (float64), then the JSON metadata length (uint32) and 
+# the metadata
+# a group's sequence number is odd while it is being written
+CONTROL_SIZE = 4096
+GROUPS = ("fields", "pxarray")
+OWNER = len(GROUPS)
+N_HEADER = len(GROUPS) + 3
+
+
+class SharedFields:
+    def __init__(self, share_spec):
+        self.name = share_spec["name"]
+        self.blocks = {}
+        self.meta = {"groups": GROUPS, "arrays": {}}
+
+        self.control_shm = self.claim(f"{self.name}_control")
+        self.control = np.ndarray((N_HEADER,), dtype=np.int64, 
+                                  buffer=self.control_shm.buf)
+        self.control[:] = 0
+        self.control[OWNER] = os.getpid()
+
+    def claim(self, name):
+        """
+        Create the control block, replacing one left by a run that exited 
+        without unlinking it; raises FileExistsError if its owner still runs
+        """
+        try:
+            return shared_memory.SharedMemory(name=name, create=True, 
+                                              size=CONTROL_SIZE)
+        except FileExistsError:
+            existing = attach(name)
+            header = np.ndarray((N_HEADER,), dtype=np.int64, 
+                                buffer=existing.buf)
+            owner = int(header[OWNER])
+            del header
+            existing.close()
+            if owner <= 0 or running(owner):
+                raise FileExistsError(
+                    f"Shared fields '{self.name}' are in use by process "
+                    f"{owner}; give this run a unique share name") from None
+            
+        unlink(name)
+        return shared_memory.SharedMemory(name=name, create=True, 
+                                          size=CONTROL_SIZE)
+    
+    def share(self, name, array, group="fields"):
+        """
+        Return a copy of array in a new shared memory block, to be used in 
+        its place
+        """
+        block, size = f"{self.name}_{name}", max(array.nbytes, 1)
+        try:
+            shm = shared_memory.SharedMemory(name=block, create=True, size=size)
+        except FileExistsError:
+            # left by the dead owner of the control block this run claimed
+            unlink(block)
+            shm = shared_memory.SharedMemory(name=block, create=True, size=size)
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        shared[...] = array
+
+        self.blocks[name] = shm
+        self.meta["arrays"][name] = {"block": shm.name, "group": group, 
+                                     "shape": array.shape, 
+                                     "dtype": array.dtype.str}
+        return shared
+    
+    def publish(self):
+        """
+        Write the metadata clients need to attach, once everything is shared
+        """
+        meta = json.dumps(self.meta).encode()
+        start = N_HEADER * 8
+        if start + 4 + len(meta) > CONTROL_SIZE:
+            raise ValueError("Too many shared arrays for the control block")
+        
+        buf = self.control_shm.buf
+        buf[start:start + 4] = len(meta).to_bytes(4, "little")
+        buf[start + 4:start + 4 + len(meta)] = meta
+
+    def begin(self, group="fields"):
+        self.control[GROUPS.index(group)] += 1
+    
+    def end(self, group="fields", step=None, t=None):
+        if step is not None:
+            self.control[-2] = step
+            self.control[-1:].view(np.float64)[0] = t
+        self.control[GROUPS.index(group)] += 1
+
+    def close(self):
+        """
+        Remove the shared blocks; the arrays stay usable in this process 
+        until they are garbage collected
+        """
+        for shm in [*self.blocks.values(), self.control_shm]:
+            shm.unlink()
+            try:
+                shm.close()
+            except BufferError:     # still referenced by an array
+                pass
+        self.blocks = {}
+
+
+def running(pid):
+    """
+    Whether the process pid exists (always assumed on Windows, where a 
+    block is freed with the last process using it, so none is left stale)
+    """
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:     # exists, owned by another user
+        pass
+    return True
+
+
+def unlink(name):
+    """
+    Remove a stale shared memory block, if there is one
+    """
+    try:
+        stale = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    stale.close()
+    stale.unlink()
+
+
+def attach(name):
+    """
+    Attach to an existing shared memory block without this process taking 
+    ownership of (and unlinking) it on exit
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:   # python < 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedFieldsClient:
+    def __init__(self, name):
+        self.control_shm = attach(f"{name}_control")
+        self.control = np.ndarray((N_HEADER,), dtype=np.int64, 
+                                  buffer=self.control_shm.buf)
+        
+        start = N_HEADER * 8
+        buf = self.control_shm.buf
+        meta_len = int.from_bytes(buf[start:start + 4], "little")
+        if not meta_len:
+            raise RuntimeError(f"Shared fields '{name}' not yet published")
+        meta = json.loads(bytes(buf[start + 4:start + 4 + meta_len]))
+        
+        self.blocks = {}
+        self.arrays = {}
+        self.groups = {}
+        for array_name, a in meta["arrays"].items():
+            shm = attach(a["block"])
+            array = np.ndarray(tuple(a["shape"]), dtype=np.dtype(a["dtype"]), 
+                               buffer=shm.buf)
+            array.flags.writeable = False
+            self.blocks[array_name] = shm
+            self.arrays[array_name] = array
+            self.groups.setdefault(a["group"], {})[array_name] = array
+
+    @property
+    def step(self):
+        return int(self.control[-2])
+
+    @property
+    def t(self):
+        return float(self.control[-1:].view(np.float64)[0])
+
+    def read(self, func, group="fields", timeout=1):
+        """
+        Call func with a dict of (read-only, zero-copy) views of the group's 
+        arrays, retrying until it ran without the simulation writing to them
+        Returns what func returned
+        """
+        i = GROUPS.index(group)
+        deadline = time.perf_counter() + timeout
+        while True:
+            before = int(self.control[i])
+            if not before % 2:
+                result = func(self.groups[group])
+                if int(self.control[i]) == before:
+                    return result
+            
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f"No consistent read of '{group}' within "
+                                   f"{timeout}s")
+            time.sleep(0)
+    
+    def snapshot(self, group="fields"):
+        """
+        Consistent copies of the group's arrays
+        """
+        return self.read(lambda arrays: {name: array.copy() 
+                                         for name, array in arrays.items()}, 
+                         group)
+
+    def close(self):
+        """
+        Detach; any views still held from read() must be dropped first
+        """
+        self.arrays = {}
+        self.groups = {}
+        self.control = None
+        for shm in [*self.blocks.values(), self.control_shm]:
+            shm.close()
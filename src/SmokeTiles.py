@@ -0,0 +1,149 @@
+################################################################################
+##
+##  File: SmokeTiles.py
+##
+##  The MIT License
+##
+##  Copyright (c) 2006 Division of Applied Mathematics, Brown University (USA),
+##  Department of Aeronautics, Imperial College London (UK), and Scientific
+##  Computing and Imaging Institute, University of Utah (USA).
+##
+##  Permission is hereby granted, free of charge, to any person obtaining a
+##  copy of this software and associated documentation files (the "Software"),
+##  to deal in the Software without restriction, including without limitation
+##  the rights to use, copy, modify, merge, publish, distribute, sublicense,
+##  and/or sell copies of the Software, and to permit persons to whom the
+##  Software is furnished to do so, subject to the following conditions:
+##
+##  The above copyright notice and this permission notice shall be included
+##  in all copies or substantial portions of the Software.
+##
+##  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS
+##  OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+##  FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+##  THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+##  LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING
+##  FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+##  DEALINGS IN THE SOFTWARE.
+##  Description:  Implements the SmokeTiles class, a tiled map of where the smoke
+##                field is active so scalar transport can skip empty regions
+##
+################################################################################
+
+
+import math
+import numpy as np
+
+from src.ImplicitDiffusion import canonical_window
+
+
+class SmokeTiles:
+    def __init__(self, fluid, tile_spec):
+        self.fluid = fluid
+        self.size = tile_spec["tile_size"]
+        self.threshold = tile_spec["threshold"]
+
+        self.nty = math.ceil(fluid.Ny / self.size)
+        self.ntx = math.ceil(fluid.Nx / self.size)
+        self.active = np.zeros((self.nty, self.ntx), dtype=bool)
+        self.refresh()
+    
+    def nbytes(self):
+        return self.active.nbytes
+
+    def refresh(self):
+        """
+        Rebuild the activity map from a scan of the whole smoke field, for 
+        when d has been changed wholesale (eg. on restart)
+        """
+        self.active[:] = True
+        self.active = self.tile_max() > self.threshold
+
+    def activate(self, where):
+        """
+        Mark the tiles containing the cells where = (rows, cols) as active, 
+        for when smoke is added between steps
+        """
+        self.active[where[0] // self.size, where[1] // self.size] = True
+
+    def update(self, reach):
+        """
+        Retire tiles whose smoke has decayed below the threshold and grow the 
+        rest by reach cells, the furthest smoke can travel in one step
+        """
+        keep = self.tile_max() > self.threshold
+
+        grown = keep.copy()
+        for _ in range(math.ceil(reach / self.size)):
+            grown[1:] |= keep[:-1]
+            grown[:-1] |= keep[1:]
+            keep = grown.copy()
+            grown[:, 1:] |= keep[:, :-1]
+            grown[:, :-1] |= keep[:, 1:]
+            keep = grown.copy()
+
+        # fully decayed smoke is zeroed so only active tiles hold any
+        for core in self.regions(self.active & ~grown):
+            self.fluid.d[core] = 0
+        
+        self.active = grown
+    
+    def tile_max(self):
+        """
+        Max of d over each active tile, zero elsewhere
+        """
+        T = self.size
+        tile_max = np.zeros((self.nty, self.ntx), dtype=self.fluid.dtype)
+        for r, c0, c1 in self.runs(self.active):
+            block = self.fluid.d[r*T:(r+1)*T, c0*T:c1*T]
+            tile_max[r, c0:c1] = np.maximum.reduceat(
+                block.max(axis=0), np.arange(0, block.shape[1], T))
+        return tile_max
+
+    @staticmethod
+    def runs(mask):
+        """
+        Split a tile mask into horizontal runs of (tile row, first column, 
+        last column + 1)
+        """
+        runs = []
+        for r in np.nonzero(mask.any(axis=1))[0]:
+            edges = np.diff(np.concatenate(([0], mask[r].astype(np.int8), [0])))
+            starts = np.nonzero(edges == 1)[0]
+            ends = np.nonzero(edges == -1)[0]
+            runs += [(r, c0, c1) for c0, c1 in zip(starts, ends)]
+        return runs
+    
+    def regions(self, mask=None):
+        """
+        Cell slices (rows, cols) covering the runs of mask (default: the 
+        active tiles)
+        """
+        T = self.size
+        mask = self.active if mask is None else mask
+        return [(slice(r*T, (r+1)*T), slice(c0*T, c1*T)) 
+                for r, c0, c1 in self.runs(mask)]
+    
+    def halo_regions(self, halo):
+        """
+        For each active region: (core, outer, inner) where outer is core grown 
+        by halo cells (clipped to the domain, then to a canonical shape if 
+        the Fluid's diffusion caches operators) and inner is core relative to 
+        outer
+        """
+        Ny, Nx = self.fluid.Ny, self.fluid.Nx
+        regions = []
+        for rows, cols in self.regions():
+            rows = slice(rows.start, min(rows.stop, Ny))
+            cols = slice(cols.start, min(cols.stop, Nx))
+            y0, x0 = max(rows.start - halo, 0), max(cols.start - halo, 0)
+            outer = (slice(y0, min(rows.stop + halo, Ny)),
+                     slice(x0, min(cols.stop + halo, Nx)))
+            if self.fluid.canonical_regions:
+                outer = (canonical_window(outer[0].start, outer[0].stop, Ny), 
+                         canonical_window(outer[1].start, outer[1].stop, Nx))
+                y0, x0 = outer[0].start, outer[1].start
+            inner = (slice(rows.start - y0, rows.stop - y0),
+                     slice(cols.start - x0, cols.stop - x0))
+            regions.append(((rows, cols), outer, inner))
+        return regions
@@ -31,40 +31,94 @@
 ################################################################################
 
 
+import math
 import warnings
 import numpy as np
 
-from assets.solver_config import spec
+from assets.solver_config import spec as default_spec
 from src.Log import Log
 from src.Display import Display
 from src.Fluid import Fluid
 from src.Mainloop import Mainloop
-from src.GUI import GUI
+from src.Checkpoint import Checkpointer
+from src.FieldStore import FieldWriter
+from src.Profiler import Profiler
+from src.gui import GUI
 
 
 class Solver:
-    def __init__(self) -> None:
+    def __init__(self, spec=None) -> None:
+        # each Solver has its own spec, so several can share a process
+        spec = default_spec if spec is None else spec
+        self.spec = spec
         self.name = spec["name"]
         
         self.solver_type = spec["scheme"]["name"]
         self.dx_is_dy = spec["scheme"]["dx==dy"]
         self.nit = spec["scheme"]["nit"]
+        self.implicit_cache = spec["scheme"]["implicit_cache"]
+        self.fem_mass = spec["scheme"]["fem_mass"]
+        self.advection_schemes = spec["scheme"]["advection"]
+        # float32 halves memory traffic; float64 is kept for validation
+        self.dtype = np.dtype(spec["scheme"]["dtype"])
         self.dt = spec["time"]["dt"]
+        # with adaptive time stepping, dt is the interval between rendered 
+        # frames and each frame is reached exactly through substeps
+        self.frame_dt = spec["time"]["dt"]
+        self.adaptive = spec["time"]["adaptive"]
+        self.cfl = spec["time"]["cfl"]
+        self.dt_min = spec["time"]["dt_min"]
+        self.dt_max = spec["time"]["dt_max"]
         self.t_max = spec["time"]["t_max"]
         self.t = 0
+        self.step = 0
+        # solve() calls, each a rendered frame; input is recorded against it, 
+        # as the steps per frame vary with the flow when adaptive
+        self.frame = 0
+        self.diagnostics_every = spec["log"]["diagnostics_every"]
         self.fluid = Fluid(spec, self)
         
-        self.log = Log(spec["log"])
+        self.log = Log(spec["log"], spec["name"])
+
+        self.profiler = Profiler(spec["profile"], self)
         
         self.display = Display(spec, self)
         
         self.gui = GUI(spec, self)
         
-        self.mainloop = Mainloop(self)
+        self.mainloop = Mainloop(spec, self)
+
+        self.field_writer = FieldWriter(spec["output"], self)
+        self.checkpointer = Checkpointer(spec["checkpoint"], spec, self)
+        if spec["checkpoint"]["restart"] is not None:
+            self.checkpointer.restart(spec["checkpoint"]["restart"])
+        self.closed = False
         
+        if self.fluid.shared is not None:
+            self.fluid.shared.publish()
+
         self.name_string = f"({self.name}) " if self.name is not None else ""
-        self.log(f"Solver {self.name_string}initialised")
+        self.log(f"Solver {self.name_string}initialised", 
+                 f"{self.fluid.Nx} x {self.fluid.Ny} cells", 
+                 f"{self.fluid.bytes_per_cell():.1f} bytes per cell")
     
+    def close(self):
+        """
+        Release the threads, files and sockets the solver holds
+        """
+        if self.closed:
+            return
+        self.closed = True
+        
+        self.gui.close()
+        self.field_writer.close()
+        self.checkpointer.close()
+        self.profiler.close()
+        if self.fluid.shared is not None:
+            self.fluid.shared.close()
+        self.display.frame_server.close()
+        self.log.close()
+
     def __del__(self):
         # self.log(f"Solver {self.name_string}finished with exit code 0")
         pass
@@ -76,18 +130,90 @@ class Solver:
     def solve(self):
         if self.t > self.t_max:
             return 1
+
+        # readers in other processes see the step as one atomic update
+        shared = self.fluid.shared
+        if shared is not None:
+            shared.begin()
+
+        if not self.adaptive:
+            self.advance()
+        else:
+            # substeps are frame_dt / 2^k, no larger than the stable step, so 
+            # dt takes few distinct values and operators factorized for one 
+            # (BackwardEuler, FEM) are reused; k only grows within a frame, 
+            # so what is left of it is always a whole number of substeps
+            t_frame = self.t + self.frame_dt
+            k = 0
+            while t_frame - self.t > 1e-9 * self.frame_dt:
+                k = max(k, math.ceil(math.log2(self.frame_dt 
+                                               / self.stable_dt())))
+                self.dt = self.frame_dt / 2**k
+                self.advance()
+            self.t = t_frame
+        self.frame += 1
+        
+        if shared is not None:
+            shared.end(step=self.step, t=self.t)
+
+        self.field_writer()
+        self.checkpointer()
+        self.profiler.end_frame()
+
+    def stable_dt(self):
+        """
+        Largest time step allowed by the target CFL number, within the 
+        [dt_min, dt_max] bounds
+        """
+        dt = self.dt_max
+        
+        max_speed = self.fluid.derived.max_speed()
+        if max_speed > 0:
+            h = min(self.fluid.dx, self.fluid.dy)
+            dt = min(dt, self.cfl * h / max_speed)
         
-        self.fluid.diffuse_velocity()
-        self.fluid.enforce_continuity()
-        self.fluid.advect_velocity()
-        self.fluid.enforce_continuity()
-        # self.fluid.velocity_BCs()
-
-        self.fluid.diffuse_smoke()
-        self.fluid.advect_smoke()
-        self.fluid.fade_smoke()
+        # diffuseIE_dx_is_dy is an explicit blend: stable only for k <= 1 
+        # (the smoke may be on a finer grid than the velocity)
+        if self.solver_type == "ImplicitEuler":
+            for nu, dx in ((self.fluid.nu, self.fluid.dx), 
+                           (self.fluid.smoke_nu, self.fluid.smoke_dx)):
+                if nu > 0:
+                    dt = min(dt, dx**2 / (4 * nu))
+
+        return max(dt, self.dt_min)
+
+    def advance(self):
+        """
+        Advance the fluid by a single step of size self.dt
+        """
+        time = self.profiler.time
+        time("advance_levels", self.fluid.advance_levels)
+        time("diffuse_velocity", self.fluid.diffuse_velocity)
+        time("enforce_continuity_1", self.fluid.enforce_continuity)
+        time("advect_velocity", self.fluid.advect_velocity)
+        time("enforce_continuity_2", self.fluid.enforce_continuity)
+        time("velocity_BCs", self.fluid.velocity_BCs)
+
+        time("track_smoke", self.fluid.track_smoke)
+        time("diffuse_smoke", self.fluid.diffuse_smoke)
+        time("advect_smoke", self.fluid.advect_smoke)
+        time("fade_smoke", self.fluid.fade_smoke)
+        time("restrict_levels", self.fluid.restrict_levels)
+        time("advect_particles", self.fluid.advect_particles)
         self.t += self.dt
+        self.step += 1
+
+        if self.diagnostics_every and self.step % self.diagnostics_every == 0:
+            self.log_diagnostics()
 
+    def log_diagnostics(self):
+        # the reductions only run for messages the rate limit lets through
+        derived = self.fluid.derived
+        self.log(lambda: (f"step {self.step}", f"t = {self.t:.4g}",
+                          f"max|v| = {derived.max_speed():.4g}",
+                          f"KE = {derived.kinetic_energy():.4g}",
+                          f"|div v| = {derived.divergence_norm():.4g}"),
+                 key="diagnostics")
     
     @staticmethod
     def diffuseEE_dx_is_dy(D, fluid_domain, nu, dx, dt, nit):
@@ -113,7 +239,9 @@ class Solver:
     @staticmethod
     def diffuseIE_dx_is_dy(D, nu, dx, dt):
         """
-        Diffuse the scalar field D with the Explicit Euler scheme
+        Diffuse the scalar field D by blending it with its neighbour average 
+        (a single explicit step, despite the name: stable for k <= 1; 
+        BackwardEuler is the implicit solve)
         Assumption: dx = dt
         """
         k = 4 * nu * dt / dx**2
@@ -123,6 +251,53 @@ class Solver:
 
         return D
 
+    @staticmethod
+    def bilinear_stencil(shape, IX_s, IY_s):
+        """
+        Flat index of the lower-left of the 4 cells around each of the (index) 
+        coordinates IX_s, IY_s on a grid of shape, the steps to the others 
+        (zero where clipped to the grid) and the fractional position
+        """
+        ny, nx = shape
+        floor_x = np.floor(IX_s)
+        floor_y = np.floor(IY_s)
+        x0 = np.clip(floor_x, 0, nx-1).astype(np.int32)
+        y0 = np.clip(floor_y, 0, ny-1).astype(np.int32)
+        step_x = (x0 < nx-1).astype(np.int32)
+        step_y = np.where(y0 < ny-1, np.int32(nx), np.int32(0))
+        return y0 * nx + x0, step_x, step_y, IX_s - floor_x, IY_s - floor_y
+
+    @staticmethod
+    def bilinear_sample(D, IX_s, IY_s, bounds=False, stencil=None):
+        """
+        Sample the field D at the (index) coordinates IX_s, IY_s
+        If bounds, also return the min and max of the 4 values interpolated 
+        between at each point
+        A stencil from bilinear_stencil can be passed to reuse it for several 
+        fields sampled at the same points
+        """
+        if stencil is None:
+            stencil = Solver.bilinear_stencil(D.shape, IX_s, IY_s)
+        i00, step_x, step_y, frac_x, frac_y = stencil
+        i10 = i00 + step_y
+
+        D = D.ravel()
+        D00 = D.take(i00)
+        D01 = D.take(i00 + step_x)
+        D10 = D.take(i10)
+        D11 = D.take(i10 + step_x)
+
+        D0f = (1-frac_x)*D00 + frac_x*D01
+        D1f = (1-frac_x)*D10 + frac_x*D11
+        Dff = (1-frac_y)*D0f + frac_y*D1f
+
+        if not bounds:
+            return Dff
+        
+        D_min = np.minimum(np.minimum(D00, D01), np.minimum(D10, D11))
+        D_max = np.maximum(np.maximum(D00, D01), np.maximum(D10, D11))
+        return Dff, D_min, D_max
+
     @staticmethod
     def advect(D, fluid_domain, u, v, dx, dy, IX, IY, dt):
         """
@@ -131,26 +306,66 @@ class Solver:
 
         # IX_prev, IY_prev are the (index) coordinates where we are advecting 
         # D from
-        IX_prev = (IX - u * dt / dx)
-        IY_prev = (IY - v * dt / dy)
-
-        ny, nx = IX.shape
-        x0 = np.clip(np.floor(IX_prev), 0, nx-1).astype(int)
-        y0 = np.clip(np.floor(IY_prev), 0, ny-1).astype(int)
-        x1 = np.clip(x0 + 1, 0, nx-1)
-        y1 = np.clip(y0 + 1, 0, ny-1)
-        frac_x = IX_prev%1
-        frac_y = IY_prev%1
-
-        D00 = D[y0, x0]
-        D01 = D[y0, x1]
-        D10 = D[y1, x0]
-        D11 = D[y1, x1]
+        # (subtracting with u's dtype, as int32 - float32 would be float64)
+        IX_prev = np.subtract(IX, u * dt / dx, dtype=u.dtype)
+        IY_prev = np.subtract(IY, v * dt / dy, dtype=v.dtype)
 
-        D0f = (1-frac_x)*D00 + frac_x*D01
-        D1f = (1-frac_x)*D10 + frac_x*D11
         Dff = D.copy()
-        Dff[fluid_domain] = ((1-frac_y)*D0f + frac_y*D1f)[fluid_domain]
+        Dff[fluid_domain] = Solver.bilinear_sample(
+            D, IX_prev, IY_prev)[fluid_domain]
+
+        return Dff
+
+    @staticmethod
+    def advect_maccormack(D, fluid_domain, u, v, dx, dy, IX, IY, dt):
+        """
+        Advect scalar field D with the MacCormack scheme: a semi-Lagrangian 
+        step corrected by half the error made advecting its result back again
+        The result is clamped to the values interpolated from (limiter) so no 
+        new extrema are created
+        """
+        shift_x = u * dt / dx
+        shift_y = v * dt / dy
+
+        D_fwd, D_min, D_max = Solver.bilinear_sample(
+            D, np.subtract(IX, shift_x, dtype=u.dtype), 
+            np.subtract(IY, shift_y, dtype=v.dtype), bounds=True)
+        D_back = Solver.bilinear_sample(
+            D_fwd, np.add(IX, shift_x, dtype=u.dtype), 
+            np.add(IY, shift_y, dtype=v.dtype))
+        D_mc = np.clip(D_fwd + 0.5 * (D - D_back), D_min, D_max)
+
+        Dff = D.copy()
+        Dff[fluid_domain] = D_mc[fluid_domain]
+
+        return Dff
+
+    @staticmethod
+    def advect_bfecc(D, fluid_domain, u, v, dx, dy, IX, IY, dt):
+        """
+        Advect scalar field D with Back and Forth Error Compensation and 
+        Correction: D is corrected by half the error of a forward-backward 
+        round trip, then advected semi-Lagrangian
+        The result is clamped to the values of D interpolated from (limiter)
+        """
+        shift_x = u * dt / dx
+        shift_y = v * dt / dy
+        stencil = Solver.bilinear_stencil(
+            D.shape, np.subtract(IX, shift_x, dtype=u.dtype), 
+            np.subtract(IY, shift_y, dtype=v.dtype))
+
+        D_fwd, D_min, D_max = Solver.bilinear_sample(
+            D, None, None, bounds=True, stencil=stencil)
+        D_back = Solver.bilinear_sample(
+            D_fwd, np.add(IX, shift_x, dtype=u.dtype), 
+            np.add(IY, shift_y, dtype=v.dtype))
+        D_corr = D + 0.5 * (D - D_back)
+        D_bf = np.clip(Solver.bilinear_sample(D_corr, None, None, 
+                                              stencil=stencil), 
+                       D_min, D_max)
+
+        Dff = D.copy()
+        Dff[fluid_domain] = D_bf[fluid_domain]
 
         return Dff
     
@@ -165,13 +380,20 @@ class Solver:
               + (v_y[2:, 1:-1] - v_y[:-2, 1:-1])) / (2 * dx)
 
     @staticmethod
-    def extract_divfree(u, v, f, dx, dy, nit, where_inner_fluid, div):
+    def extract_divfree(u, v, f, dx, dy, nit, where_inner_fluid, div, 
+                        bcs=None):
+        """
+        Project (u, v) onto its divergence-free part, solving for the pressure 
+        f with nit Jacobi sweeps, each followed by bcs(f) if given
+        """
         div_v = div(u, v)
 
         for _ in range(nit):
             f[1:-1, 1:-1] = ((f[1:-1, 2:] + f[1:-1, :-2]) * dy**2
                            + (f[2:, 1:-1] + f[:-2, 1:-1]) * dx**2
                            - dx**2 * dy**2 * div_v) / (2 * (dy**2 + dx**2))
+            if bcs is not None:
+                bcs(f)
         
         u_cf = (f[1:-1, 2:] - f[1:-1, :-2]) / (2 * dx)
         v_cf = (f[2:, 1:-1] - f[:-2, 1:-1]) / (2 * dy)
@@ -36,6 +36,9 @@
 import numpy as np
 import pygame as pg
 
+from src.Brush import Brush
+from src.InputScript import InputRecorder
+
 
 class GUI:
     def __init__(self, spec, solver):
@@ -48,69 +51,62 @@ class GUI:
         self.fluid = solver.fluid
         self.display = solver.display
 
-        self.smoke_strength = spec["gui"]["smoke_strength"]
         self.brush_size = spec["gui"]["brush_size"]
-        self.origin_brush = None
-        self.set_origin_brush()
+        self.brush = Brush(spec["gui"], solver)
+
+        self.recorder = None
+        if spec["gui"]["record_input"] is not None:
+            self.recorder = InputRecorder(spec["gui"]["record_input"])
     
     def __call__(self, events):
         if self.exists:
             self.mouse.init(events)
             self.fluid_interaction()
     
-    def set_origin_brush(self):
-        rad = int(self.brush_size / self.display.sf)
-        linspace = np.arange(-rad, rad) + 0.5
-        X, Y = np.meshgrid(linspace, linspace)
-        in_brush = X*X + Y*Y <= rad**2
-        origin_brush = np.where(in_brush)
-        self.origin_brush = origin_brush[0] - rad, origin_brush[1] - rad
+    def close(self):
+        if self.exists and self.recorder is not None:
+            self.recorder.close()
     
-    def move_brush(self, pos):
-        brush = self.origin_brush[0] + pos[0], self.origin_brush[1] + pos[1]
-        where_in = np.where(
-            (0 <= brush[0]) & (brush[0] < self.fluid.Ny) 
-          & (0 <= brush[1]) & (brush[1] < self.fluid.Nx)
-        )
-        return brush[0][where_in], brush[1][where_in]
+    def stroke_centres(self):
+        """
+        Brush centres (as [row, col] indices) along the stroke through the 
+        positions in the mouse's pos_stack, at most half a brush radius apart
+        """
+        pos = np.array(self.mouse.pos_stack, dtype=float)
+        P = ((pos - self.display.blit_offset) / self.display.sf)[:, ::-1]
+        if len(P) == 1:
+            return P
+
+        spacing = max(1, self.brush_size / self.display.sf / 2)
+        seg = np.diff(P, axis=0)
+        n_per_seg = np.maximum(
+            np.ceil(np.hypot(seg[:, 0], seg[:, 1]) / spacing), 1).astype(int)
+        
+        seg_id = np.repeat(np.arange(len(seg)), n_per_seg)
+        seg_start = np.repeat(np.cumsum(n_per_seg) - n_per_seg, n_per_seg)
+        frac = ((np.arange(seg_id.size) - seg_start) 
+                / np.repeat(n_per_seg, n_per_seg))
+        
+        centres = P[seg_id] + frac[:, None] * seg[seg_id]
+        return np.vstack((centres, P[-1:]))
 
     def fluid_interaction(self):
         # if self.mouse.state == 2:
         #     self.mouse.pos_prev = self.mouse.pos.copy()
 
-        if self.mouse.l_press or self.mouse.r_press:
-            for mouse_pos in self.mouse.pos_stack:
-                mouse_index = (
-                    (mouse_pos - self.display.blit_offset)/self.display.sf
-                )[::-1].astype(int)
-                
-                if (0 <= mouse_index[1] < self.fluid.Nx
-                    and 0 <= mouse_index[0] < self.fluid.Ny
-                    and not self.fluid.walls[mouse_index[0], mouse_index[1]]
-                ):
-                    # TODO: toggle velocity and smoke interaction (ie should be 
-                    # able to do one without the other)
-                    delta_pos = self.mouse.pos - self.mouse.pos_prev
-                    brush_pos = self.move_brush(mouse_index)
-                    
-                    self.add_smoke(brush_pos)
-                    self.push_fluid(brush_pos, delta_pos)
-
-                    
-    def add_smoke(self, brush_pos):
-        # dividing by pos_stack ensures constant smoke addition per 
-        # time step
-        # dividing by base_size^2 ensures constant smoke addition 
-        # per unit area
-        if self.mouse.l_press:
-            self.fluid.d[brush_pos] += (self.smoke_strength/
-                        (len(self.mouse.pos_stack) * self.fluid.base_size**2))
-    
-    def push_fluid(self, brush_pos, delta_pos):
-        self.fluid.u[brush_pos] = (delta_pos[0] * self.fluid.dx 
-                                 / self.solver.dt)
-        self.fluid.v[brush_pos] = (delta_pos[1] * self.fluid.dy 
-                                 / self.solver.dt)
+        if not (self.mouse.l_press or self.mouse.r_press):
+            return
+        
+        centres = self.stroke_centres()
+        rad = int(self.brush_size / self.display.sf)
+        delta_pos = (self.mouse.pos - self.mouse.pos_prev 
+                     if self.mouse.pos_prev is not None else np.zeros(2))
+        
+        self.brush(centres, rad, delta_pos, 
+                   self.mouse.l_press, self.mouse.r_press)
+        if self.recorder is not None:
+            self.recorder(self.solver.frame, centres, rad, delta_pos, 
+                          self.mouse.l_press, self.mouse.r_press)
 
 
 class Mouse:
@@ -0,0 +1,47 @@
+import copy
+
+import pytest
+
+from assets.solver_config import spec as default_spec
+
+
+def merge(spec, overrides):
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(spec.get(key), dict):
+            merge(spec[key], value)
+        else:
+            spec[key] = value
+    return spec
+
+
+@pytest.fixture
+def make_spec():
+    """
+    The default spec on a coarse headless grid, updated from a nested dict
+    """
+    def make(overrides=None):
+        spec = copy.deepcopy(default_spec)
+        merge(spec, {"display": {"pygame": False, "show_particles": False}, 
+                     "domain": {"base_size": 1}, "time": {"t_max": 1e9}})
+        return merge(spec, overrides or {})
+    return make
+
+
+@pytest.fixture
+def make_solver(make_spec, tmp_path, monkeypatch):
+    """
+    Solvers built from make_spec in a scratch directory, closed afterwards
+    """
+    from src.Solver import Solver
+
+    # Log writes to out/ under the working directory
+    (tmp_path / "out").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+    solvers = []
+    def make(overrides=None):
+        solvers.append(Solver(make_spec(overrides)))
+        return solvers[-1]
+    yield make
+    for solver in solvers:
+        solver.close()
@@ -0,0 +1,54 @@
+import json
+import sys
+
+import pytest
+
+from benchmarks import accuracy
+
+
+@pytest.fixture(autouse=True)
+def scratch(tmp_path, monkeypatch):
+    (tmp_path / "out").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.parametrize("case", ["taylor_green", "diffusion_EE", 
+                                  "diffusion_IE", "diffusion_BE", 
+                                  "rotation_BFECC"])
+def test_error_falls_with_resolution(case):
+    coarse, _ = accuracy.CASES[case](16, 5)
+    fine, cpu = accuracy.CASES[case](32, 5)
+    assert fine < coarse and cpu >= 0
+
+
+def test_projection_error_falls_with_iterations():
+    few, _ = accuracy.projection(32, 5)
+    many, _ = accuracy.projection(32, 50)
+    assert many < few < 1
+
+
+def test_pareto():
+    points = [(1, 5), (2, 3), (2, 4), (3, 3), (4, 1), (1, 5)]
+    assert accuracy.pareto(points) == {0, 1, 4, 5}
+
+
+def test_results_written_as_json(tmp_path, monkeypatch):
+    path = tmp_path / "accuracy.json"
+    monkeypatch.setattr(sys, "argv", [
+        "accuracy.py", "--cases", "projection", "diffusion_IE", 
+        "--sizes", "16", "32", "--nit", "5", "20", "--json", str(path)])
+    accuracy.main()
+    
+    results = json.loads(path.read_text())
+    assert [(r["N"], r["nit"]) for r in results["projection"]] \
+        == [(16, 5), (16, 20), (32, 5), (32, 20)]
+    # nit plays no part in the implicit blend: run once per size
+    assert [r["N"] for r in results["diffusion_IE"]] == [16, 32]
+    assert any(r["pareto"] for r in results["projection"])
+
+
+def test_unknown_case_is_refused(monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["accuracy.py", "--cases", "vortex"])
+    with pytest.raises(SystemExit) as exit:
+        accuracy.main()
+    assert exit.value.code == 2
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+
+ADAPTIVE = {"time": {"adaptive": True, "dt": 0.1, "cfl": 0.5, 
+                     "dt_min": 1e-3, "dt_max": 0.1}}
+
+
+def test_substeps_keep_to_the_cfl_number(make_solver):
+    solver = make_solver(ADAPTIVE)
+    fluid = solver.fluid
+    fluid.u[10:30, 40:80] = 20
+    
+    for frame in range(1, 4):
+        step = solver.step
+        max_speed = fluid.derived.max_speed()
+        solver.solve()
+        # each frame is reached exactly, in a whole number of substeps of 
+        # frame_dt / 2^k
+        assert solver.t == pytest.approx(frame * 0.1, abs=1e-12)
+        assert solver.frame == frame
+        assert (solver.step - step) * solver.dt == pytest.approx(0.1)
+        assert np.log2(0.1 / solver.dt).is_integer()
+        assert max_speed * solver.dt / fluid.dx <= 0.5
+
+
+def test_stable_dt_bounds(make_solver):
+    solver = make_solver(ADAPTIVE)
+    fluid = solver.fluid
+    assert solver.stable_dt() == 0.1
+    
+    fluid.u[20, 20] = 1
+    fluid.derived.invalidate()
+    assert solver.stable_dt() == pytest.approx(0.1)
+    fluid.u[20, 20] = 25
+    fluid.derived.invalidate()
+    assert solver.stable_dt() == pytest.approx(0.5 * fluid.dx / 25)
+    fluid.u[20, 20] = 1e6
+    fluid.derived.invalidate()
+    assert solver.stable_dt() == 1e-3
+
+
+def test_fixed_steps_without_adaptive(make_solver):
+    solver = make_solver({"time": {"dt": 0.05, "t_max": 0.12}})
+    solver.fluid.u[10:30, 40:80] = 20
+    for _ in range(3):
+        assert solver.solve() is None
+    assert (solver.step, solver.dt) == (3, 0.05)
+    assert solver.t == pytest.approx(0.15)
+    # past t_max, solve does nothing and says so
+    assert solver.solve() == 1
+    assert (solver.step, solver.frame) == (3, 3)
@@ -0,0 +1,42 @@
+import copy
+
+import pytest
+import scipy.sparse.linalg as spla
+
+from assets.solver_config import spec as default_spec
+from src.Solver import Solver
+
+
+@pytest.mark.parametrize("scheme", ["BackwardEuler", "FEM"])
+def test_adaptive_implicit_reuses_operators(scheme, tmp_path, monkeypatch):
+    # Log writes to out/ under the working directory
+    (tmp_path / "out").mkdir()
+    monkeypatch.chdir(tmp_path)
+
+    factorizations = []
+    factorized = spla.factorized
+    monkeypatch.setattr(spla, "factorized", 
+                        lambda A: factorizations.append(A.shape) 
+                        or factorized(A))
+
+    spec = copy.deepcopy(default_spec)
+    spec["display"]["pygame"] = False
+    spec["display"]["show_particles"] = False
+    spec["domain"]["base_size"] = 1
+    spec["scheme"]["name"] = scheme
+    spec["time"]["adaptive"] = True
+    spec["time"]["t_max"] = 1e9
+
+    solver = Solver(spec)
+    solver.fluid.u[10:20, 40:60] = 30
+    solver.fluid.d[10:20, 40:60] = 1
+
+    dts = set()
+    for _ in range(20):
+        solver.solve()
+        dts.add(solver.dt)
+    
+    # substeps are frame_dt / 2^k, and each dt needs one operator for the 
+    # velocity and one for the smoke viscosity
+    assert all((spec["time"]["dt"] / dt).is_integer() for dt in dts)
+    assert len(factorizations) <= 2 * len(dts) <= 6
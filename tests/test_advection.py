@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.Solver import Solver
+
+
+SCHEMES = {"SemiLagrangian": Solver.advect, 
+           "MacCormack": Solver.advect_maccormack, 
+           "BFECC": Solver.advect_bfecc}
+
+
+def bump(x0, y0, shape=(48, 96)):
+    IY, IX = np.indices(shape)
+    return np.exp(-((IX - x0)**2 + (IY - y0)**2) / 2 / 3**2)
+
+
+def transport(scheme, D, u, v, steps):
+    IX = np.arange(D.shape[1], dtype=np.int32)[None, :]
+    IY = np.arange(D.shape[0], dtype=np.int32)[:, None]
+    u, v = np.full(D.shape, float(u)), np.full(D.shape, float(v))
+    for _ in range(steps):
+        D = SCHEMES[scheme](D, Ellipsis, u, v, 1., 1., IX, IY, 1.)
+    return D
+
+
+def test_high_order_schemes_hold_a_bump():
+    errors = {}
+    for scheme in SCHEMES:
+        D = transport(scheme, bump(20, 20), 0.6, 0.3, 60)
+        errors[scheme] = np.abs(D - bump(56, 38)).max()
+        # the limiter creates no new extrema
+        assert D.min() >= 0 and D.max() <= 1, scheme
+    
+    assert errors["MacCormack"] < 0.5 * errors["SemiLagrangian"]
+    assert errors["BFECC"] < 0.5 * errors["SemiLagrangian"]
+
+
+@pytest.mark.parametrize("scheme", SCHEMES)
+def test_whole_cell_shifts_are_exact(scheme):
+    D = transport(scheme, bump(20, 20), 2, -1, 5)
+    # away from the edges, where the backtraces are clipped
+    assert np.allclose(D[2:-2, 2:-2], bump(30, 15)[2:-2, 2:-2], atol=1e-9)
+
+
+def test_schemes_are_chosen_per_field(make_solver):
+    fluid = make_solver({"scheme": {"advection": {
+        "velocity": "MacCormack", "smoke": "BFECC"}}}).fluid
+    assert fluid.advection_kernels == {"velocity": Solver.advect_maccormack, 
+                                       "smoke": Solver.advect_bfecc}
+
+    with pytest.warns(UserWarning, match="QUICK"):
+        fluid = make_solver({"scheme": {"advection": {
+            "velocity": "QUICK"}}}).fluid
+    assert fluid.advection_kernels["velocity"] is Solver.advect
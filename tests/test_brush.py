@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.Brush import Brush
+from src.gui import GUI
+
+
+def test_stroke_centres_fill_the_path():
+    gui = SimpleNamespace(
+        brush_size=8, 
+        display=SimpleNamespace(blit_offset=np.array([10., 0.]), sf=2.), 
+        mouse=SimpleNamespace(pos_stack=[np.array([10, 4]), np.array([50, 4]), 
+                                         np.array([50, 10])]))
+    centres = GUI.stroke_centres(gui)
+    
+    # [row, col] in grid cells, at most half a brush radius (2 cells) apart
+    assert np.array_equal(centres[0], [2, 0]) 
+    assert np.array_equal(centres[-1], [5, 20])
+    assert np.hypot(*np.diff(centres, axis=0).T).max() <= 2
+    assert np.all(np.diff(centres[:, 1]) >= 0)
+    
+    gui.mouse.pos_stack = gui.mouse.pos_stack[:1]
+    assert np.array_equal(GUI.stroke_centres(gui), [[2, 0]])
+
+
+def test_footprint_counts_overlapping_stamps(make_solver):
+    solver = make_solver()
+    solver.fluid.walls[10, 10] = True
+    brush = Brush({"smoke_strength": 2}, solver)
+    
+    centres = np.array([[20., 20.], [20., 21.], [10.5, 10.5], [-3., 5.]])
+    (rows, cols), weights = brush.stroke_footprint(centres, 3)
+    # the stamps centred in a wall and outside the domain are dropped
+    origin = brush.get_origin_brush(3)
+    assert brush.get_origin_brush(3) is origin
+    stamps = [{(20 + r, c0 + c) for r, c in zip(*origin)} for c0 in (20, 21)]
+    covered = dict(zip(zip(rows.tolist(), cols.tolist()), weights.tolist()))
+    assert set(covered) == stamps[0] | stamps[1]
+    assert {cell for cell, n in covered.items() if n == 2} \
+        == stamps[0] & stamps[1]
+
+
+def test_smoke_per_frame_is_independent_of_the_stamps(make_solver):
+    solver = make_solver()
+    fluid = solver.fluid
+    brush = Brush({"smoke_strength": 2}, solver)
+    
+    brush(np.array([[20., 40.]]), 4, np.array([3., -1.]), True, False)
+    once = fluid.d.copy()
+    assert np.isclose(once.sum(), 2 * len(brush.get_origin_brush(4)[0]))
+    assert np.isclose(fluid.u[20, 40], 3 * fluid.dx / solver.frame_dt)
+    assert np.isclose(fluid.v[20, 40], -fluid.dy / solver.frame_dt)
+    
+    fluid.d[...] = 0
+    brush(np.repeat([[20., 40.]], 5, axis=0), 4, np.zeros(2), True, False)
+    assert np.allclose(fluid.d, once)
+    assert not fluid.u.any()
+    
+    # the right button pushes without adding smoke
+    fluid.d[...] = 0
+    brush(np.array([[20., 40.]]), 4, np.array([1., 0.]), False, True)
+    assert not fluid.d.any() and fluid.u.any()
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.Checkpoint import FIELDS, load_checkpoint, write_checkpoint
+
+
+def checkpoint_spec(tmp_path, **overrides):
+    spec = {"every": 1, "keep": 2, "dir": str(tmp_path / "checkpoints"), 
+            "restart": None}
+    spec.update(overrides)
+    return {"checkpoint": spec}
+
+
+def test_arrays_round_trip(tmp_path):
+    path = str(tmp_path / "arrays.fsc")
+    arrays = {"a": np.arange(12.).reshape(3, 4), 
+              "b": np.arange(5, dtype=np.float32), 
+              "empty": np.zeros((0, 3), dtype=np.int8)}
+    write_checkpoint(path, arrays, 1.5, 7, {"name": "test"})
+    
+    meta, loaded = load_checkpoint(path)
+    assert (meta["t"], meta["step"], meta["spec"]) == (1.5, 7, {"name": "test"})
+    for name, array in arrays.items():
+        assert loaded[name].dtype == array.dtype
+        assert np.array_equal(loaded[name], array)
+    
+    # copy-on-write: the file is left as it was
+    loaded["a"][...] = 0
+    assert np.array_equal(load_checkpoint(path)[1]["a"], arrays["a"])
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_restart_continues_the_run(make_solver, tmp_path):
+    solver = make_solver(checkpoint_spec(tmp_path))
+    solver.fluid.u[10:20, 40:60] = 3
+    solver.fluid.d[10:20, 40:60] = 1
+    for _ in range(3):
+        solver.solve()
+        # let every checkpoint be written, rather than skipped
+        solver.checkpointer.close()
+    
+    checkpoints = sorted(os.listdir(tmp_path / "checkpoints"))
+    assert len(checkpoints) == 2
+    path = str(tmp_path / "checkpoints" / checkpoints[-1])
+    restarted = make_solver(checkpoint_spec(tmp_path, every=0, restart=path))
+    
+    assert (restarted.t, restarted.step, restarted.frame) \
+        == (solver.t, solver.step, solver.frame)
+    for name in FIELDS:
+        assert isinstance(getattr(restarted.fluid, name), np.memmap)
+        assert np.array_equal(getattr(restarted.fluid, name), 
+                              getattr(solver.fluid, name)), name
+    
+    for _ in range(2):
+        solver.solve()
+        restarted.solve()
+    for name in FIELDS:
+        assert np.array_equal(getattr(restarted.fluid, name), 
+                              getattr(solver.fluid, name)), name
+
+
+def test_mismatched_checkpoints_are_refused(make_solver, tmp_path):
+    path = str(tmp_path / "other.fsc")
+    write_checkpoint(path, {"u": np.zeros((3, 4))}, 0, 0, {})
+    with pytest.raises(ValueError, match="shape"):
+        make_solver(checkpoint_spec(tmp_path, restart=path))
+    
+    with open(path, "r+b") as file:
+        file.write(b"NOPE")
+    with pytest.raises(ValueError, match="checkpoint"):
+        load_checkpoint(path)
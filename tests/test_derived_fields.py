@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def rotate(fluid, omega):
+    # solid body rotation about the centre of the domain
+    fluid.u[...] = -omega * (fluid.Y - fluid.y_max / 2)
+    fluid.v[...] = omega * (fluid.X - fluid.x_max / 2)
+    return np.hypot(fluid.u, fluid.v)
+
+
+def test_fields_of_a_solid_body_rotation(make_solver):
+    fluid = make_solver().fluid
+    speed = rotate(fluid, 0.5)
+    derived = fluid.derived
+
+    assert np.allclose(derived.vorticity()[1:-1, 1:-1], 1)
+    assert not derived.vorticity()[0].any()
+    assert np.allclose(derived.divergence(), 0)
+    assert derived.divergence_norm() < 1e-12
+    assert np.allclose(derived.speed(), speed)
+    assert np.isclose(derived.max_speed(), speed.max())
+    assert np.isclose(derived.kinetic_energy(), 
+                      0.5 * fluid.rho * (speed**2).sum() * fluid.dx * fluid.dy)
+
+
+def test_values_are_cached_until_the_step_or_invalidate(make_solver):
+    solver = make_solver()
+    fluid, derived = solver.fluid, solver.fluid.derived
+    rotate(fluid, 0.5)
+    w = derived.vorticity()
+    before = derived.max_speed()
+    
+    # changed behind the cache's back: the old values stand
+    rotate(fluid, 1)
+    assert derived.max_speed() == before
+    derived.invalidate()
+    assert np.isclose(derived.max_speed(), 2 * before)
+    
+    # the buffers are reused
+    assert derived.vorticity() is w
+    assert np.allclose(w[1:-1, 1:-1], 2)
+    solver.solve()
+    assert derived.vorticity() is w
+    assert derived.computed_at["vorticity"] == solver.step
+
+
+def test_banded_max_speed(make_solver, tmp_path):
+    solver = make_solver({"storage": {
+        "backend": "memmap", "dir": str(tmp_path / "fields"), 
+        "band_rows": 8}})
+    speed = rotate(solver.fluid, 0.5)
+    assert np.isclose(solver.fluid.derived.max_speed(), speed.max())
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from src.Brush import Brush
+
+
+def dual(factor, **overrides):
+    return {"scheme": {"dual_resolution": {"active": factor > 1, 
+                                           "factor": factor}}, 
+            "fluid": {"smoke_fade": 1}, **overrides}
+
+
+def centroid(d):
+    Y, X = np.indices(d.shape)
+    return np.array([(d * Y).sum(), (d * X).sum()]) / d.sum()
+
+
+def test_grids(make_solver):
+    fluid = make_solver(dual(4)).fluid
+    assert fluid.u.shape == fluid.p.shape == fluid.walls.shape == (10, 38)
+    assert fluid.d.shape == fluid.smoke_shape == (40, 152)
+    assert (fluid.smoke_dx, fluid.smoke_dy) == (fluid.dx / 4, fluid.dy / 4)
+    assert fluid.display_factor == 4
+
+
+def test_upsample(make_solver):
+    fluid = make_solver(dual(4)).fluid
+    D = (2 * fluid.IX + 3 * fluid.IY).astype(fluid.dtype)
+    fine = fluid.upsample(D)
+    
+    # fine cell i is centred at (i + 0.5) / 4 - 0.5 of the grid
+    x = (np.arange(152) + 0.5) / 4 - 0.5
+    y = (np.arange(40) + 0.5) / 4 - 0.5
+    inner = (slice(2, -2), slice(2, -2))
+    assert np.allclose(fine[inner], (2 * x[None, :] + 3 * y[:, None])[inner])
+    assert np.allclose(fluid.upsample(np.ones((10, 38))), 1)
+
+
+def test_smoke_follows_the_coarse_flow(make_solver):
+    moved = {}
+    for factor in (1, 2):
+        solver = make_solver(dual(factor))
+        fluid = solver.fluid
+        rows = ((fluid.Y > 5) & (fluid.Y < 35)).ravel()
+        fluid.u[rows] = 3
+        fluid.d[15:25, 20:30] = 1
+        start = centroid(fluid.d)
+        for _ in range(10):
+            solver.solve()
+        moved[factor] = centroid(fluid.d) - start
+    
+    # carried downstream as far as at full resolution, to within a cell
+    assert moved[1][1] > 2
+    assert np.allclose(moved[2], moved[1], atol=1)
+
+
+def test_smoke_stays_out_of_walls(make_solver):
+    solver = make_solver(dual(2, obstacles={"shapes": [
+        {"shape": "rectangle", "corner": [40, 10], "size": [10, 20]}]}))
+    fluid = solver.fluid
+    fluid.u[4:16, 5:20] = 4
+    fluid.d[20:40, 30:78] = 1
+    fluid.d[~fluid.where_smoke] = 0
+    for _ in range(10):
+        solver.solve()
+    
+    in_walls = ~fluid.where_smoke
+    assert in_walls.sum() == 4 * fluid.walls.sum()
+    assert not fluid.d[in_walls].any() and fluid.d.any()
+
+
+def test_brush_paints_smoke_at_display_resolution(make_solver):
+    solver = make_solver(dual(4))
+    fluid = solver.fluid
+    brush = Brush({"smoke_strength": 2}, solver)
+    # centres and radius in display (smoke) cells
+    brush(np.array([[20., 80.]]), 8, np.array([4., 0.]), True, False)
+    
+    rows, cols = np.nonzero(fluid.d)
+    assert rows.min() >= 12 and rows.max() < 28
+    assert cols.min() >= 72 and cols.max() < 88
+    # the velocity is pushed on the coarse grid
+    rows, cols = np.nonzero(fluid.u)
+    assert rows.min() >= 3 and rows.max() < 7 and cols.min() >= 18
+
+
+@pytest.mark.parametrize("overrides, match", [
+    ({"sparse_smoke": {"active": True}}, "Sparse smoke"), 
+    ({"refinement": {"active": True, "levels": 2, "tile_size": 16}}, 
+     "Dual resolution"),
+])
+def test_unsupported_combinations_warn(make_solver, overrides, match):
+    with pytest.warns(UserWarning, match=match):
+        make_solver({"scheme": {"dual_resolution": {"active": True}, 
+                                **overrides}})
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from src.FEMDiffusion import FEMDiffusion, GridFEMDiffusion, TriangleMesh, \
+    grid_mesh
+from src.ImplicitDiffusion import ImplicitDiffusion
+
+
+def test_element_matrices_of_the_reference_triangle():
+    mesh = TriangleMesh([[0, 0], [1, 0], [0, 1]], [[0, 1, 2]])
+    assert mesh.area[0] == 0.5
+    assert np.allclose(mesh.stiffness().toarray(), 
+                       [[1, -0.5, -0.5], [-0.5, 0.5, 0], [-0.5, 0, 0.5]])
+    assert np.allclose(mesh.mass().toarray(), 
+                       (np.ones((3, 3)) + np.eye(3)) / 24)
+    assert np.allclose(mesh.mass(lumped=True).toarray(), np.eye(3) / 6)
+
+
+def test_assembled_grid_matrices():
+    mesh = grid_mesh((5, 7), 0.5, 0.25)
+    K, M = mesh.stiffness(), mesh.mass()
+    
+    # constants are in the null space of K; M integrates to the area
+    assert abs(K - K.T).max() < 1e-12
+    assert np.allclose(K @ np.ones(mesh.n_nodes), 0)
+    area = (7 - 1) * 0.5 * (5 - 1) * 0.25
+    assert np.isclose(M.sum(), area)
+    assert np.isclose(mesh.mass(lumped=True).sum(), area)
+    assert mesh.n_elements == 2 * 4 * 6
+
+
+@pytest.mark.parametrize("dx, dy", [(1, 1), (0.5, 0.8)])
+def test_lumped_grid_diffusion_matches_finite_differences(dx, dy):
+    rng = np.random.default_rng(0)
+    D = rng.random((12, 17))
+    walls = np.zeros((10, 15), dtype=bool)
+    walls[3:6, 4:9] = True
+    
+    # P1 elements on right triangles with a lumped mass give the 5-point 
+    # Laplacian
+    for fluid_domain in (Ellipsis, ~walls):
+        fem = GridFEMDiffusion(dx, dy)(D, fluid_domain, 0.3, 0.1)
+        fd = ImplicitDiffusion(4)(D, fluid_domain, 0.3, dx, dy, 0.1)
+        assert np.allclose(fem, fd, atol=1e-12)
+
+
+def test_consistent_mass_diffusion():
+    rng = np.random.default_rng(1)
+    D = rng.random((10, 10))
+    diffuse = GridFEMDiffusion(1, 1, mass="consistent")
+    
+    D_new = diffuse(D, Ellipsis, 0.5, 0.2)
+    assert np.array_equal(D_new[0], D[0]) and np.array_equal(D_new[:, -1], 
+                                                             D[:, -1])
+    assert np.abs(np.diff(D_new[1:-1, 1:-1])).sum() \
+        < np.abs(np.diff(D[1:-1, 1:-1])).sum()
+    assert np.allclose(diffuse(np.full((10, 10), 3.), Ellipsis, 0.5, 0.2), 3)
+
+
+def test_systems_are_cached_across_shapes():
+    diffuse = GridFEMDiffusion(1, 1, cache_size=2)
+    D = np.ones((8, 8))
+    diffuse(D, Ellipsis, 0.1, 0.1)
+    diffuse(D, Ellipsis, 0.1, 0.1)
+    assert len(diffuse.systems) == 1
+    
+    diffuse(np.ones((8, 12)), Ellipsis, 0.1, 0.1)
+    diffuse(D, Ellipsis, 0.1, 0.05)
+    # at most cache_size factorized systems, however many shapes
+    assert len(diffuse.systems) == 2 and len(diffuse.engines) == 2
+    assert diffuse.nbytes() > 0
+
+
+def test_unknown_mass_warns():
+    with pytest.warns(UserWarning, match="diagonal"):
+        engine = FEMDiffusion(grid_mesh((3, 3), 1, 1), mass="diagonal")
+    assert engine.M.nnz == 9
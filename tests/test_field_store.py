@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.FieldStore import TRAILER, FieldReader
+
+
+def output_spec(tmp_path, **overrides):
+    spec = {"every": 1, "path": str(tmp_path / "fields.fts"), 
+            "fields": ["u", "d"], "stride": 2, "dtype": "float32", 
+            "compression": "zlib", "level": 1, "tile_size": 8}
+    spec.update(overrides)
+    return {"output": spec}
+
+
+def run(solver, frames):
+    solver.fluid.u[10:20, 40:60] = 3
+    solver.fluid.d[10:20, 40:60] = 1
+    stored = []
+    for _ in range(frames):
+        solver.solve()
+        stored.append({name: np.array(getattr(solver.fluid, name)[::2, ::2]) 
+                       for name in ("u", "d")})
+    return stored
+
+
+def test_frames_read_back(make_solver, tmp_path):
+    solver = make_solver(output_spec(tmp_path))
+    stored = run(solver, 4)
+    solver.field_writer.close()
+
+    reader = FieldReader(str(tmp_path / "fields.fts"))
+    times, u = reader.read("u")
+    assert np.allclose(times, [0.1, 0.2, 0.3, 0.4])
+    assert np.allclose(u, [frame["u"] for frame in stored], atol=1e-6)
+
+    # a window of frames and cells, crossing tile edges
+    times, d = reader.read("d", t_range=(0.15, 0.35), rows=slice(3, 17), 
+                           cols=slice(20, 40, 3))
+    assert np.allclose(times, [0.2, 0.3])
+    assert np.allclose(d, [frame["d"][3:17, 20:40:3] for frame in stored[1:3]],
+                       atol=1e-6)
+    reader.close()
+
+
+def test_index_is_rebuilt_without_trailer(make_solver, tmp_path):
+    solver = make_solver(output_spec(tmp_path))
+    stored = run(solver, 3)
+    solver.field_writer.close()
+
+    # as if the writer had died mid-chunk: no index, a partial last chunk
+    path = str(tmp_path / "fields.fts")
+    reader = FieldReader(path)
+    last = reader.index[-1]
+    reader.close()
+    with open(path, "r+b") as file:
+        file.truncate(int(last["offset"]) + int(last["size"]) // 2)
+
+    reader = FieldReader(path)
+    times, u = reader.read("u")
+    assert np.allclose(u, [frame["u"] for frame in stored], atol=1e-6)
+    _, d = reader.read("d")
+    assert np.allclose(d[:-1], [frame["d"] for frame in stored[:-1]], 
+                       atol=1e-6)
+    reader.close()
+
+
+def test_writer_error_is_raised_in_solver(make_solver, tmp_path):
+    solver = make_solver(output_spec(tmp_path))
+    writer = solver.field_writer
+    def fail(data, level):
+        raise OSError("disk full")
+    writer.compress = fail
+
+    # the queue holds 8 frames: the solver must not block once it is full
+    with pytest.raises(OSError, match="disk full"):
+        for _ in range(20):
+            solver.solve()
+    with pytest.raises(OSError, match="disk full"):
+        writer.close()
+    assert writer.file.closed
+    with open(tmp_path / "fields.fts", "rb") as file:
+        file.seek(-TRAILER.size, os.SEEK_END)
+        assert file.read()[-4:] != b"FSTS"
+
+
+def test_other_files_are_refused(tmp_path):
+    path = tmp_path / "other.fts"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        FieldReader(str(path))
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.FrameServer import (DELTA, JPEG, KEY, PNG, FrameServer, 
+                             decode_frame, encode_frame)
+from src.FrameViewer import frames
+
+
+def stream_spec(codec, port=0):
+    return {"active": True, "host": "127.0.0.1", "port": port, 
+            "codec": codec, "quality": 90, "keyframe_every": 3}
+
+
+def rendered(n, shape=(12, 20, 3)):
+    return np.random.default_rng(n).integers(0, 256, shape).astype(np.uint8)
+
+
+@pytest.fixture
+def serve():
+    servers = []
+    def start(codec, port=0):
+        servers.append(FrameServer(stream_spec(codec, port)))
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.close()
+
+
+def test_codecs_round_trip():
+    first, second = rendered(0), rendered(1)
+    h, w = first.shape[:2]
+    
+    codec, payload = encode_frame(PNG, first)
+    assert np.array_equal(decode_frame(codec, payload, w, h), first)
+    
+    # delta frames wrap around, and need the previous frame to decode
+    codec, payload = encode_frame(DELTA, first)
+    assert codec == KEY
+    assert np.array_equal(decode_frame(codec, payload, w, h), first)
+    codec, payload = encode_frame(DELTA, second, first)
+    assert codec == DELTA
+    assert np.array_equal(decode_frame(codec, payload, w, h, first), second)
+
+    smooth = np.repeat(np.linspace(0, 255, w, dtype=np.uint8)[None, :, None], 
+                       h, axis=0).repeat(3, axis=2)
+    codec, payload = encode_frame(JPEG, smooth, quality=95)
+    decoded = decode_frame(codec, payload, w, h).astype(int)
+    assert np.abs(decoded - smooth).max() <= 8
+
+
+@pytest.mark.parametrize("codec", ["png", "delta"])
+def test_viewer_receives_published_frames(serve, codec):
+    server = serve(codec)
+    port = server.server.sockets[0].getsockname()[1]
+    # nothing is encoded before a client connects
+    server.publish(rendered(0))
+
+    received = []
+    def view():
+        for number, frame in frames("127.0.0.1", port):
+            received.append((number, frame))
+            if len(received) == 5:
+                return
+    viewer = threading.Thread(target=view, daemon=True)
+    viewer.start()
+    
+    deadline = time.monotonic() + 10
+    for n in range(1, 6):
+        # one frame at a time, so none is skipped for being stale
+        while len(received) < n - 1 or not server.clients:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        server.publish(rendered(n).astype(np.float32))
+    viewer.join(10)
+    
+    assert [number for number, _ in received] == list(range(1, 6))
+    for n, (_, frame) in enumerate(received, 1):
+        assert np.array_equal(frame, rendered(n))
+
+
+def test_port_in_use_is_reported(serve):
+    server = serve("png")
+    port = server.server.sockets[0].getsockname()[1]
+    with pytest.raises(OSError):
+        serve("png", port)
@@ -0,0 +1,47 @@
+import pygame as pg
+import pytest
+
+from src.gui import Mouse
+
+
+@pytest.fixture
+def mainloop(make_solver):
+    solver = make_solver({"display": {"idle": {
+        "active": True, "ke_threshold": 1e-6, "smoke_threshold": 1e-2}}})
+    # idle detection is for interactive sessions: without pygame there is no 
+    # window to wait on, so it is off
+    assert not solver.mainloop.idle and not solver.mainloop.quiescent()
+    solver.mainloop.idle = True
+    solver.gui.mouse = Mouse()
+    return solver.mainloop
+
+
+def test_quiescent_only_at_rest(mainloop):
+    fluid = mainloop.solver.fluid
+    assert mainloop.quiescent()
+    
+    fluid.d[20, 20] = 5e-3
+    fluid.derived.invalidate()
+    assert mainloop.quiescent()
+    fluid.d[20, 20] = 0.1
+    fluid.derived.invalidate()
+    assert not mainloop.quiescent()
+    
+    fluid.d[20, 20] = 0
+    fluid.u[20, 20] = 0.1
+    fluid.derived.invalidate()
+    assert not mainloop.quiescent()
+
+
+def test_input_wakes_the_session(mainloop):
+    assert mainloop.quiescent()
+    
+    mainloop.events = [pg.event.Event(pg.KEYDOWN)]
+    assert not mainloop.quiescent()
+    mainloop.events = []
+    
+    mainloop.gui.mouse.state = -1           # just released
+    assert not mainloop.quiescent()
+    mainloop.gui.mouse.state = 0
+    mainloop.gui.mouse.r_press = 1
+    assert not mainloop.quiescent()
@@ -0,0 +1,65 @@
+import struct
+
+import numpy as np
+import pytest
+
+from src.Brush import Brush
+from src.InputScript import InputRecorder, InputReplay
+
+
+STROKES = {
+    0: (np.array([[20., 30.], [20., 34.]]), 4, np.array([3., 0.]), True, False),
+    2: (np.array([[25., 60.]]), 3, np.array([0., 2.]), False, True),
+    5: (np.array([[15., 90.], [16., 92.]]), 5, np.array([-1., 1.]), True, True),
+}
+
+
+def test_replay_matches_frames_across_solvers(make_solver, tmp_path):
+    path = str(tmp_path / "input.fsin")
+
+    # record as the GUI does: strokes applied before each frame is solved
+    solver = make_solver({"scheme": {"name": "ExplicitEuler"}})
+    brush = Brush({"smoke_strength": 2}, solver)
+    recorder = InputRecorder(path)
+    for _ in range(8):
+        if solver.frame in STROKES:
+            centres, rad, delta_pos, l_press, r_press = STROKES[solver.frame]
+            brush(*STROKES[solver.frame])
+            recorder(solver.frame, centres, rad, delta_pos, l_press, r_press)
+        solver.solve()
+    recorder.close()
+
+    # replay with another diffusion scheme and adaptive substeps, which 
+    # take a different number of steps per frame
+    solver = make_solver({
+        "scheme": {"name": "BackwardEuler"}, 
+        "time": {"adaptive": True}, 
+        "gui": {"replay_input": path}})
+    replay = solver.mainloop.replay
+    applied = []
+    brush = replay.brush
+    replay.brush = lambda *record: applied.append((solver.frame, record)) \
+        or brush(*record)
+
+    solver.fluid.u[5:15, 20:40] = 40
+    for _ in range(8):
+        solver.mainloop.init()
+        solver.mainloop.init()      # an idle iteration doesn't reapply
+        solver.solve()
+    
+    assert solver.step > solver.frame == 8
+    assert [frame for frame, _ in applied] == sorted(STROKES)
+    for frame, (centres, rad, delta_pos, l_press, r_press) in applied:
+        expected = STROKES[frame]
+        assert np.allclose(centres, expected[0])
+        assert rad == expected[1]
+        assert np.allclose(delta_pos, expected[2])
+        assert bool(l_press) == expected[3] and bool(r_press) == expected[4]
+    assert replay.last_frame == 5
+
+
+def test_other_files_are_refused(tmp_path):
+    path = tmp_path / "old.fsin"
+    path.write_bytes(struct.pack("<4sH", b"FSIN", 1))
+    with pytest.raises(ValueError):
+        InputReplay(str(path), brush=None)
@@ -0,0 +1,52 @@
+import json
+import sys
+
+import pytest
+
+from benchmarks import kernels
+
+
+ARGS = ["kernels.py", "--sizes", "16", "--walls", "0", "0.1", "--repeat", "1"]
+
+
+def test_baseline_saved_and_compared(tmp_path, monkeypatch, capsys):
+    (tmp_path / "out").mkdir()
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "baseline.json"
+    monkeypatch.setattr(sys, "argv", ARGS + ["--save", str(path)])
+    kernels.main()
+    
+    results = json.loads(path.read_text())["results"]
+    names = {key.split("/")[0] for key in results}
+    assert names == {"diffuseEE_dx_is_dy", "diffuseIE_dx_is_dy", 
+                     "ImplicitDiffusion", "advect", "div_dx_is_dy", 
+                     "div_dx_not_dy", "extract_divfree", "Solver.solve"}
+    assert "advect/N=16/walls=0.1" in results
+    assert all(result["ns_per_cell"] > 0 and result["peak_bytes"] >= 0 
+               for result in results.values())
+    
+    # a baseline 100 times faster is a regression, and fails the run
+    baseline = json.loads(path.read_text())
+    for result in baseline["results"].values():
+        result["ns_per_cell"] /= 100
+    path.write_text(json.dumps(baseline))
+    monkeypatch.setattr(sys, "argv", ARGS + ["--compare", str(path)])
+    with pytest.raises(SystemExit) as exit:
+        kernels.main()
+    assert exit.value.code == 1
+    assert "REGRESSION advect/N=16/walls=0.1" in capsys.readouterr().out
+
+
+def test_compare_threshold_and_new_cases():
+    baseline = {"a": {"ns_per_cell": 10.}, "b": {"ns_per_cell": 10.}}
+    results = {"a": {"ns_per_cell": 11.9}, "b": {"ns_per_cell": 12.1}, 
+               "c": {"ns_per_cell": 1e9}}
+    assert kernels.compare(results, baseline, 0.2) == ["b"]
+    assert kernels.compare(results, baseline, 0.25) == []
+
+
+def test_float32_results_are_keyed_apart(tmp_path, monkeypatch):
+    (tmp_path / "out").mkdir()
+    monkeypatch.chdir(tmp_path)
+    results = kernels.run([16], [0.0], 1, dtype="float32")
+    assert results and all(key.endswith("/float32") for key in results)
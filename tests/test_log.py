@@ -0,0 +1,65 @@
+import pytest
+
+import src.Log
+from src.Log import Log
+
+
+@pytest.fixture
+def log_spec(tmp_path):
+    return {"verbose": False, "log_file": True, 
+            "path": str(tmp_path / "out" / ".log"), "max_bytes": 1e6, 
+            "backups": 1, "rate_limit": 2}
+
+
+def lines(log_spec):
+    with open(log_spec["path"]) as file:
+        return [line.split(" - ", 2)[2].rstrip("\n") for line in file]
+
+
+def test_dropped_messages_skip_computing_args(log_spec, monkeypatch):
+    now = [0.]
+    monkeypatch.setattr(src.Log.time, "monotonic", lambda: now[0])
+    log = Log(log_spec, "lazy")
+
+    calls = []
+    def args():
+        calls.append(now[0])
+        return ("step", len(calls))
+    
+    # 2 per second: the bucket starts full, then refills
+    for _ in range(5):
+        log(args, key="diagnostics")
+    now[0] = 1.
+    log(args, key="diagnostics")
+    log.close()
+
+    assert len(calls) == 3
+    assert lines(log_spec) == ["step, 1", "step, 2", 
+                               "step, 3, (3 similar suppressed)"]
+
+
+def test_sampled_messages(log_spec):
+    log_spec["rate_limit"] = 0
+    log = Log(log_spec, "sampled")
+    for i in range(7):
+        log(f"call {i}", key="sampled", sample=3)
+    log("plain", warning=True)
+    log.close()
+
+    assert lines(log_spec) == ["call 0", "call 3", "call 6", "plain"]
+
+
+def test_console_follows_each_logs_verbose(log_spec, capfd):
+    quiet = Log(log_spec, "quiet")
+    loud = Log({**log_spec, "verbose": True}, "loud")
+    quiet("to the file only")
+    loud("to the file and console")
+    loud.close()
+    quiet("still to the file only")
+    quiet.close()
+
+    assert lines(log_spec) == ["to the file only", "to the file and console", 
+                               "still to the file only"]
+    console = capfd.readouterr().err
+    assert "to the file and console" in console
+    assert "to the file only" not in console
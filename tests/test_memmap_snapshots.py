@@ -0,0 +1,48 @@
+import numpy as np
+
+from src import Checkpoint
+from src.Checkpoint import load_checkpoint
+from src.FieldStore import FieldReader
+
+
+def test_memmap_fields_are_snapshot_from_files(make_solver, tmp_path, 
+                                               monkeypatch):
+    written = {}
+    write_checkpoint = Checkpoint.write_checkpoint
+    def record(path, arrays, *args):
+        written.update(arrays)
+        write_checkpoint(path, arrays, *args)
+    monkeypatch.setattr(Checkpoint, "write_checkpoint", record)
+
+    solver = make_solver({
+        "storage": {"backend": "memmap", "dir": str(tmp_path / "fields"), 
+                    "band_rows": 8},
+        "checkpoint": {"every": 3, "keep": 0, "dir": str(tmp_path / "cp")},
+        "output": {"every": 1, "path": str(tmp_path / "fields.fts"), 
+                   "dtype": "float32", "tile_size": 16}})
+    fluid = solver.fluid
+    fluid.u[10:20, 40:60] = 3
+    fluid.d[10:20, 40:60] = 1
+    frames = []
+    for _ in range(3):
+        solver.solve()
+        frames.append({name: np.array(getattr(fluid, name)) 
+                       for name in ("u", "d")})
+    solver.checkpointer.close()
+    
+    # the checkpoint thread wrote from the memory-mapped snapshot files
+    assert written and all(getattr(array, "filename", None) is not None
+                           for array in written.values())
+    meta, arrays = load_checkpoint(
+        str(tmp_path / "cp" / f"{solver.name}_00000003.fsc"))
+    assert meta["step"] == 3
+    for name in ("u", "d"):
+        assert np.array_equal(arrays[name], frames[-1][name])
+    
+    solver.field_writer.close()
+    reader = FieldReader(str(tmp_path / "fields.fts"))
+    for name in ("u", "d"):
+        _, stored = reader.read(name)
+        assert np.allclose(stored, [frame[name] for frame in frames], 
+                           atol=1e-6)
+    reader.close()
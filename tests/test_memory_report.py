@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+
+CIRCLE = {"obstacles": {"shapes": [
+    {"shape": "circle", "centre": [20, 20], "radius": 5}]}}
+
+
+@pytest.mark.parametrize("dtype, state", [("float64", 32), ("float32", 16)])
+def test_bytes_per_cell(make_solver, dtype, state):
+    fluid = make_solver({"scheme": {"dtype": dtype}}).fluid
+    report = fluid.memory_report()
+    cells = fluid.Nx * fluid.Ny
+    
+    assert sum(report[name] for name in ("u", "v", "p", "d")) == state * cells
+    assert report["walls"] == cells
+    # the coordinates are 1D: under a byte per cell between them, even on
+    # this small grid
+    assert state + 1 <= fluid.bytes_per_cell() < state + 2
+    
+    # derived buffers are counted once allocated
+    fluid.derived.vorticity()
+    assert fluid.memory_report()["derived.w"] == state // 4 * cells
+
+
+def test_views_are_counted_once(make_solver):
+    fluid = make_solver(CIRCLE).fluid
+    report = fluid.memory_report()
+    
+    # X and Y view x_lin and y_lin, where_wall is walls
+    assert "x_lin" in report and "X" not in report
+    assert "y_lin" in report and "Y" not in report
+    assert "walls" in report and "where_wall" not in report
+    # walls add masks of the fluid and inner fluid cells
+    cells = fluid.Nx * fluid.Ny
+    assert report["where_fluid"] == cells
+    assert report["where_inner_fluid"] == (fluid.Nx - 2) * (fluid.Ny - 2)
+
+
+def test_components_report_their_own(make_solver):
+    fluid = make_solver({"display": {"show_particles": True, "particles": {
+        "count": 1000}}, "scheme": {
+        "name": "BackwardEuler", 
+        "sparse_smoke": {"active": True, "tile_size": 8}}}).fluid
+    report = fluid.memory_report()
+    
+    # x, y, age and 3 colours, in float32
+    assert report["particles"] == fluid.particles.nbytes() >= 1000 * 4 * 6
+    assert report["smoke_tiles"] == fluid.smoke_tiles.active.nbytes
+    assert report["diffusion_engines"] == 0
+    fluid.solver.solve()
+    assert fluid.memory_report()["diffusion_engines"] > 0
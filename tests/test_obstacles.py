@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+
+def test_walls_from_shapes_and_mask(make_solver, tmp_path):
+    image = np.full((40, 150), 255, dtype=np.uint8)
+    image[30:, 100:110] = 0
+    Image.fromarray(image).save(tmp_path / "mask.png")
+    solver = make_solver({"obstacles": {
+        "mask": str(tmp_path / "mask.png"), 
+        "shapes": [{"shape": "circle", "centre": [20, 20], "radius": 5}, 
+                   {"shape": "rectangle", "corner": [60, 10], "size": [4, 8]}]}})
+    walls = solver.fluid.walls != 0
+
+    Y, X = np.mgrid[:40, :150]
+    expected = ((X - 20)**2 + (Y - 20)**2 <= 25) \
+        | ((X >= 60) & (X < 64) & (Y >= 10) & (Y < 18)) \
+        | ((X >= 100) & (X < 110) & (Y >= 30))
+    assert np.array_equal(walls, expected)
+    
+    # every ghost cell is a wall mirrored from a fluid cell along its normal
+    obstacles = solver.fluid.obstacles
+    assert walls[obstacles.rows, obstacles.cols].all()
+    assert not walls[obstacles.image_rows, obstacles.image_cols].any()
+    assert np.allclose(np.hypot(obstacles.normal_x, obstacles.normal_y), 1)
+
+
+def test_unknown_shape_warns(make_solver):
+    with pytest.warns(UserWarning, match="triangle"):
+        solver = make_solver({"obstacles": {"shapes": [{"shape": "triangle"}]}})
+    assert not solver.fluid.walls.any()
+
+
+def test_ghost_cells_of_a_patch(make_solver):
+    obstacles = make_solver().fluid.obstacles
+    walls = np.zeros((6, 8), dtype=bool)
+    walls[:, 3] = True                  # a wall one cell thick
+    walls[4:, 6:] = True                # a block in a corner
+    
+    # the patch continues past its top and left edges
+    rows, cols, image_rows, image_cols, nx, ny = \
+        obstacles.ghost_cells(walls, (False, True, False, True))
+    ghosts = dict(zip(zip(rows, cols), zip(image_rows, image_cols, nx, ny)))
+    # fluid on both sides: mirrored from the first neighbour that is fluid
+    assert ghosts[(0, 3)] == (0, 4, 1, 0)
+    assert ghosts[(2, 3)] == (2, 4, 1, 0)
+    # the block faces the fluid up and to the left, the domain edges beyond
+    assert ghosts[(4, 7)] == (3, 7, 0, -1)
+    assert ghosts[(5, 6)] == (5, 5, -1, 0)
+    assert np.allclose(ghosts[(4, 6)][2:], (-2**-0.5, -2**-0.5))
+    assert set(ghosts) == {(r, 3) for r in range(6)} \
+        | {(4, 6), (4, 7), (5, 6)}
+
+
+@pytest.mark.parametrize("bc", ["no-slip", "free-slip", "open"])
+def test_velocity_and_pressure_ghosts(make_solver, bc):
+    solver = make_solver({
+        "BCs": {"horizontal": bc, "vertical": bc, "obstacles": bc}, 
+        "obstacles": {"shapes": [
+            {"shape": "rectangle", "corner": [60, 10], "size": [4, 8]}]}})
+    fluid, obstacles = solver.fluid, solver.fluid.obstacles
+    rng = np.random.default_rng(0)
+    u, v, p = (rng.standard_normal(fluid.d.shape).astype(fluid.dtype) 
+               for _ in range(3))
+    obstacles.velocity(u, v)
+    obstacles.pressure(p)
+
+    sign = {"no-slip": (-1, -1), "free-slip": (1, -1), "open": (1, 1)}[bc]
+    # on the horizontal edges v is normal, on the vertical ones u
+    assert np.array_equal(u[0, 1:-1], sign[0] * u[1, 1:-1])
+    assert np.array_equal(v[-1, 1:-1], sign[1] * v[-2, 1:-1])
+    assert np.array_equal(v[1:-1, 0], sign[0] * v[1:-1, 1])
+    assert np.array_equal(u[1:-1, -1], sign[1] * u[1:-1, -2])
+    
+    # the rectangle's left face has normal (-1, 0)
+    ghost, image = (slice(11, 17), 60), (slice(11, 17), 59)
+    assert np.array_equal(u[ghost], sign[1] * u[image])
+    assert np.array_equal(v[ghost], sign[0] * v[image])
+    assert np.array_equal(p[ghost], p[image])
+    assert np.array_equal(p[0, 1:-1], p[1, 1:-1])
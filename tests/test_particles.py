@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def particles(make_solver):
+    solver = make_solver({"display": {"show_particles": True, "particles": {
+        "count": 100, "lifetime": 5, "emit_rate": 0, "seed": 0}}})
+    return solver.fluid.particles
+
+
+def test_uniform_flow_carries_particles(particles):
+    fluid = particles.fluid
+    fluid.u[...] = 2
+    fluid.v[...] = -1
+    x, y = np.linspace(10, 100, 10), np.full(10, 20.)
+    particles.emit(x, y, particles.colour)
+    particles.advance(0.5)
+    
+    assert particles.n == 10
+    assert np.allclose(particles.x[:10], x + 1 / fluid.dx)
+    assert np.allclose(particles.y[:10], y - 0.5 / fluid.dy)
+    assert np.allclose(particles.age[:10], 0.5)
+
+
+def test_kill_packs_the_survivors(particles):
+    fluid = particles.fluid
+    fluid.walls[20, 50] = True
+    x = np.array([10, -1, 50.5, 30, 10, 160], dtype=np.float32)
+    y = np.array([5, 5, 20.5, 5, 45, 5], dtype=np.float32)
+    colours = np.arange(18, dtype=np.float32).reshape(3, 6)
+    for i in range(6):
+        particles.emit(x[i:i + 1], y[i:i + 1], colours[:, i])
+    particles.age[3] = particles.lifetime
+    particles.kill()
+    
+    # only the first is inside the domain, out of the wall and young
+    assert particles.n == 1
+    assert (particles.x[0], particles.y[0]) == (10, 5)
+    assert np.array_equal(particles.colours[:, 0], colours[:, 0])
+
+
+def test_pool_stops_emitting_when_full(particles):
+    rows, cols = np.full(150, 3), np.arange(150)
+    particles.emit_cells((rows, cols))
+    
+    assert particles.n == particles.capacity
+    assert np.all((particles.y >= 3) & (particles.y < 4))
+    assert np.all(np.floor(particles.x) == cols[:particles.capacity])
+    assert np.all(particles.colours == particles.brush_colour[:, None])
+    particles.emit_uniform(10)
+    assert particles.n == particles.capacity
+
+
+def test_splat_onto_a_finer_display(particles):
+    fluid = particles.fluid
+    particles.emit(np.array([0.2, 0.2, 7.9]), np.array([0.2, 0.2, 3.]), 
+                   np.array([1, 2, 3], dtype=np.float32))
+    particles.age[2] = particles.lifetime / 2
+    pxarray = np.zeros((fluid.Ny * 2, fluid.Nx * 2, 3), dtype=np.float32)
+    particles.splat(pxarray)
+    
+    assert np.array_equal(pxarray[1, 1], [2, 4, 6])
+    assert np.array_equal(pxarray[7, 16], [0.5, 1, 1.5])
+    assert np.count_nonzero(pxarray.any(axis=2)) == 2
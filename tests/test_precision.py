@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+
+def run(make_solver, dtype):
+    solver = make_solver({"scheme": {
+        "dtype": dtype, "advection": {"smoke": "MacCormack"}, 
+        "sparse_smoke": {"active": True, "tile_size": 8}}})
+    fluid = solver.fluid
+    fluid.u[10:30, 20:60] = 5
+    fluid.v[10:30, 20:60] = 1
+    fluid.d[15:25, 30:40] = 1
+    fluid.smoke_tiles.refresh()
+    for _ in range(10):
+        solver.solve()
+    return solver
+
+
+def test_float32_tracks_float64(make_solver):
+    single = run(make_solver, "float32")
+    double = run(make_solver, "float64")
+    
+    for name in ("u", "v", "p", "d"):
+        field = getattr(single.fluid, name)
+        assert field.dtype == np.float32, name
+        reference = getattr(double.fluid, name)
+        scale = np.abs(reference).max()
+        assert np.abs(field - reference).max() <= 1e-3 * scale, name
+    
+    single.display.update_pxarray()
+    assert single.display.pxarray.dtype == np.float32
+    assert (single.fluid.memory_report()["u"] 
+            == double.fluid.memory_report()["u"] // 2)
+
+
+def test_unknown_dtype_is_refused(make_solver):
+    with pytest.raises(TypeError):
+        make_solver({"scheme": {"dtype": "not a dtype"}})
@@ -0,0 +1,81 @@
+import json
+import pstats
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+
+PHASES = ("diffuse_velocity", "enforce_continuity_1", "advect_velocity", 
+          "enforce_continuity_2", "velocity_BCs", "diffuse_smoke", 
+          "advect_smoke")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_phases_are_timed_and_exported(make_solver, tmp_path):
+    jsonl = tmp_path / "metrics.jsonl"
+    solver = make_solver({"profile": {
+        "active": True, "window": 4, "export_every": 2, "jsonl": str(jsonl)}})
+    solver.fluid.u[10:30, 40:80] = 2
+    for _ in range(6):
+        solver.solve()
+    
+    summary = solver.profiler.summary()
+    assert summary["step"] == 6 and summary["steps_per_sec"] > 0
+    for name in PHASES:
+        phase = summary["phases"][name]
+        assert phase["count"] == 6
+        assert 0 < phase["p50"] <= phase["p95"] <= phase["max"]
+    
+    records = [json.loads(line) for line in jsonl.read_text().splitlines()]
+    assert [record["step"] for record in records] == [2, 4, 6]
+
+
+def test_window_keeps_the_latest_samples(make_solver):
+    profiler = make_solver({"profile": {"active": True, "window": 4}}).profiler
+    for ns in (10**9, 2, 3, 4, 5, 6):
+        profiler.record("phase", ns)
+    phase = profiler.summary()["phases"]["phase"]
+    assert phase["count"] == 6
+    assert phase["max"] == 6e-9
+
+
+def test_disabled_profiler_only_calls(make_solver):
+    solver = make_solver()
+    assert solver.profiler.time("phase", lambda x: x + 1, 1) == 2
+    solver.solve()
+    assert not solver.profiler.samples
+
+
+def test_prometheus_metrics(make_solver):
+    port = free_port()
+    solver = make_solver({"profile": {"active": True, 
+                                      "prometheus_port": port}})
+    solver.solve()
+    
+    url = f"http://127.0.0.1:{port}"
+    with urllib.request.urlopen(url + "/metrics") as response:
+        text = response.read().decode()
+    assert "fluidsim_step 1" in text
+    assert 'fluidsim_phase_seconds_count{phase="advect_smoke"} 1' in text
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(url + "/other")
+    assert error.value.code == 404
+
+
+def test_capture_steps(make_solver, tmp_path):
+    solver = make_solver()
+    path = tmp_path / "steps.prof"
+    solver.profiler.capture_steps(2, str(path))
+    solver.solve()
+    assert not path.exists()
+    solver.solve()
+    
+    stats = pstats.Stats(str(path))
+    assert any(function == "advance" for _, _, function in stats.stats)
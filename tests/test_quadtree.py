@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+
+# on the 38 x 10 test grid: level 1 tiles span 4 level 0 cells, level 2 
+# tiles 2
+T = 8
+
+
+@pytest.fixture
+def solver(make_solver):
+    return make_solver({
+        "BCs": {"horizontal": "no-slip", "vertical": "no-slip"},
+        "scheme": {"refinement": {
+            "active": True, "levels": 3, "tile_size": T, "every": 2}}})
+
+
+def corner_feature(fluid):
+    # a smoke edge and a shear layer in the top left corner, so tiles touch 
+    # two domain edges
+    fluid.d[:3, :3] = 1
+    fluid.u[:2, :4] = 5
+
+
+def test_regrid_follows_features_and_keeps_parents(solver):
+    fluid, quadtree = solver.fluid, solver.fluid.quadtree
+    corner_feature(fluid)
+    quadtree.regrid()
+    
+    assert quadtree.masks[1][0, 0] and quadtree.masks[2][0, 0]
+    assert not quadtree.masks[1][:, -2:].any()
+    for level in (1, 2):
+        assert (set(quadtree.tiles[level]) 
+                == set(zip(*np.nonzero(quadtree.masks[level]))))
+    for ty, tx in quadtree.tiles[2]:
+        assert (ty // 2, tx // 2) in quadtree.tiles[1]
+    
+    fluid.d[...] = 0
+    fluid.u[...] = 0
+    quadtree.regrid()
+    assert not any(quadtree.tiles[level] for level in (1, 2))
+
+
+def test_gather_and_restrict_round_trip(solver):
+    fluid, quadtree = solver.fluid, solver.fluid.quadtree
+    # linear fields are reproduced by the interpolation away from the edges
+    fluid.u[...] = 0.5 * np.arange(fluid.Nx)[None, :]
+    fluid.d[...] = 0.25 * np.arange(fluid.Ny)[:, None]
+    fields = quadtree.gather(1, slice(T, 2*T), slice(2*T, 3*T), own=False)
+    x = (np.arange(2*T, 3*T) + 0.5) / 2 - 0.5
+    y = (np.arange(T, 2*T) + 0.5) / 2 - 0.5
+    assert np.allclose(fields["u"], 0.5 * x[None, :])
+    assert np.allclose(fields["d"], 0.25 * y[:, None])
+
+    # restricting an unchanged tile gives back the cells under it
+    H = T // 2
+    quadtree.tiles[1][(1, 2)] = fields
+    quadtree.masks[1][1, 2] = True
+    fields["d"] += 1
+    before = {name: getattr(fluid, name).copy() for name in ("u", "d")}
+    quadtree.restrict()
+    under = (slice(H, 2*H), slice(2*H, 3*H))
+    assert np.allclose(fluid.u, before["u"])
+    assert np.allclose(fluid.d[under], before["d"][under] + 1)
+    fluid.d[under] -= 1
+    assert np.allclose(fluid.d, before["d"])
+
+    # the finest level is restricted through its parent
+    quadtree.tiles[2][(2, 4)] = {name: np.full((T, T), 3, dtype=fluid.dtype) 
+                                 for name in quadtree.names}
+    quadtree.masks[2][2, 4] = True
+    quadtree.restrict()
+    assert np.allclose(fields["d"][:H, :H], 3)
+    assert np.allclose(fluid.d[H:H + H//2, 2*H:2*H + H//2], 3)
+
+
+def test_advance_with_tiles_at_domain_edges(solver):
+    fluid, quadtree = solver.fluid, solver.fluid.quadtree
+    corner_feature(fluid)
+    quadtree.regrid()
+    smoke = fluid.d.sum()
+    for _ in range(6):
+        solver.solve()
+    
+    assert (0, 0) in quadtree.tiles[1]
+    for level in (1, 2):
+        for tile in quadtree.tiles[level].values():
+            assert all(np.isfinite(D).all() for D in tile.values())
+    assert 0 < fluid.d.sum() <= smoke * 1.01
+
+    # a block on the top and left edges gets the no-slip ghost cells there
+    fields = quadtree.step(1, (slice(0, 2*T), slice(0, 2*T)))
+    assert np.allclose(fields["u"][0, 1:-1], -fields["u"][1, 1:-1])
+    assert np.allclose(fields["v"][1:-1, 0], -fields["v"][1:-1, 1])
+
+
+def test_stamp_and_composite(solver):
+    fluid, quadtree = solver.fluid, solver.fluid.quadtree
+    corner_feature(fluid)
+    quadtree.regrid()
+    
+    before = {level: quadtree.tiles[level][(0, 0)]["d"].copy() 
+              for level in (1, 2)}
+    rows, cols = np.array([0, 1]), np.array([1, 1])
+    quadtree.stamp("d", (rows, cols), 0.5, add=True)
+    for level in (1, 2):
+        s = 2**level
+        added = quadtree.tiles[level][(0, 0)]["d"] - before[level]
+        assert np.allclose(added[:2*s, s:2*s], 0.5)
+        assert np.count_nonzero(added) == 2 * s * s
+
+    image = quadtree.composite("d", (fluid.Ny * 4, fluid.Nx * 4))
+    assert np.array_equal(image[:T, :T], quadtree.tiles[2][(0, 0)]["d"])
+    # away from the tiles, level 0 repeated
+    assert np.all(image[-4:, -4:] == fluid.d[-1, -1])
+    assert quadtree.composite("vorticity", (10, 10)).shape == (10, 10)
+
+
+def test_tile_size_must_suit_levels(make_solver):
+    with pytest.raises(ValueError, match="tile_size"):
+        make_solver({"scheme": {"refinement": {
+            "active": True, "levels": 3, "tile_size": 6}}})
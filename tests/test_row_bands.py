@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+
+SCENARIO = {"obstacles": {"shapes": [
+    {"shape": "circle", "centre": [70, 20], "radius": 4}]}}
+
+
+def run(make_solver, scheme, storage):
+    solver = make_solver({**SCENARIO, "scheme": scheme, "storage": storage})
+    fluid = solver.fluid
+    fluid.u[5:35, 10:40] = 4
+    fluid.v[5:35, 10:40] = 1
+    fluid.d[15:25, 20:30] = 1
+    for _ in range(5):
+        solver.solve()
+    return {name: np.array(getattr(fluid, name)) 
+            for name in ("u", "v", "p", "d")}, fluid
+
+
+# the banded BackwardEuler solves see the rest of the domain only through 
+# their halo rows, so they match to the reach of the diffusion
+@pytest.mark.parametrize("scheme, rtol", [
+    ({"name": "ExplicitEuler"}, 1e-12), 
+    ({"name": "ImplicitEuler"}, 1e-12), 
+    ({"name": "BackwardEuler"}, 1e-5), 
+    ({"name": "ExplicitEuler", "advection": {"velocity": "MacCormack", 
+                                             "smoke": "BFECC"}}, 1e-12), 
+], ids=["explicit", "implicit", "backward", "high-order"])
+def test_bands_match_in_memory(make_solver, tmp_path, scheme, rtol):
+    expected, _ = run(make_solver, scheme, {"backend": "memory"})
+    banded, fluid = run(make_solver, scheme, {
+        "backend": "memmap", "dir": str(tmp_path / "fields"), 
+        "band_rows": 8})
+    
+    assert fluid.bands is not None and isinstance(fluid.u, np.memmap)
+    for name, D in expected.items():
+        scale = np.abs(D).max()
+        assert np.abs(banded[name] - D).max() <= rtol * scale, name
+    assert {f"{name}.dat" for name in expected} \
+        <= {path.name for path in (tmp_path / "fields").iterdir()}
+
+
+def test_unknown_backend_falls_back_to_memory(make_solver):
+    with pytest.warns(UserWarning, match="backend"):
+        solver = make_solver({"storage": {"backend": "tape"}})
+    assert solver.fluid.bands is None
+    assert not isinstance(solver.fluid.u, np.memmap)
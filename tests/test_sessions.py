@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.SessionManager import SessionManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    (tmp_path / "out").mkdir()
+    monkeypatch.chdir(tmp_path)
+    manager = SessionManager({"workers": 2, "memory_limit": 1e12, 
+                              "idle_after": 0, "checkpoint_dir": "out/sessions"})
+    yield manager
+    manager.close()
+
+
+def test_sessions_step_evict_and_restore(manager, make_spec):
+    for name in ("a", "b"):
+        manager.create(name, make_spec())
+    manager.apply_input("a", np.array([[20., 40.]]), 4, np.array([5., 0.]), 
+                        True, False)
+    assert manager.run(3) == 3
+    a = manager.get("a")
+    assert a.step == 3 and manager.get("b").step == 3
+    u, d = a.fluid.u.copy(), a.fluid.d.copy()
+    assert d.any()
+
+    # everything idle and over the limit: both evicted to checkpoints
+    manager.memory_limit = 0
+    manager.relieve_memory_pressure()
+    assert all(s.solver is None for s in manager.sessions.values())
+    assert os.path.exists(manager.sessions["a"].checkpoint)
+    
+    # restored as it was (and evicted again straight away, still over)
+    manager.memory_limit = 1e12
+    restored = manager.get("a")
+    assert restored.step == 3
+    assert np.array_equal(restored.fluid.u, u)
+    assert np.array_equal(restored.fluid.d, d)
+
+    manager.remove("a")
+    assert "a" not in manager.sessions
+    with pytest.raises(ValueError):
+        manager.create("b", make_spec())
+
+
+def test_session_evicted_after_its_last_step(manager, make_spec):
+    manager.create("done", make_spec({"time": {"t_max": 0.15}}))
+    manager.run(2)
+    
+    # evicted between finishing its step and being logged as finished
+    step_session = manager.step_session
+    def step_then_evict(session):
+        result = step_session(session)
+        if result:
+            manager.evict(session)
+        return result
+    manager.step_session = step_then_evict
+    
+    manager.run(5)
+    session = manager.sessions["done"]
+    assert session.finished and session.solver is None
+    manager.evict(session)      # already evicted: nothing to do
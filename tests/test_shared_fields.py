@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+import uuid
+
+import numpy as np
+import pytest
+
+from src.SharedFields import SharedFields, SharedFieldsClient
+
+
+@pytest.fixture
+def name():
+    return f"fluidsim_test_{uuid.uuid4().hex[:8]}"
+
+
+def test_client_reads_published_fields(name):
+    shared = SharedFields({"name": name})
+    u = shared.share("u", np.arange(12.).reshape(3, 4))
+    shared.publish()
+    client = SharedFieldsClient(name)
+    try:
+        shared.begin()
+        u[...] = 7
+        shared.end(step=5, t=0.5)
+
+        snapshot = client.snapshot()
+        assert np.array_equal(snapshot["u"], np.full((3, 4), 7.))
+        assert (client.step, client.t) == (5, 0.5)
+    finally:
+        client.close()
+        shared.close()
+
+
+def test_read_during_write_times_out(name):
+    shared = SharedFields({"name": name})
+    shared.share("u", np.zeros(4))
+    shared.publish()
+    client = SharedFieldsClient(name)
+    try:
+        # an odd sequence number: the simulation is mid-write
+        shared.begin()
+        with pytest.raises(TimeoutError):
+            client.read(lambda arrays: None, timeout=0.05)
+        shared.end()
+        assert client.read(lambda arrays: arrays["u"].sum()) == 0
+    finally:
+        client.close()
+        shared.close()
+
+
+def test_unpublished_fields_are_refused(name):
+    shared = SharedFields({"name": name})
+    try:
+        with pytest.raises(RuntimeError):
+            SharedFieldsClient(name)
+    finally:
+        shared.close()
+
+
+def test_live_owner_keeps_its_blocks(name):
+    shared = SharedFields({"name": name})
+    try:
+        with pytest.raises(FileExistsError, match="unique share name"):
+            SharedFields({"name": name})
+    finally:
+        shared.close()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="no stale blocks on Windows")
+def test_stale_blocks_are_replaced(name):
+    # a run that exits without unlinking (or letting the resource tracker
+    # unlink) its blocks
+    code = (
+        "import os, sys, numpy as np\n"
+        "from multiprocessing import resource_tracker\n"
+        "from src.SharedFields import SharedFields\n"
+        f"shared = SharedFields({{'name': {name!r}}})\n"
+        "shared.share('u', np.ones(4))\n"
+        "shared.publish()\n"
+        "for shm in (shared.control_shm, *shared.blocks.values()):\n"
+        "    resource_tracker.unregister(shm._name, 'shared_memory')\n"
+        "os._exit(0)\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True,
+                   cwd=os.path.dirname(os.path.dirname(__file__)))
+
+    shared = SharedFields({"name": name})
+    try:
+        u = shared.share("u", np.zeros(4))
+        assert not u.any()
+    finally:
+        shared.close()
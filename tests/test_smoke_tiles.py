@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from src.SmokeTiles import SmokeTiles
+
+
+def run(make_solver, sparse, scheme="ExplicitEuler"):
+    solver = make_solver({"scheme": {"name": scheme, "sparse_smoke": {
+        "active": sparse, "tile_size": 8, "threshold": 1e-6}}})
+    fluid = solver.fluid
+    fluid.u[5:35, 10:40] = 4
+    fluid.v[5:35, 10:40] = 1
+    fluid.d[15:25, 20:30] = 1
+    if sparse:
+        fluid.smoke_tiles.refresh()
+    for _ in range(10):
+        solver.solve()
+    return fluid
+
+
+@pytest.mark.parametrize("scheme", ["ExplicitEuler", "BackwardEuler"])
+def test_sparse_smoke_matches_dense(make_solver, scheme):
+    dense = run(make_solver, False, scheme)
+    sparse = run(make_solver, True, scheme)
+    tiles = sparse.smoke_tiles
+
+    assert np.allclose(sparse.d, dense.d, rtol=0, atol=1e-12)
+    # the smoke is confined to the active tiles, which are not all of them
+    inactive = ~tiles.active.repeat(8, axis=0).repeat(8, axis=1)[:40, :150]
+    assert not sparse.d[inactive].any()
+    assert 0 < tiles.active.sum() < tiles.active.size
+
+
+def test_runs():
+    mask = np.array([[0, 1, 1, 0, 1], 
+                     [0, 0, 0, 0, 0], 
+                     [1, 1, 1, 1, 1]], dtype=bool)
+    assert SmokeTiles.runs(mask) == [(0, 1, 3), (0, 4, 5), (2, 0, 5)]
+    assert SmokeTiles.runs(np.zeros((2, 2), dtype=bool)) == []
+
+
+def test_tiles_follow_the_smoke(make_solver):
+    # 16 cell tiles: the last row of tiles is cut short by the domain edge
+    fluid = make_solver({"scheme": {"sparse_smoke": {
+        "active": True, "tile_size": 16, "threshold": 1e-3}}}).fluid
+    tiles = fluid.smoke_tiles
+    assert tiles.active.shape == (3, 10) and not tiles.active.any()
+    
+    fluid.d[38:40, 148:150] = 1
+    tiles.activate((np.array([38, 39]), np.array([148, 149])))
+    assert np.argwhere(tiles.active).tolist() == [[2, 9]]
+    assert tiles.halo_regions(4) == [(
+        (slice(32, 40), slice(144, 150)), 
+        (slice(28, 40), slice(140, 150)), 
+        (slice(4, 12), slice(4, 10)))]
+    
+    # grown by the reach, then retired when decayed, with the smoke zeroed
+    tiles.update(20)
+    assert np.array_equal(np.argwhere(tiles.active), 
+                          [[r, c] for r in range(3) for c in range(7, 10)])
+    fluid.d[38:40, 148:150] = 1e-4
+    tiles.update(0)
+    assert not tiles.active.any() and not fluid.d.any()